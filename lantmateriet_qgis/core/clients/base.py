@@ -1,9 +1,37 @@
+import copy
+import heapq
 import json
+import threading
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Iterable, Iterator, Self
 from uuid import UUID
 
-from qgis.core import QgsBlockingNetworkRequest, QgsFeedback
-from qgis.PyQt.QtCore import QUrl, QUrlQuery, QUuid
-from qgis.PyQt.QtNetwork import QNetworkRequest
+from qgis.core import (
+    QgsApplication,
+    QgsBlockingNetworkRequest,
+    QgsFeedback,
+    QgsNetworkAccessManager,
+    QgsNetworkReplyContent,
+    QgsRectangle,
+)
+from qgis.PyQt.QtCore import (
+    QCoreApplication,
+    QEventLoop,
+    QThread,
+    QTimer,
+    QUrl,
+    QUrlQuery,
+    QUuid,
+)
+from qgis.PyQt.QtNetwork import QNetworkReply, QNetworkRequest
+
+from lantmateriet_qgis.core.util import throttle
+from lantmateriet_qgis.core.util.geojson_stream import FeatureCollectionParser
+from lantmateriet_qgis.core.util.response_cache import ResponseCache
+from lantmateriet_qgis.core.util.telemetry import endpoint_name, telemetry
+from lantmateriet_qgis.core.util.tiling import grid, quadrants
 
 
 def coerce_uuid_to_str(uuid: str | UUID | QUuid) -> str:
@@ -21,75 +49,685 @@ class Canceled(Exception):
     pass
 
 
+class NetworkError(Exception):
+    """A request failed, either on the network level or with an HTTP error status."""
+
+    def __init__(
+        self,
+        message: str,
+        status: int | None = None,
+        body: str = "",
+        timed_out: bool = False,
+    ):
+        super().__init__("Network error: " + message + "\n" + body)
+        self.status = status
+        self.body = body
+        self.timed_out = timed_out
+
+
+@dataclass
+class Request:
+    """A request to one of the endpoints of a client, a GET unless `data` is given.
+
+    A request with a `timeout` is aborted if no data is transferred for that many
+    milliseconds."""
+
+    path: str
+    query: QUrlQuery
+    data: bytes | dict | list | None = None
+    timeout: int | None = None
+
+
+class _Flight:
+    """A request in flight, which identical requests from other threads wait for."""
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.followers = 0
+        self.done = threading.Event()
+        self.result: tuple[dict | list, dict] | None = None
+        self.error: BaseException | None = None
+
+
 class BaseClient:
     base_path: str
 
+    MAX_CONCURRENT_REQUESTS = 6
+    TILE_SIZE = 10_000.0
+    MIN_TILE_SIZE = 250.0
+    TILE_TIMEOUT = 30_000
+    FLIGHT_POLL_INTERVAL = 0.1
+    WAIT_INTERVAL = 0.1
+    # the main thread only retries once, after at most this many seconds, since
+    # waiting any longer would freeze QGIS
+    MAIN_THREAD_RETRY_DELAY = 1.0
+    # statuses with which the server rejects the content of a request, e.g. an
+    # unknown or malformed id, as opposed to failing for reasons of its own
+    REJECTED_STATUSES = frozenset({400, 404, 413, 422})
+
+    _flights: dict[tuple, _Flight] = {}
+    _flights_lock = threading.Lock()
+
     def __init__(
-        self, base_url: str, authcfg: str, feedback: QgsFeedback | None = None
+        self,
+        base_url: str,
+        authcfg: str,
+        feedback: QgsFeedback | None = None,
+        cache: ResponseCache | None = None,
     ):
         self._base_url = base_url
+        self._authcfg = authcfg
         self._feedback = feedback
-        self._request = QgsBlockingNetworkRequest()
-        self._request.setAuthCfg(authcfg)
+        self._cache = cache
+        self._local = threading.local()
 
-    def _get(self, path: str, query: QUrlQuery) -> dict | list:
-        return self._get_with_headers(path, query)[0]
+    def bind(
+        self, feedback: QgsFeedback | None = None, cache: ResponseCache | None = None
+    ) -> Self:
+        """Get a copy of the client for other feedback, sharing its network requests."""
+        client = copy.copy(self)
+        client._feedback = feedback
+        client._cache = cache
+        return client
 
-    def _get_with_headers(
-        self, path: str, query: QUrlQuery
-    ) -> tuple[dict | list, dict] | Canceled:
-        url = QUrl(f"{self._base_url.rstrip('/')}{self.base_path.rstrip('/')}{path}")
-        url.setQuery(query)
+    def _blocking_request(self) -> QgsBlockingNetworkRequest:
+        """Get the blocking request of the current thread, unless it is already busy."""
+        request: QgsBlockingNetworkRequest | None = getattr(
+            self._local, "request", None
+        )
+        if request is None or getattr(self._local, "busy", False):
+            request = QgsBlockingNetworkRequest()
+            request.setAuthCfg(self._authcfg)
+            if not hasattr(self._local, "request"):
+                self._local.request = request
+        return request
+
+    def _network_request(self, request: Request) -> tuple[QNetworkRequest, bytes]:
+        url = QUrl(
+            f"{self._base_url.rstrip('/')}{self.base_path.rstrip('/')}{request.path}"
+        )
+        url.setQuery(request.query)
 
         req = QNetworkRequest(url)
-        req.setRawHeader(b"Accept", b"application/json, application/geo+json")
+        req.setAttribute(QNetworkRequest.Attribute.Http2AllowedAttribute, True)
+        req.setRawHeader(b"Connection", b"keep-alive")
+        if request.timeout is not None:
+            req.setTransferTimeout(request.timeout)
+        data = request.data
+        if data is None:
+            req.setRawHeader(b"Accept", b"application/json, application/geo+json")
+        else:
+            req.setRawHeader(b"Accept", b"application/json")
+            if not isinstance(data, bytes):
+                data = json.dumps(data).encode("utf-8")
+                req.setRawHeader(b"Content-Type", b"application/json")
+        return req, data
+
+    @staticmethod
+    def _parse_headers(reply: QgsNetworkReplyContent | QNetworkReply) -> dict:
+        return {
+            str(header, encoding="utf-8").lower(): str(
+                reply.rawHeader(header), encoding="utf-8"
+            )
+            for header in reply.rawHeaderList()
+        }
+
+    @classmethod
+    def _parse_reply(cls, reply: QgsNetworkReplyContent) -> tuple[dict | list, dict]:
+        response = reply.content().data().decode()
+        return json.loads(response), cls._parse_headers(reply)
+
+    def _endpoint(self, request: Request) -> str:
+        return endpoint_name(
+            "GET" if request.data is None else "POST",
+            f"{self.base_path.rstrip('/')}{request.path}",
+        )
+
+    def _record(
+        self,
+        endpoint: str,
+        latency_ms: float,
+        reply: QgsNetworkReplyContent,
+        error: bool,
+    ) -> tuple[dict | list, dict] | None:
+        """Record a request in the telemetry, parsing its response unless it failed."""
+        status = reply.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute)
+        size = len(reply.content())
+        if error:
+            telemetry.record(endpoint, latency_ms, size, status=status, error=True)
+            return None
+        parse_started = time.monotonic()
+        result = self._parse_reply(reply)
+        telemetry.record(
+            endpoint,
+            latency_ms,
+            size,
+            (time.monotonic() - parse_started) * 1000,
+            status,
+        )
+        return result
+
+    def _fetch(self, request: Request) -> tuple[dict | list, dict] | Canceled:
+        """Send a request, sharing the response with identical requests in flight.
+
+        Requests are identical when they have the same method, URL, query, body and
+        authcfg. The first of them is sent, and the others wait for its result."""
+        req, data = self._network_request(request)
+        key = (self._authcfg, req.url().toString(), data)
+        while True:
+            with self._flights_lock:
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                    break
+                flight.followers += 1
+            # waiting on the request of the same thread would never end, and the main
+            # thread must not block while other threads may need it for authentication
+            if flight.thread == threading.get_ident() or self._on_main_thread():
+                return self._fetch_once(req, data, self._endpoint(request))
+            while not flight.done.wait(self.FLIGHT_POLL_INTERVAL):
+                if self._feedback is not None and self._feedback.isCanceled():
+                    raise Canceled()
+            if isinstance(flight.error, Canceled):
+                continue  # only the feedback of the first request was canceled
+            if flight.error is not None:
+                raise flight.error
+            # callers may modify their responses, so each of them gets its own copy
+            return copy.deepcopy(flight.result)
+
+        try:
+            flight.result = self._fetch_once(req, data, self._endpoint(request))
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+                followers = flight.followers
+            flight.done.set()
+        return copy.deepcopy(flight.result) if followers else flight.result
+
+    @staticmethod
+    def _on_main_thread() -> bool:
+        application = QCoreApplication.instance()
+        return application is not None and (
+            QThread.currentThread() == application.thread()
+        )
+
+    def _fetch_once(
+        self, req: QNetworkRequest, data: bytes | None, endpoint: str
+    ) -> tuple[dict | list, dict] | Canceled:
+        attempt = 0
+        while True:
+            self._wait(throttle.rate_limiter.reserve())
+            started = time.monotonic()
+            blocking = self._blocking_request()
+            shared = blocking is getattr(self._local, "request", None)
+            if shared:
+                self._local.busy = True
+            try:
+                if data is None:
+                    error = blocking.get(req, feedback=self._feedback)
+                else:
+                    error = blocking.post(req, data, feedback=self._feedback)
+            finally:
+                if shared:
+                    self._local.busy = False
 
-        if self._request.get(
-            req, feedback=self._feedback
-        ) != QgsBlockingNetworkRequest.ErrorCode.NoError or (
-            self._feedback is not None and self._feedback.isCanceled()
-        ):
             if self._feedback is not None and self._feedback.isCanceled():
                 raise Canceled()
-            else:
-                reply = self._request.reply().content().data().decode()
-                raise Exception(
-                    "Network error: " + self._request.errorMessage() + "\n" + reply
-                )
+            failed = error != QgsBlockingNetworkRequest.ErrorCode.NoError
+            result = self._record(
+                endpoint, (time.monotonic() - started) * 1000, blocking.reply(), failed
+            )
+            if not failed:
+                return result
 
-        response = self._request.reply().content().data().decode()
-        return json.loads(response), {
-            str(header, encoding="utf-8").lower(): str(
-                self._request.reply().rawHeader(header), encoding="utf-8"
+            status = blocking.reply().attribute(
+                QNetworkRequest.Attribute.HttpStatusCodeAttribute
             )
-            for header in self._request.reply().rawHeaderList()
-        }
+            delay = self._retry_delay(
+                status, self._parse_headers(blocking.reply()), attempt
+            )
+            if delay is None:
+                raise NetworkError(
+                    blocking.errorMessage(),
+                    status,
+                    blocking.reply().content().data().decode(),
+                )
+            self._wait(delay)
+            attempt += 1
+
+    def _retry_delay(
+        self, status: int | None, headers: dict, attempt: int
+    ) -> float | None:
+        """Get the seconds to wait before retrying a failed request, or None to give up.
+
+        On the main thread a request is retried at most once, and only after a short
+        delay, so that a throttled request does not freeze QGIS."""
+        if not throttle.retry_policy.should_retry(status, attempt):
+            return None
+        main_thread = self._on_main_thread()
+        if main_thread and attempt > 0:
+            return None
+        delay = throttle.retry_policy.delay(
+            attempt, throttle.parse_retry_after(headers.get("retry-after"))
+        )
+        if delay is None or (main_thread and delay > self.MAIN_THREAD_RETRY_DELAY):
+            return None
+        throttle.stats.add_retry()
+        return delay
+
+    def _wait(self, seconds: float):
+        """Wait for the rate limit or a retry, giving up if the feedback is canceled."""
+        if seconds <= 0:
+            return
+        throttle.stats.add_throttled(seconds)
+        deadline = time.monotonic() + seconds
+        while (remaining := deadline - time.monotonic()) > 0:
+            if self._feedback is not None and self._feedback.isCanceled():
+                raise Canceled()
+            time.sleep(min(remaining, self.WAIT_INTERVAL))
+
+    def _get(self, path: str, query: QUrlQuery) -> dict | list:
+        return self._get_with_headers(path, query)[0]
+
+    def _get_with_headers(
+        self, path: str, query: QUrlQuery
+    ) -> tuple[dict | list, dict] | Canceled:
+        return self._fetch(Request(path, query))
 
     def _post(
         self, path: str, query: QUrlQuery, data: bytes | dict | list
     ) -> dict | list | Canceled:
-        url = QUrl(f"{self._base_url.rstrip('/')}{self.base_path.rstrip('/')}{path}")
-        url.setQuery(query)
+        return self._fetch(Request(path, query, data))[0]
 
-        req = QNetworkRequest(url)
-        req.setRawHeader(b"Accept", b"application/json")
+    def _cached_features(
+        self, ids: list[str], query: QUrlQuery
+    ) -> tuple[list[dict], list[str]]:
+        """Look up features in the response cache, if any.
+
+        Returns the cached features, and the ids which were not found in the cache."""
+        if self._cache is None:
+            return [], ids
+        cached = self._cache.get_many(self._cache_namespace, ids, query.toString())
+        return list(cached.values()), [id for id in ids if id not in cached]
+
+    def _cache_features(self, query: QUrlQuery, features: list[dict]):
+        if self._cache is not None:
+            self._cache.put_many(self._cache_namespace, query.toString(), features)
+
+    def _fetch_features(
+        self,
+        ids: list[str],
+        query: QUrlQuery,
+        fetch: Callable[[list[str]], dict],
+    ) -> dict:
+        """Get a feature collection for the given ids, from the response cache where possible."""
+        features, missing = self._cached_features(ids, query)
+        if missing:
+            response = fetch(missing)
+            self._cache_features(query, response["features"])
+            features += response["features"]
+        return {"type": "FeatureCollection", "features": features}
 
-        if not isinstance(data, bytes):
-            data = json.dumps(data).encode("utf-8")
-            req.setRawHeader(b"Content-Type", b"application/json")
+    @property
+    def _cache_namespace(self) -> str:
+        return f"{self._base_url.rstrip('/')}{self.base_path.rstrip('/')}"
 
-        if self._request.post(
-            req, data, feedback=self._feedback
-        ) != QgsBlockingNetworkRequest.ErrorCode.NoError or (
-            self._feedback is not None and self._feedback.isCanceled()
+    def _send(
+        self, network_access_manager: QgsNetworkAccessManager, request: Request
+    ) -> QNetworkReply:
+        """Start a request, which the caller must already have paced to the rate limit."""
+        req, data = self._network_request(request)
+        if self._authcfg and not QgsApplication.authManager().updateNetworkRequest(
+            req, self._authcfg
         ):
-            if self._feedback is not None and self._feedback.isCanceled():
-                raise Canceled()
+            raise NetworkError(
+                f"Could not apply authentication configuration {self._authcfg}"
+            )
+        if data is None:
+            reply = network_access_manager.get(req)
+        else:
+            reply = network_access_manager.post(req, data)
+        if self._authcfg:
+            QgsApplication.authManager().updateNetworkReply(reply, self._authcfg)
+        return reply
+
+    def _fetch_concurrently(
+        self,
+        requests: Iterable[Request],
+        ordered: bool = True,
+        return_errors: bool = False,
+        max_in_flight: int | None = None,
+    ) -> Iterator[tuple[int, dict | list | NetworkError, dict]]:
+        """Execute requests concurrently, with a bounded number of requests in flight.
+
+        Yields `(index, response, headers)` tuples, in the order of `requests` if
+        `ordered` is set and otherwise as soon as each response arrives. A failed
+        request raises a `NetworkError`, or yields it as the response if
+        `return_errors` is set. Requests throttled by the server are retried after
+        a delay. Requests held back by the rate limit or waiting for a retry are
+        started by a timer, so that the replies in flight are processed meanwhile.
+        Closing the iterator aborts the requests in flight.
+        """
+        max_in_flight = max_in_flight or self.MAX_CONCURRENT_REQUESTS
+        network_access_manager = QgsNetworkAccessManager.instance()
+        loop = QEventLoop()
+
+        pending = enumerate(requests)
+        exhausted = False
+        in_flight: dict[int, QNetworkReply] = {}
+        sent: dict[int, tuple[Request, int]] = {}
+        started: dict[int, float] = {}
+        latencies: dict[int, float] = {}
+        retrying: list[tuple[float, int]] = []
+        # requests which have reserved their turn with the rate limiter, and only wait
+        # for it to come, so they already count as in flight
+        paced: list[tuple[float, int]] = []
+        finished: dict[
+            int, tuple[QgsNetworkReplyContent, QNetworkReply.NetworkError, str]
+        ] = {}
+        next_index = 0
+
+        def on_finished(index: int):
+            reply = in_flight.pop(index)
+            content = QgsNetworkReplyContent(reply)
+            content.setContent(reply.readAll())
+            finished[index] = (content, reply.error(), reply.errorString())
+            latencies[index] = (time.monotonic() - started.pop(index)) * 1000
+            reply.deleteLater()
+            loop.quit()
+
+        def start(index: int):
+            reply = self._send(network_access_manager, sent[index][0])
+            in_flight[index] = reply
+            started[index] = time.monotonic()
+            reply.finished.connect(partial(on_finished, index))
+
+        def send(index: int, request: Request, attempt: int):
+            sent[index] = (request, attempt)
+            delay = throttle.rate_limiter.reserve()
+            if delay > 0:
+                throttle.stats.add_throttled(delay)
+                heapq.heappush(paced, (time.monotonic() + delay, index))
             else:
-                reply = self._request.reply().content().data().decode()
-                raise Exception(
-                    "Network error: " + self._request.errorMessage() + "\n" + reply
+                start(index)
+
+        def has_capacity() -> bool:
+            return len(in_flight) + len(paced) < max_in_flight
+
+        if self._feedback is not None:
+            self._feedback.canceled.connect(loop.quit)
+        try:
+            while True:
+                if self._feedback is not None and self._feedback.isCanceled():
+                    raise Canceled()
+
+                while paced and paced[0][0] <= time.monotonic():
+                    _, index = heapq.heappop(paced)
+                    start(index)
+                while (
+                    retrying
+                    and retrying[0][0] <= time.monotonic()
+                    and has_capacity()
+                ):
+                    _, index = heapq.heappop(retrying)
+                    send(index, *sent[index])
+                while not exhausted and has_capacity():
+                    try:
+                        index, request = next(pending)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    send(index, request, 0)
+
+                if ordered:
+                    index = next_index if next_index in finished else None
+                else:
+                    index = min(finished) if finished else None
+
+                if index is not None:
+                    content, error, error_message = finished.pop(index)
+                    failed = error != QNetworkReply.NetworkError.NoError
+                    request, attempt = sent[index]
+                    result = self._record(
+                        self._endpoint(request), latencies.pop(index), content, failed
+                    )
+                    if failed:
+                        status = content.attribute(
+                            QNetworkRequest.Attribute.HttpStatusCodeAttribute
+                        )
+                        delay = self._retry_delay(
+                            status, self._parse_headers(content), attempt
+                        )
+                        if delay is not None:
+                            sent[index] = (request, attempt + 1)
+                            heapq.heappush(retrying, (time.monotonic() + delay, index))
+                            continue
+                    del sent[index]
+                    if ordered:
+                        next_index += 1
+                    if failed:
+                        exception = NetworkError(
+                            error_message,
+                            status,
+                            content.content().data().decode(),
+                            error
+                            in (
+                                QNetworkReply.NetworkError.TimeoutError,
+                                QNetworkReply.NetworkError.OperationCanceledError,
+                            ),
+                        )
+                        if not return_errors:
+                            raise exception
+                        yield index, exception, {}
+                    else:
+                        yield index, *result
+                elif exhausted and not in_flight and not paced and not retrying:
+                    return
+                else:
+                    # wake up for the next request to start, unless a reply comes first
+                    due = [
+                        queue[0][0]
+                        for queue in (paced, retrying if has_capacity() else [])
+                        if queue
+                    ]
+                    if due:
+                        QTimer.singleShot(
+                            max(0, int((min(due) - time.monotonic()) * 1000)),
+                            loop.quit,
+                        )
+                    loop.exec()
+        finally:
+            if self._feedback is not None:
+                self._feedback.canceled.disconnect(loop.quit)
+            for reply in in_flight.values():
+                reply.finished.disconnect()
+                reply.abort()
+                reply.deleteLater()
+
+    def _fetch_streaming(
+        self, request: Request, parser: FeatureCollectionParser
+    ) -> Iterator[tuple[dict, dict]]:
+        """Execute a request, yielding the features of its GeoJSON response as they arrive.
+
+        Yields `(feature, headers)` tuples. The response is decoded chunk by chunk by
+        `parser`, so the complete response is never held in memory at once. The other
+        top-level members of the response are found on `parser` after the iteration.
+        """
+        network_access_manager = QgsNetworkAccessManager.instance()
+        loop = QEventLoop()
+
+        endpoint = self._endpoint(request)
+        started = 0.0
+
+        def send() -> QNetworkReply:
+            nonlocal started
+            self._wait(throttle.rate_limiter.reserve())
+            reply = self._send(network_access_manager, request)
+            started = time.monotonic()
+            reply.readyRead.connect(loop.quit)
+            reply.finished.connect(loop.quit)
+            return reply
+
+        def release(reply: QNetworkReply):
+            reply.readyRead.disconnect()
+            reply.finished.disconnect()
+            if not reply.isFinished():
+                reply.abort()
+            reply.deleteLater()
+
+        reply = send()
+        attempt = 0
+        if self._feedback is not None:
+            self._feedback.canceled.connect(loop.quit)
+        headers = None
+        size = 0
+        parse_ms = 0.0
+        try:
+            while True:
+                if self._feedback is not None and self._feedback.isCanceled():
+                    raise Canceled()
+
+                status = reply.attribute(
+                    QNetworkRequest.Attribute.HttpStatusCodeAttribute
                 )
+                failed = reply.error() != QNetworkReply.NetworkError.NoError or (
+                    status is not None and status >= 400
+                )
+                if failed:
+                    # wait for the whole error response, to include it in the exception
+                    if not reply.isFinished():
+                        loop.exec()
+                        continue
+                    telemetry.record(
+                        endpoint,
+                        (time.monotonic() - started) * 1000,
+                        size + reply.bytesAvailable(),
+                        status=status,
+                        error=True,
+                    )
+                    # only retry before any features have been yielded
+                    delay = (
+                        self._retry_delay(status, self._parse_headers(reply), attempt)
+                        if headers is None
+                        else None
+                    )
+                    if delay is None:
+                        raise NetworkError(
+                            reply.errorString(),
+                            status,
+                            reply.readAll().data().decode(errors="replace"),
+                        )
+                    self._wait(delay)
+                    attempt += 1
+                    failed_reply, reply = reply, send()
+                    release(failed_reply)
+                    continue
+
+                if reply.bytesAvailable() > 0:
+                    if headers is None:
+                        headers = self._parse_headers(reply)
+                    chunk = reply.readAll().data()
+                    size += len(chunk)
+                    parse_started = time.monotonic()
+                    features = parser.feed(chunk)
+                    parse_ms += (time.monotonic() - parse_started) * 1000
+                    for feature in features:
+                        yield feature, headers
+                elif reply.isFinished():
+                    if headers is None:
+                        headers = self._parse_headers(reply)
+                    telemetry.record(
+                        endpoint,
+                        (time.monotonic() - started) * 1000,
+                        size,
+                        parse_ms,
+                        status,
+                    )
+                    for feature in parser.close():
+                        yield feature, headers
+                    return
+                else:
+                    loop.exec()
+        finally:
+            if self._feedback is not None:
+                self._feedback.canceled.disconnect(loop.quit)
+            release(reply)
+
+    def _fetch_bisecting(
+        self,
+        ids: list[str],
+        chunk_size: int,
+        make_request: Callable[[list[str]], Request],
+        on_error: Callable[[str, NetworkError], None] | None = None,
+    ) -> Iterator[dict | list]:
+        """Fetch ids in concurrent chunks, bisecting the chunks rejected by the server.
+
+        A chunk rejected by the server, with one of `REJECTED_STATUSES`, is split in
+        half and both halves are retried, so that a bad id only costs a few extra
+        requests. Ids rejected on their own are passed to `on_error`, or raise if it
+        is not given. Any other failure, e.g. an expired token or an unavailable
+        service, raises straight away since it would fail the halves as well.
+        """
+        chunks = [ids[i : i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        while chunks:
+            failed: list[list[str]] = []
+            for index, response, _ in self._fetch_concurrently(
+                (make_request(chunk) for chunk in chunks),
+                ordered=False,
+                return_errors=True,
+            ):
+                chunk = chunks[index]
+                if not isinstance(response, NetworkError):
+                    yield response
+                elif response.status not in self.REJECTED_STATUSES:
+                    raise response
+                elif len(chunk) > 1:
+                    failed += [chunk[: len(chunk) // 2], chunk[len(chunk) // 2 :]]
+                elif on_error is not None:
+                    on_error(chunk[0], response)
+                else:
+                    raise response
+            chunks = failed
+
+    def _fetch_tiled(
+        self,
+        extent: QgsRectangle,
+        make_request: Callable[[QgsRectangle], Request],
+        is_truncated: Callable[[dict | list], bool],
+    ) -> Iterator[tuple[QgsRectangle, dict | list, dict, bool]]:
+        """Fetch an extent in concurrent tiles, subdividing the tiles which are too large.
 
-        response = self._request.reply().content().data().decode()
-        return json.loads(response)
+        The extent is split into tiles of at most `TILE_SIZE`, and a tile whose response
+        is truncated according to `is_truncated`, or which times out after
+        `TILE_TIMEOUT` milliseconds, is split into quadrants which are fetched in turn,
+        down to `MIN_TILE_SIZE`. Yields `(tile, response, headers, truncated)` tuples,
+        also for the subdivided tiles since their responses are incomplete but not
+        wrong, where `truncated` is set for a truncated tile that could not be split.
+        """
+        tiles = grid(extent, self.TILE_SIZE)
+        while tiles:
+            subdivided: list[QgsRectangle] = []
+            requests = []
+            for tile in tiles:
+                request = make_request(tile)
+                request.timeout = self.TILE_TIMEOUT
+                requests.append(request)
+            for index, response, headers in self._fetch_concurrently(
+                requests, ordered=False, return_errors=True
+            ):
+                tile = tiles[index]
+                divisible = max(tile.width(), tile.height()) > self.MIN_TILE_SIZE
+                if isinstance(response, NetworkError):
+                    if response.timed_out and divisible:
+                        subdivided += quadrants(tile)
+                        continue
+                    raise response
+                truncated = is_truncated(response)
+                if truncated and divisible:
+                    subdivided += quadrants(tile)
+                    truncated = False
+                yield tile, response, headers, truncated
+            tiles = subdivided
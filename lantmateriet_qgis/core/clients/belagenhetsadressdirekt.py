@@ -1,5 +1,5 @@
 import json
-from typing import Literal, TypedDict, overload
+from typing import Callable, Iterable, Iterator, Literal, TypedDict, overload
 from uuid import UUID
 
 from qgis.core import (
@@ -9,11 +9,17 @@ from qgis.core import (
     QgsJsonUtils,
     QgsPointXY,
     QgsProject,
+    QgsRectangle,
     QgsReferencedGeometry,
 )
 from qgis.PyQt.QtCore import QUrlQuery, QUuid
 
-from lantmateriet_qgis.core.clients.base import BaseClient, coerce_uuid_to_str
+from lantmateriet_qgis.core.clients.base import (
+    BaseClient,
+    NetworkError,
+    Request,
+    coerce_uuid_to_str,
+)
 from lantmateriet_qgis.core.clients.direkt_utils import coerce_crs, is_supported_crs
 
 
@@ -172,6 +178,24 @@ class BelagenhetsadressTotal(BelagenhetsadressBasinformation):
     registerenhetsreferens: RegisterenhetsReference
 
 
+def format_address(address: BelagenhetsadressBasinformation) -> str:
+    """Format the street address of an address, e.g. "Storgatan 1 A"."""
+    beteckning = address["adressplatsattribut"]["adressplatsbeteckning"]
+    name = (address.get("gardsadressomrade") or address["adressomrade"])[
+        "faststalltNamn"
+    ]
+    if beteckning.get("avvikandeAdressplatsBeteckning"):
+        return f"{name} {beteckning['avvikandeAdressplatsBeteckning']}"
+    parts = [
+        name,
+        beteckning.get("adressplatsnummer"),
+        beteckning.get("bokstavstillagg"),
+        beteckning.get("lagestillagg"),
+        beteckning.get("lagestillagsnummer"),
+    ]
+    return " ".join(str(part) for part in parts if part)
+
+
 def from_feature(
     data: dict, crs: QgsCoordinateReferenceSystem
 ) -> BelagenhetsadressBasinformation | BelagenhetsadressTotal:
@@ -186,6 +210,8 @@ class BelagenhetsadressDirektClient(BaseClient):
     base_path = "/distribution/produkter/belagenhetsadress/v4.2"
 
     MAX_GET_MANY = 250
+    MAX_REFERENCES = 1000
+    """Responses with this many references from a geometry are taken as truncated."""
 
     @classmethod
     def _handle_results(
@@ -274,13 +300,42 @@ class BelagenhetsadressDirektClient(BaseClient):
         | BelagenhetsadressTotal
     ):
         """Download a single address."""
+        request = self._get_one_request(id, include, srid)
+        result = self._fetch_features(
+            [coerce_uuid_to_str(id)], request.query, lambda _: self._fetch(request)[0]
+        )
+        return self._handle_results(include, srid, result)[0]
+
+    @staticmethod
+    def _get_one_request(
+        id: str | UUID | QUuid,
+        include: Literal["basinformation", "berorkrets", "total"] | None,
+        srid: QgsCoordinateReferenceSystem | None,
+    ) -> Request:
         query = QUrlQuery()
         query.addQueryItem("includeData", include or "basinformation")
         if srid is not None:
             query.addQueryItem("srid", str(coerce_crs(srid)))
+        return Request(f"/{coerce_uuid_to_str(id)}", query)
 
-        result = self._get(f"/{coerce_uuid_to_str(id)}", query)
-        return self._handle_results(include, srid, result)[0]
+    def get_one_batch(
+        self,
+        ids: Iterable[str | UUID | QUuid],
+        include: Literal["basinformation", "berorkrets", "total"] | None = None,
+        srid: QgsCoordinateReferenceSystem | None = None,
+    ) -> list[
+        BelagenhetsadressNoInfo
+        | BelagenhetsadressBasinformation
+        | BelagenhetsadressBerorkrets
+        | BelagenhetsadressTotal
+    ]:
+        """Download single addresses concurrently, one request per address."""
+        return [
+            self._handle_results(include, srid, result)[0]
+            for _, result, _ in self._fetch_concurrently(
+                self._get_one_request(id, include, srid) for id in ids
+            )
+        ]
 
     @overload
     def get_many(
@@ -333,9 +388,50 @@ class BelagenhetsadressDirektClient(BaseClient):
             query.addQueryItem("srid", str(coerce_crs(srid)))
 
         ids = [coerce_uuid_to_str(id) for id in ids]
-        results = self._post("/", query, ids)
+        results = self._fetch_features(
+            ids, query, lambda missing: self._post("/", query, missing)
+        )
         return self._handle_results(include, srid, results)
 
+    def get_many_chunked(
+        self,
+        ids: Iterable[str | UUID | QUuid],
+        include: Literal["basinformation", "berorkrets", "total"] | None = None,
+        srid: QgsCoordinateReferenceSystem | None = None,
+        on_error: Callable[[str, NetworkError], None] | None = None,
+    ) -> Iterator[
+        BelagenhetsadressNoInfo
+        | BelagenhetsadressBasinformation
+        | BelagenhetsadressBerorkrets
+        | BelagenhetsadressTotal
+    ]:
+        """Download any number of addresses, in concurrent chunks of at most `MAX_GET_MANY`.
+
+        Chunks rejected by the server are split in half and retried. Addresses which
+        cannot be downloaded on their own are passed to `on_error` and skipped, or
+        raise if no `on_error` is given.
+        """
+        query = QUrlQuery()
+        query.addQueryItem("includeData", include or "basinformation")
+        if srid is not None:
+            query.addQueryItem("srid", str(coerce_crs(srid)))
+
+        cached, missing = self._cached_features(
+            [coerce_uuid_to_str(id) for id in ids], query
+        )
+        if cached:
+            yield from self._handle_results(
+                include, srid, {"type": "FeatureCollection", "features": cached}
+            )
+        for results in self._fetch_bisecting(
+            missing,
+            self.MAX_GET_MANY,
+            lambda chunk: Request("/", query, chunk),
+            on_error,
+        ):
+            self._cache_features(query, results["features"])
+            yield from self._handle_results(include, srid, results)
+
     @overload
     def get_by_registerenhet(
         self,
@@ -430,6 +526,15 @@ class BelagenhetsadressDirektClient(BaseClient):
         | BelagenhetsadressTotal
     ):
         """Get the adress closest to a given point."""
+        result, _ = self._fetch(self._get_by_point_request(point, include, srid))
+        return self._handle_results(include, srid, result)[0]
+
+    @staticmethod
+    def _get_by_point_request(
+        point: QgsGeometry | QgsReferencedGeometry,
+        include: Literal["basinformation", "berorkrets", "total"] | None,
+        srid: QgsCoordinateReferenceSystem | None,
+    ) -> Request:
         query = QUrlQuery()
         query.addQueryItem("includeData", include or "basinformation")
         if srid is not None:
@@ -450,9 +555,36 @@ class BelagenhetsadressDirektClient(BaseClient):
         except TypeError:
             raise ValueError("Invalid geometry type. Expected a point.")
         query.addQueryItem("koordinater", f"{point.y()},{point.x()}")
+        return Request("/punkt", query)
 
-        result = self._get("/punkt", query)
-        return self._handle_results(include, srid, result)[0]
+    def get_by_point_batch(
+        self,
+        points: Iterable[QgsGeometry | QgsReferencedGeometry],
+        include: Literal["basinformation", "berorkrets", "total"] | None = None,
+        srid: QgsCoordinateReferenceSystem | None = None,
+        on_error: Callable[[int, NetworkError], None] | None = None,
+    ) -> list[
+        BelagenhetsadressNoInfo
+        | BelagenhetsadressBasinformation
+        | BelagenhetsadressBerorkrets
+        | BelagenhetsadressTotal
+        | None
+    ]:
+        """Get the addresses closest to each of the given points, concurrently.
+
+        Points which fail are passed to `on_error` by index and get `None`, or raise if
+        no `on_error` is given."""
+        results = []
+        for index, result, _ in self._fetch_concurrently(
+            (self._get_by_point_request(point, include, srid) for point in points),
+            return_errors=on_error is not None,
+        ):
+            if isinstance(result, NetworkError):
+                on_error(index, result)
+                results.append(None)
+            else:
+                results.append(self._handle_results(include, srid, result)[0])
+        return results
 
     @overload
     def get_references_from_text(
@@ -481,6 +613,54 @@ class BelagenhetsadressDirektClient(BaseClient):
         split_address: Literal[True, False] = False,
     ) -> list[BelagenhetsadressReference | BelagenhetsadressReferenceWithComponents]:
         """Get references to addresses matching a given text."""
+        result, _ = self._fetch(
+            self._get_references_from_text_request(
+                text, municipality, status, max_hits, split_address
+            )
+        )
+        return self._handle_references(result, split_address)
+
+    def get_references_from_text_batch(
+        self,
+        texts: Iterable[str],
+        municipality: str | None = None,
+        status: Literal["Gällande", "Reserverad"] | None = None,
+        max_hits: int = 100,
+        split_address: Literal[True, False] = False,
+        on_error: Callable[[int, NetworkError], None] | None = None,
+    ) -> list[
+        list[BelagenhetsadressReference | BelagenhetsadressReferenceWithComponents]
+        | None
+    ]:
+        """Get references to addresses matching each of the given texts, concurrently.
+
+        Texts which fail are passed to `on_error` by index and get `None`, or raise if
+        no `on_error` is given."""
+        results = []
+        for index, result, _ in self._fetch_concurrently(
+            (
+                self._get_references_from_text_request(
+                    text, municipality, status, max_hits, split_address
+                )
+                for text in texts
+            ),
+            return_errors=on_error is not None,
+        ):
+            if isinstance(result, NetworkError):
+                on_error(index, result)
+                results.append(None)
+            else:
+                results.append(self._handle_references(result, split_address))
+        return results
+
+    @staticmethod
+    def _get_references_from_text_request(
+        text: str,
+        municipality: str | None,
+        status: Literal["Gällande", "Reserverad"] | None,
+        max_hits: int,
+        split_address: bool,
+    ) -> Request:
         query = QUrlQuery()
         query.addQueryItem("adress", text)
         if municipality is not None:
@@ -489,8 +669,12 @@ class BelagenhetsadressDirektClient(BaseClient):
             query.addQueryItem("status", status)
         query.addQueryItem("maxHits", str(max_hits))
         query.addQueryItem("splitAdress", str(split_address).lower())
+        return Request("/referens/fritext", query)
 
-        result = self._get("/referens/fritext", query)
+    @staticmethod
+    def _handle_references(
+        result: list[dict], split_address: bool
+    ) -> list[BelagenhetsadressReference | BelagenhetsadressReferenceWithComponents]:
         if split_address:
             return [
                 BelagenhetsadressReferenceWithComponents(
@@ -527,7 +711,69 @@ class BelagenhetsadressDirektClient(BaseClient):
         split_address: Literal[True, False] = False,
     ) -> list[BelagenhetsadressReference | BelagenhetsadressReferenceWithComponents]:
         """Get references to addresses matching a given geometry."""
+        result, _ = self._fetch(
+            self._get_references_from_geometry_request(
+                geometry, buffer, status, split_address
+            )
+        )
+        if result is None:
+            raise ValueError("Error retrieving references")
+        return self._handle_references(result, split_address)
 
+    def get_references_from_geometry_batch(
+        self,
+        geometries: Iterable[QgsGeometry | QgsReferencedGeometry],
+        buffer: int = 0,
+        status: Literal["Gällande", "Reserverad"] | None = None,
+        split_address: Literal[True, False] = False,
+    ) -> list[
+        list[BelagenhetsadressReference | BelagenhetsadressReferenceWithComponents]
+    ]:
+        """Get references to addresses matching each of the given geometries, concurrently."""
+        results = []
+        for _, result, _ in self._fetch_concurrently(
+            self._get_references_from_geometry_request(
+                geometry, buffer, status, split_address
+            )
+            for geometry in geometries
+        ):
+            if result is None:
+                raise ValueError("Error retrieving references")
+            results.append(self._handle_references(result, split_address))
+        return results
+
+    def get_references_from_extent(
+        self,
+        extent: QgsRectangle,
+        status: Literal["Gällande", "Reserverad"] | None = None,
+        on_truncated: Callable[[QgsRectangle], None] | None = None,
+    ) -> list[BelagenhetsadressReference]:
+        """Get references to the addresses within an extent in EPSG:3006, tile by tile.
+
+        The tiles are fetched concurrently and split into smaller tiles where needed,
+        see `BaseClient._fetch_tiled`. Tiles which are still truncated at the smallest
+        size are passed to `on_truncated`."""
+        references: dict[str, BelagenhetsadressReference] = {}
+        for tile, result, _, truncated in self._fetch_tiled(
+            extent,
+            lambda tile: self._get_references_from_geometry_request(
+                QgsGeometry.fromRect(tile), 0, status, False
+            ),
+            lambda result: len(result) >= self.MAX_REFERENCES,
+        ):
+            if truncated and on_truncated is not None:
+                on_truncated(tile)
+            for reference in self._handle_references(result, False):
+                references.setdefault(reference["objektidentitet"], reference)
+        return list(references.values())
+
+    @staticmethod
+    def _get_references_from_geometry_request(
+        geometry: QgsGeometry | QgsReferencedGeometry,
+        buffer: int,
+        status: Literal["Gällande", "Reserverad"] | None,
+        split_address: bool,
+    ) -> Request:
         query = QUrlQuery()
         if isinstance(geometry, QgsReferencedGeometry):
             if not is_supported_crs(geometry.crs()):
@@ -554,21 +800,7 @@ class BelagenhetsadressDirektClient(BaseClient):
             "properties": {"name": geometry.crs().toOgcUrn()},
         }
         data = {"geometri": data, "buffer": buffer}
-
-        result = self._post("/referens/geometri", query, data)
-        if result is None:
-            raise ValueError("Error retrieving references")
-        if split_address:
-            return [
-                BelagenhetsadressReferenceWithComponents(
-                    objektidentitet=item["objektidentitet"],
-                    adress=item["adress"],
-                    **item["adressComponents"],
-                )
-                for item in result
-            ]
-        else:
-            return [BelagenhetsadressReference(**item) for item in result]
+        return Request("/referens/geometri", query, data)
 
     def autocomplete(
         self,
@@ -1,5 +1,5 @@
 import json
-from typing import Iterable, Literal, TypedDict
+from typing import Callable, Iterable, Iterator, Literal, TypedDict
 from uuid import UUID
 
 from qgis.core import (
@@ -8,11 +8,17 @@ from qgis.core import (
     QgsGeometry,
     QgsJsonUtils,
     QgsProject,
+    QgsRectangle,
     QgsReferencedGeometry,
 )
 from qgis.PyQt.QtCore import QUrlQuery, QUuid
 
-from lantmateriet_qgis.core.clients.base import BaseClient, coerce_uuid_to_str
+from lantmateriet_qgis.core.clients.base import (
+    BaseClient,
+    NetworkError,
+    Request,
+    coerce_uuid_to_str,
+)
 from lantmateriet_qgis.core.clients.direkt_utils import coerce_crs, is_supported_crs
 from lantmateriet_qgis.core.util import omit
 
@@ -72,6 +78,10 @@ class FastighetOchSamfallighetDirektClient(BaseClient):
     base_path = "/distribution/produkter/fastighetsamfallighet/v3.1"
 
     MAX_GET_MANY = 250
+    MAX_REFERENCES = 1000
+    """The number of references from a geometry at which a response is taken to be
+    truncated. If it is lower than the limit of the server, some tiles are split
+    without need, but no references are lost."""
 
     @classmethod
     def _handle_results(
@@ -85,13 +95,12 @@ class FastighetOchSamfallighetDirektClient(BaseClient):
             for result in results["features"]
         ]
 
-    def get_one(
-        self,
+    @staticmethod
+    def _get_one_request(
         id: str | UUID | QUuid,
-        include: IncludableData | Iterable[IncludableData] | None = None,
-        srid: QgsCoordinateReferenceSystem | None = None,
-    ) -> dict:
-        """Download a single property."""
+        include: IncludableData | Iterable[IncludableData] | None,
+        srid: QgsCoordinateReferenceSystem | None,
+    ) -> Request:
         query = QUrlQuery()
         if isinstance(include, str):
             query.addQueryItem("includeData", include)
@@ -99,10 +108,35 @@ class FastighetOchSamfallighetDirektClient(BaseClient):
             query.addQueryItem("includeData", ",".join(include))
         if srid is not None:
             query.addQueryItem("srid", str(coerce_crs(srid)))
+        return Request(f"/{coerce_uuid_to_str(id)}", query)
 
-        result = self._get(f"/{coerce_uuid_to_str(id)}", query)
+    def get_one(
+        self,
+        id: str | UUID | QUuid,
+        include: IncludableData | Iterable[IncludableData] | None = None,
+        srid: QgsCoordinateReferenceSystem | None = None,
+    ) -> dict:
+        """Download a single property."""
+        request = self._get_one_request(id, include, srid)
+        result = self._fetch_features(
+            [coerce_uuid_to_str(id)], request.query, lambda _: self._fetch(request)[0]
+        )
         return self._handle_results(include, srid, result)[0]
 
+    def get_one_batch(
+        self,
+        ids: Iterable[str | UUID | QUuid],
+        include: IncludableData | Iterable[IncludableData] | None = None,
+        srid: QgsCoordinateReferenceSystem | None = None,
+    ) -> list[dict]:
+        """Download single properties concurrently, one request per property."""
+        return [
+            self._handle_results(include, srid, result)[0]
+            for _, result, _ in self._fetch_concurrently(
+                self._get_one_request(id, include, srid) for id in ids
+            )
+        ]
+
     def get_many(
         self,
         ids: list[str | UUID | QUuid],
@@ -110,14 +144,62 @@ class FastighetOchSamfallighetDirektClient(BaseClient):
         srid: QgsCoordinateReferenceSystem | None = None,
     ) -> list[dict]:
         """Download many single properties."""
+        ids = [coerce_uuid_to_str(id) for id in ids]
+        results = self._fetch_features(
+            ids,
+            self._get_many_request([], include, srid).query,
+            lambda missing: self._fetch(self._get_many_request(missing, include, srid))[
+                0
+            ],
+        )
+        return self._handle_results(include, srid, results)
+
+    def get_many_chunked(
+        self,
+        ids: Iterable[str | UUID | QUuid],
+        include: IncludableData | Iterable[IncludableData] | None = None,
+        srid: QgsCoordinateReferenceSystem | None = None,
+        on_error: Callable[[str, NetworkError], None] | None = None,
+    ) -> Iterator[dict]:
+        """Download any number of properties, in concurrent chunks of at most `MAX_GET_MANY`.
+
+        Chunks rejected by the server are split in half and retried. Properties which
+        cannot be downloaded on their own are passed to `on_error` and skipped, or
+        raise if no `on_error` is given.
+        """
+        query = self._get_many_request([], include, srid).query
+        cached, missing = self._cached_features(
+            [coerce_uuid_to_str(id) for id in ids], query
+        )
+        if cached:
+            yield from self._handle_results(
+                include, srid, {"type": "FeatureCollection", "features": cached}
+            )
+        for results in self._fetch_bisecting(
+            missing,
+            self.MAX_GET_MANY,
+            lambda chunk: self._get_many_request(chunk, include, srid),
+            on_error,
+        ):
+            self._cache_features(query, results["features"])
+            yield from self._handle_results(include, srid, results)
+
+    @staticmethod
+    def _get_many_request(
+        ids: list[str | UUID | QUuid],
+        include: IncludableData | Iterable[IncludableData] | None,
+        srid: QgsCoordinateReferenceSystem | None,
+    ) -> Request:
         query = QUrlQuery()
-        query.addQueryItem("includeData", include or "basinformation")
+        if isinstance(include, str):
+            query.addQueryItem("includeData", include)
+        elif include is not None:
+            query.addQueryItem("includeData", ",".join(include))
+        else:
+            query.addQueryItem("includeData", "basinformation")
         if srid is not None:
             query.addQueryItem("srid", str(coerce_crs(srid)))
-
-        ids = [coerce_uuid_to_str(id) for id in ids]
-        results = self._post("/", query, ids)
-        return self._handle_results(include, srid, results)
+        return Request("/", query, [coerce_uuid_to_str(id) for id in ids])
 
     def get_references_from_aktbeteckning(
         self, text: str
@@ -128,11 +210,10 @@ class FastighetOchSamfallighetDirektClient(BaseClient):
         result = self._get("/referens/aktbeteckning", query)
         return [RegisterenhetsReference(**item) for item in result]
 
-    def get_references_from_geometry(
-        self, geometry: QgsGeometry | QgsReferencedGeometry, buffer: int = 0
-    ) -> list[RegisterenhetsReference]:
-        """Download property references based on a geometri."""
-        query = QUrlQuery()
+    @staticmethod
+    def _get_references_from_geometry_request(
+        geometry: QgsGeometry | QgsReferencedGeometry, buffer: int
+    ) -> Request:
         if isinstance(geometry, QgsReferencedGeometry):
             if not is_supported_crs(geometry.crs()):
                 transformer = QgsCoordinateTransform(
@@ -155,8 +236,57 @@ class FastighetOchSamfallighetDirektClient(BaseClient):
             "properties": {"name": geometry.crs().toOgcUrn()},
         }
         data = {"geometri": data, "buffer": buffer}
+        return Request("/referens/geometri", QUrlQuery(), data)
 
-        result = self._post("/referens/geometri", query, data)
+    def get_references_from_geometry(
+        self, geometry: QgsGeometry | QgsReferencedGeometry, buffer: int = 0
+    ) -> list[RegisterenhetsReference]:
+        """Download property references based on a geometri."""
+        result, _ = self._fetch(
+            self._get_references_from_geometry_request(geometry, buffer)
+        )
         if result is None:
             raise ValueError("Error retrieving references")
         return [RegisterenhetsReference(**item) for item in result]
+
+    def get_references_from_geometry_batch(
+        self,
+        geometries: Iterable[QgsGeometry | QgsReferencedGeometry],
+        buffer: int = 0,
+    ) -> list[list[RegisterenhetsReference]]:
+        """Download property references for several geometries concurrently."""
+        results = []
+        for _, result, _ in self._fetch_concurrently(
+            self._get_references_from_geometry_request(geometry, buffer)
+            for geometry in geometries
+        ):
+            if result is None:
+                raise ValueError("Error retrieving references")
+            results.append([RegisterenhetsReference(**item) for item in result])
+        return results
+
+    def get_references_from_extent(
+        self,
+        extent: QgsRectangle,
+        on_truncated: Callable[[QgsRectangle], None] | None = None,
+    ) -> list[RegisterenhetsReference]:
+        """Download the property references within an extent in EPSG:3006, tile by tile.
+
+        The tiles are fetched concurrently and split into smaller tiles where needed,
+        see `BaseClient._fetch_tiled`. Tiles which are still truncated at the smallest
+        size are passed to `on_truncated`."""
+        references: dict[str, RegisterenhetsReference] = {}
+        for tile, result, _, truncated in self._fetch_tiled(
+            extent,
+            lambda tile: self._get_references_from_geometry_request(
+                QgsGeometry.fromRect(tile), 0
+            ),
+            lambda result: len(result) >= self.MAX_REFERENCES,
+        ):
+            if truncated and on_truncated is not None:
+                on_truncated(tile)
+            for item in result:
+                references.setdefault(
+                    item["objektidentitet"], RegisterenhetsReference(**item)
+                )
+        return list(references.values())
@@ -1,5 +1,7 @@
+import itertools
 import json
-from typing import Iterable, Literal, TypedDict, overload
+from collections import defaultdict
+from typing import Iterable, Iterator, Literal, TypedDict, overload
 
 from qgis.core import (
     QgsCoordinateReferenceSystem,
@@ -7,12 +9,14 @@ from qgis.core import (
     QgsGeometry,
     QgsJsonUtils,
     QgsProject,
+    QgsRectangle,
     QgsReferencedGeometry,
 )
-from qgis.PyQt.QtCore import QDateTime, Qt, QUrlQuery
+from qgis.PyQt.QtCore import QDateTime, Qt, QUrl, QUrlQuery
 
-from lantmateriet_qgis.core.clients.base import BaseClient
+from lantmateriet_qgis.core.clients.base import BaseClient, NetworkError, Request
 from lantmateriet_qgis.core.util import cql2, omit
+from lantmateriet_qgis.core.util.geojson_stream import FeatureCollectionParser
 
 Collection = Literal[
     "registerenhetsomradesytor",
@@ -65,34 +69,73 @@ class FastighetsindelningDirektClient(BaseClient):
 
     base_path = "/ogc-features/v1/fastighetsindelning"
 
+    PAGE_SIZE = 1000
+    MAX_FILTER_LENGTH = 4000
+
     def find_registerenheter(
         self, collection: Collection, filter: dict, limit: int = 10
     ) -> list[Registerenhet]:
         """Find a list of properties based on a CQL2 filter."""
 
+        response = self.get_omraden(collection, self._find_query(filter, limit), False)
+        return [self._to_registerenhet_summary(feature) for feature in response]
+
+    def iter_found_registerenheter(
+        self, searches: Iterable[tuple[Collection, dict]], limit: int = 10
+    ) -> Iterator[tuple[int, list[Registerenhet] | NetworkError]]:
+        """Find properties for several collections and CQL2 filters, concurrently.
+
+        Yields `(index, registerenheter)` for each search as soon as its response
+        arrives, with the `NetworkError` of a failed search in place of its results.
+        Closing the iterator aborts the searches still in flight."""
+
+        for index, response, headers in self._fetch_concurrently(
+            (
+                Request(
+                    f"/collections/{collection}/items", self._find_query(filter, limit)
+                )
+                for collection, filter in searches
+            ),
+            ordered=False,
+            return_errors=True,
+        ):
+            if isinstance(response, NetworkError):
+                yield index, response
+            else:
+                yield (
+                    index,
+                    [
+                        self._to_registerenhet_summary(omrade)
+                        for omrade in self._handle_omraden(response, headers, False)
+                    ],
+                )
+
+    @staticmethod
+    def _find_query(filter: dict, limit: int) -> QUrlQuery:
         query = QUrlQuery()
         query.addQueryItem("filter", json.dumps(filter))
         query.addQueryItem("filter-lang", "cql2-json")
         query.addQueryItem("limit", str(limit))
         query.addQueryItem("omradesnummer", "1")
-        response = self.get_omraden(collection, query, False)
-        return [
-            Registerenhet(
-                **omit(
-                    feature,
-                    (
-                        "geometry",
-                        "omradesnummer",
-                        "objektidentitet",
-                        "registerenhetsreferens",
-                        "beteckning",
-                    ),
+        return query
+
+    @staticmethod
+    def _to_registerenhet_summary(omrade: RegisterenhetsOmrade) -> Registerenhet:
+        """Describe the property of its first area, without its geometry."""
+        return Registerenhet(
+            **omit(
+                omrade,
+                (
+                    "geometry",
+                    "omradesnummer",
+                    "objektidentitet",
+                    "registerenhetsreferens",
+                    "beteckning",
                 ),
-                objektidentitet=feature["registerenhetsreferens"],
-                beteckning=format_beteckning(feature),
-            )
-            for feature in response
-        ]
+            ),
+            objektidentitet=omrade["registerenhetsreferens"],
+            beteckning=format_beteckning(omrade),
+        )
 
     @overload
     def get_omrade_at_point(
@@ -146,6 +189,7 @@ class FastighetsindelningDirektClient(BaseClient):
         rect: QgsGeometry,
         crs: QgsCoordinateReferenceSystem,
         with_geometry: Literal[True] = False,
+        page_size: int | None = None,
     ) -> list[RegisterenhetsOmradeWithGeometry]: ...
     @overload
     def get_omraden_at_rect(
@@ -154,6 +198,7 @@ class FastighetsindelningDirektClient(BaseClient):
         rect: QgsGeometry,
         crs: QgsCoordinateReferenceSystem,
         with_geometry: Literal[False] = False,
+        page_size: int | None = None,
     ) -> list[RegisterenhetsOmrade]: ...
     def get_omraden_at_rect(
         self,
@@ -161,9 +206,24 @@ class FastighetsindelningDirektClient(BaseClient):
         rect: QgsGeometry,
         crs: QgsCoordinateReferenceSystem,
         with_geometry: Literal[True, False] = False,
+        page_size: int | None = None,
     ) -> list[RegisterenhetsOmrade | RegisterenhetsOmradeWithGeometry]:
         """Get all registerenhetsområden within a given rectangle."""
 
+        return list(
+            self.iter_omraden_at_rect(collection, rect, crs, with_geometry, page_size)
+        )
+
+    def iter_omraden_at_rect(
+        self,
+        collection: Collection,
+        rect: QgsGeometry,
+        crs: QgsCoordinateReferenceSystem,
+        with_geometry: bool = False,
+        page_size: int | None = None,
+    ) -> Iterator[RegisterenhetsOmrade | RegisterenhetsOmradeWithGeometry]:
+        """Get all registerenhetsområden within a given rectangle, page by page."""
+
         query = QUrlQuery()
         if crs.authid() not in ("EPSG:3006", "EPSG:4326"):
             transformer = QgsCoordinateTransform(
@@ -178,8 +238,53 @@ class FastighetsindelningDirektClient(BaseClient):
             f"{rect.boundingBox().yMinimum()},{rect.boundingBox().xMinimum()},{rect.boundingBox().yMaximum()},{rect.boundingBox().xMaximum()}",
         )
         query.addQueryItem("bbox-crs", crs.toOgcUri())
-        query.addQueryItem("limit", "10000")
-        return self.get_omraden(collection, query, with_geometry)
+        return self.iter_omraden_paged(collection, query, with_geometry, page_size)
+
+    def iter_omraden_tiled(
+        self,
+        collection: Collection,
+        extent: QgsRectangle,
+        with_geometry: bool = False,
+        page_size: int | None = None,
+    ) -> Iterator[RegisterenhetsOmrade | RegisterenhetsOmradeWithGeometry]:
+        """Get all registerenhetsområden within an extent in EPSG:3006, tile by tile.
+
+        The tiles are fetched concurrently, and a tile with more than one page of
+        results is split into smaller tiles, see `BaseClient._fetch_tiled`. The pages
+        of a tile which cannot be split further are followed instead. Områden on the
+        border between tiles are only yielded once."""
+
+        crs = QgsCoordinateReferenceSystem.fromEpsgId(3006)
+        page_size = page_size or self.PAGE_SIZE
+
+        def make_request(tile: QgsRectangle) -> Request:
+            query = QUrlQuery()
+            query.addQueryItem(
+                "bbox",
+                f"{tile.yMinimum()},{tile.xMinimum()},{tile.yMaximum()},{tile.xMaximum()}",
+            )
+            query.addQueryItem("bbox-crs", crs.toOgcUri())
+            query.addQueryItem("limit", str(page_size))
+            return Request(f"/collections/{collection}/items", query)
+
+        seen: set[str] = set()
+        for _, response, headers, truncated in self._fetch_tiled(
+            extent,
+            make_request,
+            lambda response: self._next_query(response) is not None,
+        ):
+            omraden = self._handle_omraden(response, headers, with_geometry)
+            if truncated:
+                omraden = itertools.chain(
+                    omraden,
+                    self.iter_omraden_paged(
+                        collection, self._next_query(response), with_geometry, page_size
+                    ),
+                )
+            for omrade in omraden:
+                if omrade["objektidentitet"] not in seen:
+                    seen.add(omrade["objektidentitet"])
+                    yield omrade
 
     @overload
     def get_omraden(
@@ -200,19 +305,110 @@ class FastighetsindelningDirektClient(BaseClient):
     ) -> list[RegisterenhetsOmrade | RegisterenhetsOmradeWithGeometry]:
         """Get all registerenhetsområden based on a URL query."""
 
-        response, headers = self._get_with_headers(
-            f"/collections/{collection}/items", query
-        )
+        return list(self.iter_omraden(collection, query, with_geometry))
 
+    def iter_omraden(
+        self,
+        collection: Collection,
+        query: QUrlQuery,
+        with_geometry: bool = False,
+        parser: FeatureCollectionParser | None = None,
+    ) -> Iterator[RegisterenhetsOmrade | RegisterenhetsOmradeWithGeometry]:
+        """Get all registerenhetsområden based on a URL query, as they are downloaded.
+
+        The response is decoded incrementally, so that large responses are never held
+        in memory in full. The other members of the response (e.g. `links`) are found
+        on `parser` after the iteration, if one is given."""
+
+        crs = None
+        for feature, headers in self._fetch_streaming(
+            Request(f"/collections/{collection}/items", query),
+            parser or FeatureCollectionParser(),
+        ):
+            if crs is None:
+                crs = self._content_crs(headers)
+            yield self._to_omrade(feature, crs, with_geometry)
+
+    def iter_omraden_paged(
+        self,
+        collection: Collection,
+        query: QUrlQuery,
+        with_geometry: bool = False,
+        page_size: int | None = None,
+    ) -> Iterator[RegisterenhetsOmrade | RegisterenhetsOmradeWithGeometry]:
+        """Get all registerenhetsområden based on a URL query, following the `next` links.
+
+        Pages of `page_size` features are requested one after the other and decoded as
+        they arrive, so that the number of results is not limited by the page size and
+        only one feature is held in memory at a time."""
+
+        query = QUrlQuery(query)
+        query.removeAllQueryItems("limit")
+        query.addQueryItem("limit", str(page_size or self.PAGE_SIZE))
+        while True:
+            parser = FeatureCollectionParser()
+            count = 0
+            for omrade in self.iter_omraden(collection, query, with_geometry, parser):
+                count += 1
+                yield omrade
+            next_query = self._next_query(parser.members)
+            if (
+                count == 0
+                or next_query is None
+                or next_query.toString() == query.toString()
+            ):
+                return
+            query = next_query
+
+    @staticmethod
+    def _next_query(members: dict) -> QUrlQuery | None:
+        # only the query of the link is used, since the host and path in it may not be
+        # the ones the client is configured with, e.g. behind a proxy
+        for link in members.get("links", []):
+            if link.get("rel") == "next" and link.get("href"):
+                return QUrlQuery(QUrl(link["href"]))
+        return None
+
+    def get_omraden_batch(
+        self,
+        collection: Collection,
+        queries: Iterable[QUrlQuery],
+        with_geometry: bool = False,
+    ) -> list[list[RegisterenhetsOmrade | RegisterenhetsOmradeWithGeometry]]:
+        """Get the registerenhetsområden for each of the URL queries, concurrently."""
+
+        return [
+            self._handle_omraden(response, headers, with_geometry)
+            for _, response, headers in self._fetch_concurrently(
+                Request(f"/collections/{collection}/items", query) for query in queries
+            )
+        ]
+
+    @classmethod
+    def _handle_omraden(
+        cls, response: dict, headers: dict, with_geometry: bool
+    ) -> list[RegisterenhetsOmrade | RegisterenhetsOmradeWithGeometry]:
+        crs = cls._content_crs(headers)
+        return [
+            cls._to_omrade(feature, crs, with_geometry)
+            for feature in response["features"]
+        ]
+
+    @staticmethod
+    def _content_crs(headers: dict) -> QgsCoordinateReferenceSystem:
         crs_header = headers.get("content-crs", "").replace("<", "").replace(">", "")
         if crs_header == "http://www.opengis.net/def/crs/OGC/1.3/CRS84":
-            crs = QgsCoordinateReferenceSystem.fromEpsgId(4326)
+            return QgsCoordinateReferenceSystem.fromEpsgId(4326)
         elif crs_header.startswith("http://www.opengis.net/def/crs/EPSG/0/"):
             epsg_id = int(crs_header.rpartition("EPSG/0/")[2])
-            crs = QgsCoordinateReferenceSystem.fromEpsgId(epsg_id)
+            return QgsCoordinateReferenceSystem.fromEpsgId(epsg_id)
         else:
             raise ValueError(f"Unsupported CRS: {crs_header}")
 
+    @staticmethod
+    def _to_omrade(
+        feature: dict, crs: QgsCoordinateReferenceSystem, with_geometry: bool
+    ) -> RegisterenhetsOmrade | RegisterenhetsOmradeWithGeometry:
         def maybe_flip(geometry: QgsGeometry) -> QgsGeometry:
             if crs.authid() == "EPSG:4326":
                 return geometry
@@ -221,85 +417,242 @@ class FastighetsindelningDirektClient(BaseClient):
             return QgsGeometry(absgeom.clone())
 
         if with_geometry:
-            return [
-                RegisterenhetsOmradeWithGeometry(
-                    **omit(
-                        feature["properties"],
-                        ("senastandrad", "geometry", "beteckning"),
-                    ),
-                    senastandrad=QDateTime.fromString(
-                        feature["properties"]["senastandrad"], Qt.DateFormat.ISODate
-                    ),
-                    geometry=QgsReferencedGeometry(
-                        maybe_flip(
-                            QgsJsonUtils.geometryFromGeoJson(
-                                json.dumps(feature["geometry"])
-                            )
-                        ),
-                        crs,
+            return RegisterenhetsOmradeWithGeometry(
+                **omit(
+                    feature["properties"],
+                    ("senastandrad", "geometry", "beteckning"),
+                ),
+                senastandrad=QDateTime.fromString(
+                    feature["properties"]["senastandrad"], Qt.DateFormat.ISODate
+                ),
+                geometry=QgsReferencedGeometry(
+                    maybe_flip(
+                        QgsJsonUtils.geometryFromGeoJson(
+                            json.dumps(feature["geometry"])
+                        )
                     ),
-                    beteckning=f"{feature['properties']['kommunnamn']} {feature['properties']['trakt']} {feature['properties']['etikett']}",
-                )
-                for feature in response["features"]
-            ]
+                    crs,
+                ),
+                beteckning=f"{feature['properties']['kommunnamn']} {feature['properties']['trakt']} {feature['properties']['etikett']}",
+            )
         else:
-            return [
-                RegisterenhetsOmrade(
-                    **omit(feature["properties"], ("senastandrad", "beteckning")),
-                    senastandrad=QDateTime.fromString(
-                        feature["properties"]["senastandrad"], Qt.DateFormat.ISODate
-                    ),
-                    beteckning=f"{feature['properties']['kommunnamn']} {feature['properties']['trakt']} {feature['properties']['etikett']}",
-                )
-                for feature in response["features"]
-            ]
+            return RegisterenhetsOmrade(
+                **omit(feature["properties"], ("senastandrad", "beteckning")),
+                senastandrad=QDateTime.fromString(
+                    feature["properties"]["senastandrad"], Qt.DateFormat.ISODate
+                ),
+                beteckning=f"{feature['properties']['kommunnamn']} {feature['properties']['trakt']} {feature['properties']['etikett']}",
+            )
 
     def get_registerenheter(
-        self, collection: Collection, ids: Iterable[str]
+        self, collection: Collection, ids: Iterable[str], page_size: int | None = None
     ) -> dict[str, Registerenhet] | None:
         """Get full representations of the requested properties."""
 
-        query = QUrlQuery()
-        if len(ids) == 1:
-            query.addQueryItem("registerenhetsreferens", list(ids)[0])
-        else:
+        return {
+            registerenhet["objektidentitet"]: registerenhet
+            for registerenhet in self.iter_registerenheter(collection, ids, page_size)
+        }
+
+    def get_registerenheter_batch(
+        self, ids: dict[Collection, Iterable[str]]
+    ) -> dict[str, Registerenhet]:
+        """Get full representations of properties in several collections, concurrently.
+
+        The chunks of ids of all collections are requested at once, and the pages of a
+        chunk with more areas than fit on one page are followed afterwards."""
+
+        crs = QgsCoordinateReferenceSystem.fromEpsgId(3006)
+        requests: list[tuple[Collection, Request]] = []
+        for collection, collection_ids in ids.items():
+            for chunk in self._chunk_ids(collection_ids):
+                query = self._registerenheter_query(chunk)
+                query.addQueryItem("crs", crs.toOgcUri())
+                query.addQueryItem("limit", str(self.PAGE_SIZE))
+                requests.append(
+                    (collection, Request(f"/collections/{collection}/items", query))
+                )
+
+        grouped: dict[str, list[RegisterenhetsOmradeWithGeometry]] = defaultdict(list)
+        for index, response, headers in self._fetch_concurrently(
+            request for _, request in requests
+        ):
+            omraden = self._handle_omraden(response, headers, True)
+            next_query = self._next_query(response)
+            if next_query is not None:
+                omraden = itertools.chain(
+                    omraden,
+                    self.iter_omraden_paged(requests[index][0], next_query, True),
+                )
+            for omrade in omraden:
+                grouped[omrade["registerenhetsreferens"]].append(omrade)
+        return {id: self._to_registerenhet(omraden) for id, omraden in grouped.items()}
+
+    def iter_registerenheter(
+        self, collection: Collection, ids: Iterable[str], page_size: int | None = None
+    ) -> Iterator[Registerenhet]:
+        """Get full representations of the requested properties, a chunk at a time.
+
+        The ids are requested in chunks which keep the encoded filter below
+        `MAX_FILTER_LENGTH` characters, and all areas of the properties in a chunk are
+        fetched before they are merged and yielded."""
+
+        for chunk in self._chunk_ids(ids):
+            query = self._registerenheter_query(chunk)
+            query.addQueryItem(
+                "crs", QgsCoordinateReferenceSystem.fromEpsgId(3006).toOgcUri()
+            )
+            grouped: dict[str, list[RegisterenhetsOmradeWithGeometry]] = defaultdict(
+                list
+            )
+            for omrade in self.iter_omraden_paged(collection, query, True, page_size):
+                grouped[omrade["registerenhetsreferens"]].append(omrade)
+            for id in chunk:
+                if id in grouped:
+                    yield self._to_registerenhet(grouped.pop(id))
+
+    def iter_omraden_by_id(
+        self,
+        collection: Collection,
+        ids: Iterable[str],
+        with_geometry: bool = False,
+        page_size: int | None = None,
+    ) -> Iterator[RegisterenhetsOmrade | RegisterenhetsOmradeWithGeometry]:
+        """Get the registerenhetsområden with the given objektidentitet, a chunk at a time."""
+
+        for chunk in self._chunk_ids(ids):
+            query = QUrlQuery()
             query.addQueryItem(
                 "filter",
-                json.dumps(
-                    cql2.in_(cql2.property("registerenhetsreferens"), list(ids))
-                ),
+                json.dumps(cql2.in_(cql2.property("objektidentitet"), chunk)),
             )
             query.addQueryItem("filter-lang", "cql2-json")
-        query.addQueryItem("limit", "1000")
+            if with_geometry:
+                query.addQueryItem(
+                    "crs", QgsCoordinateReferenceSystem.fromEpsgId(3006).toOgcUri()
+                )
+            yield from self.iter_omraden_paged(
+                collection, query, with_geometry, page_size
+            )
+
+    def iter_omraden_in_kommun(
+        self,
+        collection: Collection,
+        kommunkod: str,
+        with_geometry: bool = False,
+        page_size: int | None = None,
+    ) -> Iterator[RegisterenhetsOmrade | RegisterenhetsOmradeWithGeometry]:
+        """Get all registerenhetsområden in a municipality, page by page."""
+
+        query = QUrlQuery()
         query.addQueryItem(
-            "crs", QgsCoordinateReferenceSystem.fromEpsgId(3006).toOgcUri()
+            "filter", json.dumps(cql2.equals(cql2.property("kommunkod"), kommunkod))
         )
-        response = self.get_omraden(collection, query, True)
-        response = {
-            id: [fg for fg in response if fg["registerenhetsreferens"] == id]
-            for id in ids
-        }
-        return {
-            id: Registerenhet(
-                **omit(
-                    omraden[0],
-                    (
-                        "senastandrad",
-                        "geometry",
-                        "beteckning",
-                        "registerenhetsreferens",
-                        "objektidentitet",
-                        "etikett",
-                    ),
-                ),
-                objektidentitet=omraden[0]["registerenhetsreferens"],
-                senastandrad=max(omrade["senastandrad"] for omrade in omraden),
-                geometry=QgsReferencedGeometry(
-                    QgsGeometry.unaryUnion([omrade["geometry"] for omrade in omraden]),
-                    omraden[0]["geometry"].crs(),
-                ),
-                etikett=omraden[0]["etikett"].split(">")[0],
-                beteckning=format_beteckning(omraden[0]),
+        query.addQueryItem("filter-lang", "cql2-json")
+        if with_geometry:
+            query.addQueryItem(
+                "crs", QgsCoordinateReferenceSystem.fromEpsgId(3006).toOgcUri()
             )
-            for id, omraden in response.items()
+        return self.iter_omraden_paged(collection, query, with_geometry, page_size)
+
+    def get_existing_references(
+        self, collection: Collection, ids: Iterable[str], page_size: int | None = None
+    ) -> set[str]:
+        """Find which of the given properties still have any areas in a collection."""
+
+        existing: set[str] = set()
+        for chunk in self._chunk_ids(ids):
+            for omrade in self.iter_omraden_paged(
+                collection, self._registerenheter_query(chunk), False, page_size
+            ):
+                existing.add(omrade["registerenhetsreferens"])
+        return existing
+
+    def get_changed_references(
+        self,
+        collection: Collection,
+        since: QDateTime,
+        extent: QgsRectangle,
+        crs: QgsCoordinateReferenceSystem,
+        page_size: int | None = None,
+    ) -> set[str]:
+        """Find the properties with areas within an extent changed after a given time."""
+
+        query = QUrlQuery()
+        query.addQueryItem(
+            "bbox",
+            f"{extent.yMinimum()},{extent.xMinimum()},{extent.yMaximum()},{extent.xMaximum()}",
+        )
+        query.addQueryItem("bbox-crs", crs.toOgcUri())
+        query.addQueryItem(
+            "filter",
+            json.dumps(
+                cql2.greater_than(
+                    cql2.property("senastandrad"),
+                    cql2.timestamp(since.toUTC().toString(Qt.DateFormat.ISODate)),
+                )
+            ),
+        )
+        query.addQueryItem("filter-lang", "cql2-json")
+        return {
+            omrade["registerenhetsreferens"]
+            for omrade in self.iter_omraden_paged(collection, query, False, page_size)
         }
+
+    @staticmethod
+    def _registerenheter_query(ids: list[str]) -> QUrlQuery:
+        query = QUrlQuery()
+        if len(ids) == 1:
+            query.addQueryItem("registerenhetsreferens", ids[0])
+        else:
+            query.addQueryItem(
+                "filter",
+                json.dumps(cql2.in_(cql2.property("registerenhetsreferens"), ids)),
+            )
+            query.addQueryItem("filter-lang", "cql2-json")
+        return query
+
+    def _chunk_ids(self, ids: Iterable[str]) -> Iterator[list[str]]:
+        chunk: list[str] = []
+        length = 0
+        for id in ids:
+            # the length of the id as a quoted and comma separated member of the filter
+            id_length = len(QUrl.toPercentEncoding(json.dumps(id))) + 6
+            if chunk and length + id_length > self.MAX_FILTER_LENGTH:
+                yield chunk
+                chunk, length = [], 0
+            chunk.append(id)
+            length += id_length
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _to_registerenhet(
+        omraden: list[RegisterenhetsOmradeWithGeometry],
+    ) -> Registerenhet:
+        first = omraden[0]
+        if len(omraden) == 1:
+            geometry = QgsGeometry(first["geometry"])
+        else:
+            # one union of all areas, rather than merging them one at a time
+            geometry = QgsGeometry.unaryUnion(
+                [omrade["geometry"] for omrade in omraden]
+            )
+        return Registerenhet(
+            **omit(
+                first,
+                (
+                    "senastandrad",
+                    "geometry",
+                    "beteckning",
+                    "registerenhetsreferens",
+                    "objektidentitet",
+                    "etikett",
+                ),
+            ),
+            objektidentitet=first["registerenhetsreferens"],
+            senastandrad=max(omrade["senastandrad"] for omrade in omraden),
+            geometry=QgsReferencedGeometry(geometry, first["geometry"].crs()),
+            etikett=first["etikett"].split(">")[0],
+            beteckning=format_beteckning(first),
+        )
@@ -12,7 +12,11 @@ from qgis.core import (
 )
 from qgis.PyQt.QtCore import QUrlQuery, QUuid
 
-from lantmateriet_qgis.core.clients.base import BaseClient, coerce_uuid_to_str
+from lantmateriet_qgis.core.clients.base import (
+    BaseClient,
+    Request,
+    coerce_uuid_to_str,
+)
 from lantmateriet_qgis.core.clients.direkt_utils import coerce_crs, is_supported_crs
 
 
@@ -52,13 +56,12 @@ class GemensamhetsanlaggningDirektClient(BaseClient):
             for result in results["features"]
         ]
 
-    def get_one(
-        self,
+    @staticmethod
+    def _get_one_request(
         id: str | UUID | QUuid,
-        include: IncludableData | Iterable[IncludableData] | None = None,
-        srid: QgsCoordinateReferenceSystem | None = None,
-    ) -> dict:
-        """Get a single gemensamhetsanläggning."""
+        include: IncludableData | Iterable[IncludableData] | None,
+        srid: QgsCoordinateReferenceSystem | None,
+    ) -> Request:
         query = QUrlQuery()
         if isinstance(include, str):
             query.addQueryItem("includeData", include)
@@ -66,10 +69,35 @@ class GemensamhetsanlaggningDirektClient(BaseClient):
             query.addQueryItem("includeData", ",".join(include))
         if srid is not None:
             query.addQueryItem("srid", str(coerce_crs(srid)))
+        return Request(f"/{coerce_uuid_to_str(id)}", query)
 
-        result = self._get(f"/{coerce_uuid_to_str(id)}", query)
+    def get_one(
+        self,
+        id: str | UUID | QUuid,
+        include: IncludableData | Iterable[IncludableData] | None = None,
+        srid: QgsCoordinateReferenceSystem | None = None,
+    ) -> dict:
+        """Get a single gemensamhetsanläggning."""
+        request = self._get_one_request(id, include, srid)
+        result = self._fetch_features(
+            [coerce_uuid_to_str(id)], request.query, lambda _: self._fetch(request)[0]
+        )
         return self._handle_results(include, srid, result)[0]
 
+    def get_one_batch(
+        self,
+        ids: Iterable[str | UUID | QUuid],
+        include: IncludableData | Iterable[IncludableData] | None = None,
+        srid: QgsCoordinateReferenceSystem | None = None,
+    ) -> list[dict]:
+        """Get single gemensamhetsanläggningar concurrently, one request each."""
+        return [
+            self._handle_results(include, srid, result)[0]
+            for _, result, _ in self._fetch_concurrently(
+                self._get_one_request(id, include, srid) for id in ids
+            )
+        ]
+
     def get_many(
         self,
         ids: list[str | UUID | QUuid],
@@ -84,7 +112,9 @@ class GemensamhetsanlaggningDirektClient(BaseClient):
             query.addQueryItem("srid", str(coerce_crs(srid)))
 
         ids = [coerce_uuid_to_str(id) for id in ids]
-        results = self._post("/", query, ids)
+        results = self._fetch_features(
+            ids, query, lambda missing: self._post("/", query, missing)
+        )
         return self._handle_results(include, srid, results)
 
     def get_references_from_text(
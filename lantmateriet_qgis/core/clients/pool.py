@@ -0,0 +1,37 @@
+import threading
+from typing import TypeVar
+
+from qgis.core import QgsFeedback
+
+from lantmateriet_qgis.core.clients.base import BaseClient
+from lantmateriet_qgis.core.util.response_cache import ResponseCache
+
+C = TypeVar("C", bound=BaseClient)
+
+
+class ClientPool:
+    """Process-wide pool of clients, keyed by base URL, authcfg and base path.
+
+    Pooled clients keep one blocking network request per thread, with its
+    authentication set up, instead of one per client. Callers get a copy of the
+    pooled client bound to their own feedback and cache, so that the pooled client
+    never holds on to a caller's feedback."""
+
+    _clients: dict[tuple[str, str, str], BaseClient] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(
+        cls,
+        client_class: type[C],
+        base_url: str,
+        authcfg: str,
+        feedback: QgsFeedback | None = None,
+        cache: ResponseCache | None = None,
+    ) -> C:
+        key = (base_url, authcfg, client_class.base_path)
+        with cls._lock:
+            client = cls._clients.get(key)
+            if client is None or type(client) is not client_class:
+                client = cls._clients[key] = client_class(base_url, authcfg)
+        return client.bind(feedback, cache)
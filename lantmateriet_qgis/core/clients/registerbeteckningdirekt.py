@@ -1,5 +1,5 @@
 import json
-from typing import Literal, TypedDict
+from typing import Callable, Iterable, Literal, TypedDict
 from uuid import UUID
 
 from qgis.core import (
@@ -13,7 +13,12 @@ from qgis.core import (
 )
 from qgis.PyQt.QtCore import QUrlQuery, QUuid
 
-from lantmateriet_qgis.core.clients.base import BaseClient, coerce_uuid_to_str
+from lantmateriet_qgis.core.clients.base import (
+    BaseClient,
+    NetworkError,
+    Request,
+    coerce_uuid_to_str,
+)
 from lantmateriet_qgis.core.clients.belagenhetsadressdirekt import (
     Utbytesobjekt,
 )
@@ -69,6 +74,12 @@ class RegisterbeteckningsReference(TypedDict):
     beteckning: str
 
 
+def format_registerbeteckning(registerbeteckning: Registerbeteckning) -> str:
+    block = registerbeteckning["block"]
+    enhet = registerbeteckning["enhet"]
+    return f"{registerbeteckning['registeromrade']} {registerbeteckning['trakt']} {f'{block}:{enhet}' if block else enhet}"
+
+
 def from_feature(data: dict, crs: QgsCoordinateReferenceSystem) -> dict:
     if "geometry" in data and data["geometry"] is not None:
         geometry = QgsJsonUtils.geometryFromGeoJson(json.dumps(data["geometry"]))
@@ -92,17 +103,38 @@ class RegisterbeteckningDirektClient(BaseClient):
             for result in results["features"]
         ]
 
-    def get_one(
-        self, id: str | UUID | QUuid, srid: QgsCoordinateReferenceSystem | None = None
-    ) -> Beteckning:
-        """Resolve a single designation."""
+    @staticmethod
+    def _get_one_request(
+        id: str | UUID | QUuid, srid: QgsCoordinateReferenceSystem | None
+    ) -> Request:
         query = QUrlQuery()
         if srid is not None:
             query.addQueryItem("srid", str(coerce_crs(srid)))
+        return Request(f"/{coerce_uuid_to_str(id)}", query)
 
-        result = self._get(f"/{coerce_uuid_to_str(id)}", query)
+    def get_one(
+        self, id: str | UUID | QUuid, srid: QgsCoordinateReferenceSystem | None = None
+    ) -> Beteckning:
+        """Resolve a single designation."""
+        request = self._get_one_request(id, srid)
+        result = self._fetch_features(
+            [coerce_uuid_to_str(id)], request.query, lambda _: self._fetch(request)[0]
+        )
         return self._handle_results(srid, result)[0]
 
+    def get_one_batch(
+        self,
+        ids: Iterable[str | UUID | QUuid],
+        srid: QgsCoordinateReferenceSystem | None = None,
+    ) -> list[Beteckning]:
+        """Resolve single designations concurrently, one request each."""
+        return [
+            self._handle_results(srid, result)[0]
+            for _, result, _ in self._fetch_concurrently(
+                self._get_one_request(id, srid) for id in ids
+            )
+        ]
+
     def get_many(
         self,
         ids: list[str | UUID | QUuid],
@@ -114,7 +146,9 @@ class RegisterbeteckningDirektClient(BaseClient):
             query.addQueryItem("srid", str(coerce_crs(srid)))
 
         ids = [coerce_uuid_to_str(id) for id in ids]
-        results = self._post("/", query, ids)
+        results = self._fetch_features(
+            ids, query, lambda missing: self._post("/", query, missing)
+        )
         return self._handle_results(srid, results)
 
     def get_by_name(
@@ -132,6 +166,26 @@ class RegisterbeteckningDirektClient(BaseClient):
             result = self._post("/namn", query, name)
         return self._handle_results(srid, result)
 
+    def get_by_name_batch(
+        self,
+        names: Iterable[str],
+        srid: QgsCoordinateReferenceSystem | None = None,
+    ) -> list[list[Beteckning]]:
+        """Find designations matching each of the given names, concurrently.
+
+        Unlike `get_by_name` with a list, the results are kept apart per name."""
+        requests = []
+        for name in names:
+            query = QUrlQuery()
+            if srid is not None:
+                query.addQueryItem("srid", str(coerce_crs(srid)))
+            query.addQueryItem("namn", name)
+            requests.append(Request("/namn", query))
+        return [
+            self._handle_results(srid, result)
+            for _, result, _ in self._fetch_concurrently(requests)
+        ]
+
     def get_by_belongs_to(
         self,
         belongs_to: str | UUID | QUuid,
@@ -145,13 +199,11 @@ class RegisterbeteckningDirektClient(BaseClient):
         result = self._get(f"/tillhor/{coerce_uuid_to_str(belongs_to)}", query)
         return self._handle_results(srid, result)
 
-    def get_by_point(
-        self,
+    @staticmethod
+    def _get_by_point_request(
         point: QgsGeometry | QgsReferencedGeometry,
-        srid: QgsCoordinateReferenceSystem | None = None,
-    ) -> list[Beteckning]:
-        """Find designations overlapping a given point."""
-
+        srid: QgsCoordinateReferenceSystem | None,
+    ) -> Request:
         query = QUrlQuery()
         if srid is not None:
             query.addQueryItem("srid", str(coerce_crs(srid)))
@@ -171,10 +223,39 @@ class RegisterbeteckningDirektClient(BaseClient):
         except TypeError:
             raise ValueError("Invalid geometry type. Expected a point.")
         query.addQueryItem("koordinater", f"{point.y()},{point.x()}")
+        return Request("/punkt", query)
 
-        result = self._get("/punkt", query)
+    def get_by_point(
+        self,
+        point: QgsGeometry | QgsReferencedGeometry,
+        srid: QgsCoordinateReferenceSystem | None = None,
+    ) -> list[Beteckning]:
+        """Find designations overlapping a given point."""
+        result, _ = self._fetch(self._get_by_point_request(point, srid))
         return self._handle_results(srid, result)
 
+    def get_by_point_batch(
+        self,
+        points: Iterable[QgsGeometry | QgsReferencedGeometry],
+        srid: QgsCoordinateReferenceSystem | None = None,
+        on_error: Callable[[int, NetworkError], None] | None = None,
+    ) -> list[list[Beteckning]]:
+        """Find designations overlapping each of the given points, concurrently.
+
+        Points which fail are passed to `on_error` by index and get no designations, or
+        raise if no `on_error` is given."""
+        results = []
+        for index, result, _ in self._fetch_concurrently(
+            (self._get_by_point_request(point, srid) for point in points),
+            return_errors=on_error is not None,
+        ):
+            if isinstance(result, NetworkError):
+                on_error(index, result)
+                results.append([])
+            else:
+                results.append(self._handle_results(srid, result))
+        return results
+
     def get_references_from_text(
         self,
         text: str,
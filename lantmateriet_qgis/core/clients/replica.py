@@ -0,0 +1,282 @@
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+from typing import Iterator
+
+from qgis.core import (
+    Qgis,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransformContext,
+    QgsFeature,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsPointXY,
+    QgsReferencedGeometry,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+)
+from qgis.PyQt.QtCore import QDateTime, QMetaType, Qt
+
+from lantmateriet_qgis.core.clients.fastighetsindelningdirekt import (
+    FastighetsindelningDirektClient,
+    Registerenhet,
+    RegisterenhetsOmrade,
+    RegisterenhetsOmradeWithGeometry,
+    format_beteckning,
+)
+from lantmateriet_qgis.core.util import cql2, omit
+from lantmateriet_qgis.core.util.designation_index import IndexEntry
+
+COLLECTION = "registerenhetsomradesytor"
+
+ATTRIBUTES = {
+    "objektidentitet": QMetaType.Type.QString,
+    "registerenhetsreferens": QMetaType.Type.QString,
+    "objekttyp": QMetaType.Type.QString,
+    # stored as text in UTC, so that versions can be compared as they are
+    "senastandrad": QMetaType.Type.QString,
+    "lanskod": QMetaType.Type.QString,
+    "kommunkod": QMetaType.Type.QString,
+    "kommunnamn": QMetaType.Type.QString,
+    "trakt": QMetaType.Type.QString,
+    "block": QMetaType.Type.QString,
+    "enhet": QMetaType.Type.Int,
+    "omradesnummer": QMetaType.Type.Int,
+    "etikett": QMetaType.Type.QString,
+}
+
+COLUMNS = ", ".join(f'"{name}"' for name in ATTRIBUTES)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS lantmateriet_replica (
+    kommunkod TEXT PRIMARY KEY,
+    synced TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS {COLLECTION}_objektidentitet
+    ON {COLLECTION} (objektidentitet);
+CREATE INDEX IF NOT EXISTS {COLLECTION}_registerenhetsreferens
+    ON {COLLECTION} (registerenhetsreferens);
+CREATE INDEX IF NOT EXISTS {COLLECTION}_trakt ON {COLLECTION} (trakt, kommunkod);
+"""
+
+# size of the envelope in a GeoPackage geometry header, by its indicator
+ENVELOPE_SIZES = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}
+
+
+def gpkg_geometry(blob: bytes) -> QgsGeometry:
+    """Decode a GeoPackage geometry blob, by skipping its header to the WKB."""
+    offset = 8 + ENVELOPE_SIZES[(blob[3] >> 1) & 0x07]
+    geometry = QgsGeometry()
+    geometry.fromWkb(blob[offset:])
+    return geometry
+
+
+def omrade_version(omrade: RegisterenhetsOmrade) -> str:
+    """Get the version of an area as it is stored in the replica."""
+    return omrade["senastandrad"].toUTC().toString(Qt.DateFormat.ISODateWithMs)
+
+
+class FastighetsindelningReplica:
+    """Local replica of the registerenhetsområdesytor of some municipalities.
+
+    The replica is a GeoPackage, filled and updated by the replica sync algorithm
+    through QGIS, and read directly with SQLite. Point lookups use the R-tree index of
+    the GeoPackage and designation lookups an index on trakt, so that they are
+    answered without any requests to Lantmäteriet. Areas not in the replica are not
+    found, and are left to the API by the callers."""
+
+    _instances: dict[Path, "FastighetsindelningReplica"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._local = threading.local()
+        self._geometry_column: str | None = None
+
+    @classmethod
+    def shared(cls, path: Path) -> "FastighetsindelningReplica":
+        """Get the replica at a given path, shared by all lookups in the process."""
+        with cls._instances_lock:
+            replica = cls._instances.get(path)
+            if replica is None:
+                replica = cls._instances[path] = cls(path)
+            return replica
+
+    @classmethod
+    def create(
+        cls, path: Path, transform_context: QgsCoordinateTransformContext
+    ) -> "FastighetsindelningReplica":
+        """Create an empty replica at a given path, unless there is one already."""
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            options = QgsVectorFileWriter.SaveVectorOptions()
+            options.driverName = "GPKG"
+            options.layerName = COLLECTION
+            writer = QgsVectorFileWriter.create(
+                str(path),
+                cls.fields(),
+                Qgis.WkbType.MultiPolygon,
+                QgsCoordinateReferenceSystem.fromEpsgId(3006),
+                transform_context,
+                options,
+            )
+            if writer.hasError() != QgsVectorFileWriter.WriterError.NoError:
+                raise OSError(writer.errorMessage())
+            del writer  # the layer is written when the writer is deleted
+        with closing(sqlite3.connect(path)) as connection:
+            connection.executescript(SCHEMA)
+        return cls.shared(path)
+
+    @staticmethod
+    def fields() -> QgsFields:
+        fields = QgsFields()
+        for name, type in ATTRIBUTES.items():
+            fields.append(QgsField(name, type))
+        return fields
+
+    def layer(self) -> QgsVectorLayer:
+        """Open the replica as a layer, to write to it."""
+        return QgsVectorLayer(f"{self.path}|layername={COLLECTION}", COLLECTION, "ogr")
+
+    def to_feature(self, omrade: RegisterenhetsOmradeWithGeometry) -> QgsFeature:
+        feature = QgsFeature(self.fields())
+        geometry = QgsGeometry(omrade["geometry"])
+        geometry.convertToMultiType()
+        feature.setGeometry(geometry)
+        feature.setAttributes(
+            [
+                omrade_version(omrade) if name == "senastandrad" else omrade.get(name)
+                for name in ATTRIBUTES
+            ]
+        )
+        return feature
+
+    def _connection(self) -> sqlite3.Connection:
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"{self.path.as_uri()}?mode=ro", uri=True)
+            self._local.connection = connection
+        if self._geometry_column is None:
+            (self._geometry_column,) = connection.execute(
+                "SELECT column_name FROM gpkg_geometry_columns WHERE table_name = ?",
+                (COLLECTION,),
+            ).fetchone()
+        return connection
+
+    def synced(self) -> dict[str, str]:
+        """Get the time of the last sync of each municipality in the replica."""
+        return dict(
+            self._connection().execute(
+                "SELECT kommunkod, synced FROM lantmateriet_replica"
+            )
+        )
+
+    def set_synced(self, kommunkod: str, synced: QDateTime):
+        with closing(sqlite3.connect(self.path)) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO lantmateriet_replica VALUES (?, ?)",
+                (kommunkod, synced.toUTC().toString(Qt.DateFormat.ISODateWithMs)),
+            )
+
+    def versions(self, kommunkod: str) -> dict[str, tuple[int, str]]:
+        """Get the feature id and version of each area in a municipality."""
+        return {
+            objektidentitet: (fid, senastandrad)
+            for fid, objektidentitet, senastandrad in self._connection().execute(
+                f"SELECT fid, objektidentitet, senastandrad FROM {COLLECTION} "
+                "WHERE kommunkod = ?",
+                (kommunkod,),
+            )
+        }
+
+    def omrade_at_point(
+        self, point: QgsPointXY
+    ) -> RegisterenhetsOmradeWithGeometry | None:
+        """Find the area containing a point in EPSG:3006."""
+        connection = self._connection()
+        rows = connection.execute(
+            f'SELECT {COLUMNS}, t."{self._geometry_column}" '
+            f'FROM "rtree_{COLLECTION}_{self._geometry_column}" r '
+            f"JOIN {COLLECTION} t ON t.fid = r.id "
+            "WHERE r.minx <= ? AND r.maxx >= ? AND r.miny <= ? AND r.maxy >= ?",
+            (point.x(), point.x(), point.y(), point.y()),
+        )
+        geometry = QgsGeometry.fromPointXY(point)
+        for row in rows:
+            omrade = self._to_omrade(row)
+            if omrade["geometry"].intersects(geometry):
+                return omrade
+        return None
+
+    def registerenhet(self, objektidentitet: str) -> Registerenhet | None:
+        """Get the full representation of a property, from all of its areas."""
+        connection = self._connection()
+        omraden = [
+            self._to_omrade(row)
+            for row in connection.execute(
+                f'SELECT {COLUMNS}, "{self._geometry_column}" FROM {COLLECTION} '
+                "WHERE registerenhetsreferens = ? ORDER BY omradesnummer",
+                (objektidentitet,),
+            )
+        ]
+        if not omraden:
+            return None
+        return FastighetsindelningDirektClient._to_registerenhet(omraden)
+
+    def find_registerenheter(
+        self, filter: dict, limit: int = 10
+    ) -> list[Registerenhet]:
+        """Find a list of properties based on a CQL2 filter, see `cql2.to_sql`."""
+        sql, parameters = cql2.to_sql(filter)
+        return [
+            FastighetsindelningDirektClient._to_registerenhet_summary(
+                self._to_omrade(row)
+            )
+            for row in self._connection().execute(
+                f"SELECT {COLUMNS} FROM {COLLECTION} "
+                f"WHERE omradesnummer = 1 AND {sql} LIMIT ?",
+                (*parameters, limit),
+            )
+        ]
+
+    def designations(self) -> Iterator[IndexEntry]:
+        """Get the designation of each property in the replica, for the designation index."""
+        for (
+            kommunnamn,
+            trakt,
+            etikett,
+            id,
+            block,
+            kommunkod,
+        ) in self._connection().execute(
+            "SELECT kommunnamn, trakt, etikett, registerenhetsreferens, block, kommunkod "
+            f"FROM {COLLECTION} WHERE omradesnummer = 1"
+        ):
+            yield IndexEntry(
+                format_beteckning(
+                    dict(kommunnamn=kommunnamn, trakt=trakt, etikett=etikett)
+                ),
+                id,
+                "samfällighet" if block == "s" else "fastighet",
+                kommunkod,
+            )
+
+    def _to_omrade(
+        self, row: tuple
+    ) -> RegisterenhetsOmrade | RegisterenhetsOmradeWithGeometry:
+        values = dict(zip(ATTRIBUTES, row))
+        omrade = RegisterenhetsOmrade(
+            **omit(values, ("senastandrad",)),
+            senastandrad=QDateTime.fromString(
+                values["senastandrad"], Qt.DateFormat.ISODateWithMs
+            ),
+            beteckning=f"{values['kommunnamn']} {values['trakt']} {values['etikett']}",
+        )
+        if len(row) > len(ATTRIBUTES):
+            omrade["geometry"] = QgsReferencedGeometry(
+                gpkg_geometry(row[len(ATTRIBUTES)]),
+                QgsCoordinateReferenceSystem.fromEpsgId(3006),
+            )
+        return omrade
@@ -1,3 +1,5 @@
+import json
+
 from qgis.core import (
     QgsExpressionContext,
     QgsGeometry,
@@ -6,10 +8,46 @@ from qgis.core import (
 )
 
 from lantmateriet_qgis.core.clients import BelagenhetsadressDirektClient
-from lantmateriet_qgis.core.settings import Settings
+from lantmateriet_qgis.core.functions.cache import (
+    NotMemoized,
+    cached,
+    context_client,
+    context_settings,
+)
 from lantmateriet_qgis.core.util import UUID_RE, flatten, omit
 
 
+def _address(
+    source: QgsGeometry | QgsReferencedGeometry | str,
+    kommunkod: str | None,
+    context: QgsExpressionContext | None,
+) -> dict | None:
+    try:
+        s = context_settings(context)
+        if (
+            not s.ovrig_enabled
+            or not s.ovrig_authcfg
+            or not s.belagenhetsadress_direkt_enabled
+        ):
+            raise Exception("Belägenhetsadress Direkt is not enabled in settings")
+        client = context_client(context, BelagenhetsadressDirektClient, s)
+
+        if isinstance(source, str) and UUID_RE.fullmatch(source) is not None:
+            response = client.get_one(source, "total")
+        elif isinstance(source, str):
+            response = client.get_references_from_text(source, municipality=kommunkod)
+            if len(response) == 0:
+                return None
+            response = client.get_one(response[0]["objektidentitet"], "total")
+        else:
+            response = client.get_by_point(source, "total")
+    except json.JSONDecodeError as e:
+        raise NotMemoized() from e
+    except (ValueError, KeyError):
+        return None
+    return flatten(omit(response, "geometry"))
+
+
 @qgsfunction(group="Lantmäteriet")
 def address(
     source: QgsGeometry | QgsReferencedGeometry | str,
@@ -148,27 +186,6 @@ def address(
        </ul>
     </div>
     """
-    try:
-        s = Settings.load_from_settings()
-        if (
-            not s.ovrig_enabled
-            or not s.ovrig_authcfg
-            or not s.belagenhetsadress_direkt_enabled
-        ):
-            raise Exception("Belägenhetsadress Direkt is not enabled in settings")
-        client = BelagenhetsadressDirektClient(
-            s.ovrig_url, s.ovrig_authcfg, context.feedback()
-        )
-
-        if isinstance(source, str) and UUID_RE.fullmatch(source) is not None:
-            response = client.get_one(source, "total")
-        elif isinstance(source, str):
-            response = client.get_references_from_text(source, municipality=kommunkod)
-            if len(response) == 0:
-                return None
-            response = client.get_one(response[0]["objektidentitet"], "total")
-        else:
-            response = client.get_by_point(source, "total")
-    except (ValueError, KeyError):
-        return None
-    return flatten(omit(response, "geometry"))
+    return cached(
+        "address", source, kommunkod, lambda: _address(source, kommunkod, context)
+    )
@@ -0,0 +1,117 @@
+from typing import Callable, Hashable, TypeVar
+
+from qgis.core import (
+    Qgis,
+    QgsCoordinateReferenceSystem,
+    QgsExpressionContext,
+    QgsGeometry,
+    QgsProject,
+    QgsReferencedGeometry,
+)
+
+from lantmateriet_qgis.core.clients.base import BaseClient
+from lantmateriet_qgis.core.settings import Settings
+from lantmateriet_qgis.core.util import UUID_RE
+from lantmateriet_qgis.core.util.lru import LRUCache
+
+C = TypeVar("C", bound=BaseClient)
+
+function_cache: LRUCache = LRUCache(10_000)
+"""Results of the expression functions, shared by all of them."""
+
+PROJECTED_SNAP = 0.01
+GEOGRAPHIC_SNAP = 1e-7
+
+
+def _crs(source: QgsGeometry | QgsReferencedGeometry) -> QgsCoordinateReferenceSystem:
+    if isinstance(source, QgsReferencedGeometry):
+        return source.crs()
+    return QgsProject.instance().crs()
+
+
+def cache_key(
+    function: str,
+    source: QgsGeometry | QgsReferencedGeometry | str,
+    kommunkod: str | None,
+) -> Hashable:
+    """Create a key for the function cache from the arguments of an expression function.
+
+    Identities and designations are keyed by their normalized string, points by their
+    coordinate snapped to about a centimeter and their CRS, and other geometries by
+    their WKB and CRS."""
+    if isinstance(source, str):
+        if UUID_RE.fullmatch(source) is not None:
+            return function, "uuid", source
+        return function, "designation", " ".join(source.split()).upper(), kommunkod
+    crs = _crs(source)
+    if source.type() == Qgis.GeometryType.Point and not source.isMultipart():
+        snap = GEOGRAPHIC_SNAP if crs.isGeographic() else PROJECTED_SNAP
+        point = source.asPoint()
+        return (
+            function,
+            "point",
+            round(point.x() / snap),
+            round(point.y() / snap),
+            crs.authid() or crs.toWkt(),
+        )
+    return function, "geometry", bytes(source.asWkb()), crs.authid() or crs.toWkt()
+
+
+def cacheable(
+    source: QgsGeometry | QgsReferencedGeometry | str | None,
+    kommunkod: str | None,
+) -> bool:
+    """Check whether the arguments of an expression function can be used as a cache key."""
+    return isinstance(source, (str, QgsGeometry)) and (
+        kommunkod is None or isinstance(kommunkod, str)
+    )
+
+
+class NotMemoized(Exception):
+    """Raised by an expression function for a result which must not be cached.
+
+    Used for failures which are not a definitive answer, e.g. an error page from a proxy
+    which cannot be parsed, so that they are retried rather than remembered as not
+    found."""
+
+    def __init__(self, value: object = None):
+        super().__init__(value)
+        self.value = value
+
+
+def cached(
+    function: str,
+    source: QgsGeometry | QgsReferencedGeometry | str,
+    kommunkod: str | None,
+    compute: Callable[[], object],
+):
+    """Get the result of an expression function from the function cache, computing it if needed."""
+    try:
+        if not cacheable(source, kommunkod):
+            return compute()
+        return function_cache.get_or_compute(
+            cache_key(function, source, kommunkod), compute
+        )
+    except NotMemoized as e:
+        return e.value
+
+
+def context_settings(context: QgsExpressionContext | None) -> Settings:
+    """Load the settings once per expression context, rather than once per feature."""
+    if context is None:
+        return Settings.load_from_settings()
+    if not context.hasCachedValue("lantmateriet:settings"):
+        context.setCachedValue("lantmateriet:settings", Settings.load_from_settings())
+    return context.cachedValue("lantmateriet:settings")
+
+
+def context_client(
+    context: QgsExpressionContext | None, client_class: type[C], s: Settings
+) -> C:
+    """Get a pooled client once per expression context, rather than once per feature."""
+    if context is None:
+        return s.client(client_class)
+    key = f"lantmateriet:client:{client_class.__name__}"
+    if not context.hasCachedValue(key):
+        context.setCachedValue(key, s.client(client_class, context.feedback()))
+    return context.cachedValue(key)
@@ -0,0 +1,316 @@
+"""Bulk resolution of the arguments of the expression functions.
+
+Evaluating an expression such as `property_geometry($geometry)` over a layer calls the
+API once per feature. `prefetch` instead collects all the arguments the functions will
+be called with, resolves them with as few requests as possible and fills the function
+cache, so that the evaluation which follows does not need the network.
+"""
+
+from collections import defaultdict
+from typing import Any, Callable, Hashable
+
+from qgis.core import (
+    Qgis,
+    QgsExpression,
+    QgsExpressionContext,
+    QgsExpressionNode,
+    QgsFeatureRequest,
+    QgsFeatureSource,
+    QgsFeedback,
+    QgsGeometry,
+    QgsReferencedGeometry,
+)
+
+from lantmateriet_qgis.core.clients import (
+    BelagenhetsadressDirektClient,
+    FastighetOchSamfallighetDirektClient,
+    RegisterbeteckningDirektClient,
+)
+from lantmateriet_qgis.core.clients.base import NetworkError
+from lantmateriet_qgis.core.functions.cache import (
+    cache_key,
+    cacheable,
+    function_cache,
+)
+from lantmateriet_qgis.core.functions.property_geometry import first_registerenhet
+from lantmateriet_qgis.core.settings import Settings
+from lantmateriet_qgis.core.util import UUID_RE, flatten, municipalities, omit
+
+Arguments = tuple[QgsGeometry | QgsReferencedGeometry | str, str | None]
+
+FUNCTIONS = ("property", "property_geometry", "address", "address_geometry")
+PARAMETERS = ("source", "kommunkod")
+
+
+def _children(node: QgsExpressionNode) -> list[QgsExpressionNode]:
+    node_type = node.nodeType()
+    if node_type == QgsExpressionNode.NodeType.ntUnaryOperator:
+        return [node.operand()]
+    elif node_type == QgsExpressionNode.NodeType.ntBinaryOperator:
+        return [node.opLeft(), node.opRight()]
+    elif node_type == QgsExpressionNode.NodeType.ntInOperator:
+        return [node.node(), *node.list().list()]
+    elif node_type == QgsExpressionNode.NodeType.ntFunction:
+        return node.args().list() if node.args() is not None else []
+    elif node_type == QgsExpressionNode.NodeType.ntCondition:
+        children = []
+        for condition in node.conditions():
+            children += [condition.whenExp(), condition.thenExp()]
+        if node.elseExp() is not None:
+            children.append(node.elseExp())
+        return children
+    elif node_type == QgsExpressionNode.NodeType.ntBetweenOperator:
+        return [node.node(), node.lowerBound(), node.higherBound()]
+    elif node_type == QgsExpressionNode.NodeType.ntIndexOperator:
+        return [node.container(), node.index()]
+    return []
+
+
+def _find_calls(
+    node: QgsExpressionNode, calls: list[tuple[int, str, QgsExpressionNode]]
+) -> int:
+    """Find the calls to the plugin functions below a node.
+
+    Each call is given a level, which is the number of plugin function calls nested
+    within its arguments. Returns the highest level found, or -1 if there were none."""
+    level = max((_find_calls(child, calls) for child in _children(node)), default=-1)
+    if node.nodeType() == QgsExpressionNode.NodeType.ntFunction:
+        name = QgsExpression.Functions()[node.fnIndex()].name()
+        if name in FUNCTIONS:
+            level += 1
+            calls.append((level, name, node))
+    return level
+
+
+def _evaluate_arguments(
+    node: QgsExpressionNode, expression: QgsExpression, context: QgsExpressionContext
+) -> Arguments | None:
+    if node.args() is None:
+        return None
+    arguments = {"kommunkod": None}
+    names = node.args().names()
+    for i, argument in enumerate(node.args().list()):
+        name = names[i] if i < len(names) and names[i] else PARAMETERS[i]
+        arguments[name] = argument.eval(expression, context)
+        if expression.hasEvalError():
+            return None
+    return arguments.get("source"), arguments["kommunkod"]
+
+
+def _is_point(geometry: QgsGeometry) -> bool:
+    return geometry.type() == Qgis.GeometryType.Point and not geometry.isMultipart()
+
+
+def _split(
+    calls: dict[Hashable, Arguments],
+) -> tuple[dict[Hashable, str], dict[Hashable, Arguments], dict[Hashable, QgsGeometry]]:
+    """Split calls into those by identity, by designation and by geometry."""
+    uuids, designations, geometries = {}, {}, {}
+    for key, (source, kommunkod) in calls.items():
+        if isinstance(source, str) and UUID_RE.fullmatch(source) is not None:
+            uuids[key] = source
+        elif isinstance(source, str):
+            designations[key] = (source, kommunkod)
+        else:
+            geometries[key] = source
+    return uuids, designations, geometries
+
+
+def _resolve_addresses(
+    s: Settings,
+    feedback: QgsFeedback | None,
+    calls: dict[Hashable, Arguments],
+    include: str,
+    to_value: Callable[[dict], Any],
+) -> dict[Hashable, Any]:
+    if not s.belagenhetsadress_direkt_enabled:
+        return {}
+    client = s.client(BelagenhetsadressDirektClient, feedback)
+    uuids, designations, geometries = _split(calls)
+    resolved = {}
+
+    by_municipality: dict[str | None, list[Hashable]] = defaultdict(list)
+    for key, (_, kommunkod) in designations.items():
+        by_municipality[kommunkod].append(key)
+    for kommunkod, keys in by_municipality.items():
+        references = client.get_references_from_text_batch(
+            [designations[key][0] for key in keys], municipality=kommunkod
+        )
+        for key, refs in zip(keys, references):
+            if len(refs) == 0:
+                resolved[key] = None
+            else:
+                uuids[key] = refs[0]["objektidentitet"]
+
+    items = {
+        item["id"]: item
+        for item in client.get_many_chunked(
+            set(uuids.values()), include, on_error=lambda *_: None
+        )
+    }
+    resolved.update(
+        {key: to_value(items[id]) for key, id in uuids.items() if id in items}
+    )
+
+    points = {
+        key: geometry for key, geometry in geometries.items() if _is_point(geometry)
+    }
+    resolved.update(
+        zip(
+            points.keys(),
+            map(to_value, client.get_by_point_batch(points.values(), include)),
+        )
+    )
+    return resolved
+
+
+def _resolve_properties(
+    s: Settings,
+    feedback: QgsFeedback | None,
+    calls: dict[Hashable, Arguments],
+    include: str,
+    to_value: Callable[[dict], Any],
+) -> dict[Hashable, Any]:
+    if not s.fastighet_direkt_enabled or not s.registerbeteckning_direkt_enabled:
+        # Fastighetsindelning Direkt has no way to resolve many values at once
+        return {}
+    client = s.client(FastighetOchSamfallighetDirektClient, feedback)
+    regbet_client = s.client(RegisterbeteckningDirektClient, feedback)
+    uuids, designations, geometries = _split(calls)
+    resolved = {}
+
+    # the same lookups as registerbeteckning_find_reference, but for all designations
+    # at once: with the municipality name first, then without it if nothing was found
+    names = {}
+    for key, (designation, kommunkod) in designations.items():
+        if kommunkod and kommunkod not in municipalities:
+            resolved[key] = None
+        elif kommunkod:
+            names[key] = f"{municipalities[kommunkod]} {designation}"
+        else:
+            names[key] = designation
+    results = dict(zip(names.keys(), regbet_client.get_by_name_batch(names.values())))
+    retry = [
+        key for key, result in results.items() if not result and designations[key][1]
+    ]
+    results.update(
+        zip(
+            retry,
+            regbet_client.get_by_name_batch(designations[key][0] for key in retry),
+        )
+    )
+    for key, result in results.items():
+        reference = first_registerenhet(result)
+        if reference is None:
+            resolved[key] = None
+        else:
+            uuids[key] = reference
+
+    geometries = list(geometries.items())
+    for (key, _), refs in zip(
+        geometries,
+        client.get_references_from_geometry_batch(
+            geometry for _, geometry in geometries
+        ),
+    ):
+        if not refs:
+            resolved[key] = None
+        else:
+            uuids[key] = refs[0]["objektidentitet"]
+
+    items = {
+        item["id"]: item
+        for item in client.get_many_chunked(
+            set(uuids.values()), include, on_error=lambda *_: None
+        )
+    }
+    resolved.update(
+        {key: to_value(items[id]) for key, id in uuids.items() if id in items}
+    )
+    return resolved
+
+
+RESOLVERS = {
+    "address": lambda s, feedback, calls: _resolve_addresses(
+        s, feedback, calls, "total", lambda item: flatten(omit(item, "geometry"))
+    ),
+    "address_geometry": lambda s, feedback, calls: _resolve_addresses(
+        s, feedback, calls, "basinformation", lambda item: item["geometry"]
+    ),
+    "property": lambda s, feedback, calls: _resolve_properties(
+        s, feedback, calls, "basinformation", lambda item: omit(item, ("geometry",))
+    ),
+    "property_geometry": lambda s, feedback, calls: _resolve_properties(
+        s, feedback, calls, "omrade", lambda item: item["geometry"]
+    ),
+}
+
+
+def prefetch(
+    expression: QgsExpression,
+    source: QgsFeatureSource,
+    context: QgsExpressionContext,
+    feedback: QgsFeedback | None = None,
+) -> int:
+    """Resolve the arguments of all plugin function calls in an expression in bulk.
+
+    The expression is evaluated for the features of the source, and the results are
+    stored in the function cache. Calls nested within the arguments of other calls are
+    resolved first, so that the outer arguments can be evaluated from the cache.
+    Returns the number of results stored."""
+    s = Settings.load_from_settings()
+    if not s.ovrig_enabled or not s.ovrig_authcfg:
+        raise Exception("Necessary services are not enabled in settings")
+
+    expression.prepare(context)
+    if expression.rootNode() is None:
+        return 0
+    calls: list[tuple[int, str, QgsExpressionNode]] = []
+    levels = _find_calls(expression.rootNode(), calls) + 1
+
+    stored = 0
+    for level in range(levels):
+        pending: dict[str, dict[Hashable, Arguments]] = defaultdict(dict)
+        request = QgsFeatureRequest()
+        if feedback is not None:
+            request.setFeedback(feedback)
+        for feature in source.getFeatures(request):
+            if feedback is not None and feedback.isCanceled():
+                return stored
+            context.setFeature(feature)
+            for call_level, name, node in calls:
+                if call_level != level:
+                    continue
+                arguments = _evaluate_arguments(node, expression, context)
+                if arguments is None or not cacheable(*arguments):
+                    continue
+                key = cache_key(name, *arguments)
+                if key not in function_cache:
+                    pending[name][key] = arguments
+
+        for name, function_calls in pending.items():
+            if feedback is not None:
+                if feedback.isCanceled():
+                    return stored
+                feedback.pushInfo(
+                    f"Resolving {len(function_calls)} values for {name}()..."
+                )
+            try:
+                resolved = RESOLVERS[name](s, feedback, function_calls)
+            except (NetworkError, ValueError) as e:
+                if feedback is not None:
+                    feedback.reportError(
+                        f"Could not resolve values for {name}(), they will be "
+                        f"fetched one by one instead: {e}"
+                    )
+                continue
+            for key, value in resolved.items():
+                function_cache.put(key, value)
+            stored += len(resolved)
+
+    if feedback is not None and stored > function_cache.max_size:
+        feedback.pushWarning(
+            f"Resolved {stored} values, but only {function_cache.max_size} fit in the "
+            "cache. The remaining values will be fetched one by one."
+        )
+    return stored
@@ -1,3 +1,5 @@
+import json
+
 from qgis.core import (
     QgsExpressionContext,
     QgsGeometry,
@@ -10,16 +12,80 @@ from lantmateriet_qgis.core.clients import (
     FastighetsindelningDirektClient,
     RegisterbeteckningDirektClient,
 )
+from lantmateriet_qgis.core.functions.cache import (
+    NotMemoized,
+    cached,
+    context_client,
+    context_settings,
+)
 from lantmateriet_qgis.core.functions.property_geometry import (
     fastighetsindelning_by_designation,
     fastighetsindelning_by_geometry,
     fastighetsindelning_by_uuid,
     registerbeteckning_find_reference,
+    replica_registerenhet,
 )
-from lantmateriet_qgis.core.settings import Settings
 from lantmateriet_qgis.core.util import UUID_RE
 
 
+def _property(
+    source: QgsGeometry | QgsReferencedGeometry | str,
+    kommunkod: str | None,
+    context: QgsExpressionContext | None,
+) -> dict | None:
+    try:
+        s = context_settings(context)
+        if not s.ovrig_enabled or not s.ovrig_authcfg:
+            raise Exception("Necessary services are not enabled in settings")
+        local = replica_registerenhet(source, kommunkod, s.replica())
+        if s.fastighet_direkt_enabled and s.registerbeteckning_direkt_enabled:
+            client = context_client(context, FastighetOchSamfallighetDirektClient, s)
+
+            if isinstance(source, str) and UUID_RE.fullmatch(source) is not None:
+                item = client.get_one(source, "basinformation")
+            elif local is not None:
+                item = client.get_one(local["objektidentitet"], "basinformation")
+            elif isinstance(source, str):
+                regbet_client = context_client(
+                    context, RegisterbeteckningDirektClient, s
+                )
+                ref = registerbeteckning_find_reference(
+                    source, kommunkod, regbet_client
+                )
+                if ref is None:
+                    return None
+
+                item = client.get_one(ref, "basinformation")
+            else:
+                refs = client.get_references_from_geometry(source)
+                if not refs:
+                    return None
+                item = client.get_one(refs[0]["objektidentitet"], "basinformation")
+        elif s.fastighetsindelning_direkt_enabled:
+            client = context_client(context, FastighetsindelningDirektClient, s)
+
+            if local is not None:
+                response = {local["objektidentitet"]: local}
+            elif isinstance(source, str) and UUID_RE.fullmatch(source) is not None:
+                response = fastighetsindelning_by_uuid(source, client)
+            elif isinstance(source, str):
+                response = fastighetsindelning_by_designation(source, kommunkod, client)
+            else:
+                response = fastighetsindelning_by_geometry(source, client)
+            if not response:
+                return None
+            item = response[next(iter(response))]
+        else:
+            raise Exception("Necessary services are not enabled in settings")
+    except json.JSONDecodeError as e:
+        raise NotMemoized() from e
+    except (ValueError, KeyError):
+        return None
+    if "geometry" in item:
+        del item["geometry"]  # noqa: accept key removal
+    return item
+
+
 @qgsfunction(group="Lantmäteriet")
 def property(
     source: QgsGeometry | QgsReferencedGeometry | str,
@@ -117,51 +183,6 @@ def property(
        </ul>
     </div>
     """
-    try:
-        s = Settings.load_from_settings()
-        if not s.ovrig_enabled or not s.ovrig_authcfg:
-            raise Exception("Necessary services are not enabled in settings")
-        if s.fastighet_direkt_enabled and s.registerbeteckning_direkt_enabled:
-            client = FastighetOchSamfallighetDirektClient(
-                s.ovrig_url, s.ovrig_authcfg, context.feedback()
-            )
-
-            if isinstance(source, str) and UUID_RE.fullmatch(source) is not None:
-                item = client.get_one(source, "basinformation")
-            elif isinstance(source, str):
-                regbet_client = RegisterbeteckningDirektClient(
-                    s.ovrig_url, s.ovrig_authcfg, context.feedback()
-                )
-                ref = registerbeteckning_find_reference(
-                    source, kommunkod, regbet_client
-                )
-                if ref is None:
-                    return None
-
-                item = client.get_one(ref, "basinformation")
-            else:
-                refs = client.get_references_from_geometry(source)
-                if not refs:
-                    return None
-                item = client.get_one(refs[0]["objektidentitet"], "basinformation")
-        elif s.fastighetsindelning_direkt_enabled:
-            client = FastighetsindelningDirektClient(
-                s.ovrig_url, s.ovrig_authcfg, context.feedback()
-            )
-
-            if isinstance(source, str) and UUID_RE.fullmatch(source) is not None:
-                response = fastighetsindelning_by_uuid(source, client)
-            elif isinstance(source, str):
-                response = fastighetsindelning_by_designation(source, kommunkod, client)
-            else:
-                response = fastighetsindelning_by_geometry(source, client)
-            if not response:
-                return None
-            item = response[next(iter(response))]
-        else:
-            raise Exception("Necessary services are not enabled in settings")
-    except (ValueError, KeyError):
-        return None
-    if "geometry" in item:
-        del item["geometry"]  # noqa: accept key removal
-    return item
+    return cached(
+        "property", source, kommunkod, lambda: _property(source, kommunkod, context)
+    )
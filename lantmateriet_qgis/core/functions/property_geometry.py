@@ -1,4 +1,8 @@
+import json
+
 from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
     QgsExpressionContext,
     QgsGeometry,
     QgsProject,
@@ -12,9 +16,19 @@ from lantmateriet_qgis.core.clients import (
     RegisterbeteckningDirektClient,
 )
 from lantmateriet_qgis.core.clients.fastighetsindelningdirekt import Registerenhet
-from lantmateriet_qgis.core.settings import Settings
+from lantmateriet_qgis.core.clients.registerbeteckningdirekt import Beteckning
+from lantmateriet_qgis.core.clients.replica import FastighetsindelningReplica
+from lantmateriet_qgis.core.functions.cache import (
+    NotMemoized,
+    cached,
+    context_client,
+    context_settings,
+)
 from lantmateriet_qgis.core.util import UUID_RE, cql2, municipalities
-from lantmateriet_qgis.core.util.designation import parse_designation
+from lantmateriet_qgis.core.util.designation import (
+    parse_designation,
+    parse_designation_exact,
+)
 
 
 def fastighetsindelning_by_uuid(
@@ -82,6 +96,49 @@ def fastighetsindelning_by_geometry(
     )
 
 
+def replica_registerenhet(
+    source: QgsGeometry | QgsReferencedGeometry | str,
+    kommunkod: str | None,
+    replica: FastighetsindelningReplica | None,
+) -> Registerenhet | None:
+    """Look up a property in the local replica, if there is one."""
+    if replica is None:
+        return None
+    if isinstance(source, str) and UUID_RE.fullmatch(source) is not None:
+        return replica.registerenhet(source)
+    if isinstance(source, str):
+        filter = parse_designation_exact(source)
+        if filter is None:
+            return None
+        if kommunkod is not None:
+            filter = cql2.and_(
+                [filter, cql2.equals(cql2.property("kommunkod"), kommunkod)]
+            )
+        found = replica.find_registerenheter(filter, limit=1)
+        if not found:
+            return None
+        return replica.registerenhet(found[0]["objektidentitet"])
+
+    crs = (
+        source.crs()
+        if isinstance(source, QgsReferencedGeometry)
+        else QgsProject.instance().crs()
+    )
+    point = QgsGeometry(source).centroid()
+    if crs.authid() != "EPSG:3006":
+        point.transform(
+            QgsCoordinateTransform(
+                crs,
+                QgsCoordinateReferenceSystem.fromEpsgId(3006),
+                QgsProject.instance().transformContext(),
+            )
+        )
+    omrade = replica.omrade_at_point(point.asPoint())
+    if omrade is None:
+        return None
+    return replica.registerenhet(omrade["registerenhetsreferens"])
+
+
 def registerbeteckning_find_reference(
     designation: str, kommunkod: str, client: RegisterbeteckningDirektClient
 ):
@@ -91,12 +148,70 @@ def registerbeteckning_find_reference(
             results = client.get_by_name(designation)
     else:
         results = client.get_by_name(designation)
+    return first_registerenhet(results)
+
+
+def first_registerenhet(results: list[Beteckning]) -> str | None:
     results = [r for r in results if "registerenhetsreferens" in r]
     if not results:
         return None
     return results[0]["registerenhetsreferens"]["objektidentitet"]
 
 
+def _property_geometry(
+    source: QgsGeometry | QgsReferencedGeometry | str,
+    kommunkod: str | None,
+    context: QgsExpressionContext | None,
+) -> dict | None:
+    try:
+        s = context_settings(context)
+        if not s.ovrig_enabled or not s.ovrig_authcfg:
+            raise Exception("Necessary services are not enabled in settings")
+        local = replica_registerenhet(source, kommunkod, s.replica())
+        if local is not None:
+            item = local
+        elif s.fastighet_direkt_enabled and s.registerbeteckning_direkt_enabled:
+            client = context_client(context, FastighetOchSamfallighetDirektClient, s)
+
+            if isinstance(source, str) and UUID_RE.fullmatch(source) is not None:
+                item = client.get_one(source, "omrade")
+            elif isinstance(source, str):
+                regbet_client = context_client(
+                    context, RegisterbeteckningDirektClient, s
+                )
+                ref = registerbeteckning_find_reference(
+                    source, kommunkod, regbet_client
+                )
+                if ref is None:
+                    return None
+
+                item = client.get_one(ref, "omrade")
+            else:
+                refs = client.get_references_from_geometry(source)
+                if not refs:
+                    return None
+                item = client.get_one(refs[0]["objektidentitet"], "omrade")
+        elif s.fastighetsindelning_direkt_enabled:
+            client = context_client(context, FastighetsindelningDirektClient, s)
+
+            if isinstance(source, str) and UUID_RE.fullmatch(source) is not None:
+                response = fastighetsindelning_by_uuid(source, client)
+            elif isinstance(source, str):
+                response = fastighetsindelning_by_designation(source, kommunkod, client)
+            else:
+                response = fastighetsindelning_by_geometry(source, client)
+            if not response:
+                return None
+            item = response[next(iter(response))]
+        else:
+            raise Exception("Necessary services are not enabled in settings")
+    except json.JSONDecodeError as e:
+        raise NotMemoized() from e
+    except (ValueError, KeyError):
+        return None
+    return item["geometry"]
+
+
 @qgsfunction(group="Lantmäteriet")
 def property_geometry(
     source: QgsGeometry | QgsReferencedGeometry | str,
@@ -169,49 +284,9 @@ def property_geometry(
        </ul>
     </div>
     """
-    try:
-        s = Settings.load_from_settings()
-        if not s.ovrig_enabled or not s.ovrig_authcfg:
-            raise Exception("Necessary services are not enabled in settings")
-        if s.fastighet_direkt_enabled and s.registerbeteckning_direkt_enabled:
-            client = FastighetOchSamfallighetDirektClient(
-                s.ovrig_url, s.ovrig_authcfg, context.feedback()
-            )
-
-            if isinstance(source, str) and UUID_RE.fullmatch(source) is not None:
-                item = client.get_one(source, "omrade")
-            elif isinstance(source, str):
-                regbet_client = RegisterbeteckningDirektClient(
-                    s.ovrig_url, s.ovrig_authcfg, context.feedback()
-                )
-                ref = registerbeteckning_find_reference(
-                    source, kommunkod, regbet_client
-                )
-                if ref is None:
-                    return None
-
-                item = client.get_one(ref, "omrade")
-            else:
-                refs = client.get_references_from_geometry(source)
-                if not refs:
-                    return None
-                item = client.get_one(refs[0]["objektidentitet"], "omrade")
-        elif s.fastighetsindelning_direkt_enabled:
-            client = FastighetsindelningDirektClient(
-                s.ovrig_url, s.ovrig_authcfg, context.feedback()
-            )
-
-            if isinstance(source, str) and UUID_RE.fullmatch(source) is not None:
-                response = fastighetsindelning_by_uuid(source, client)
-            elif isinstance(source, str):
-                response = fastighetsindelning_by_designation(source, kommunkod, client)
-            else:
-                response = fastighetsindelning_by_geometry(source, client)
-            if not response:
-                return None
-            item = response[next(iter(response))]
-        else:
-            raise Exception("Necessary services are not enabled in settings")
-    except (ValueError, KeyError):
-        return None
-    return item["geometry"]
+    return cached(
+        "property_geometry",
+        source,
+        kommunkod,
+        lambda: _property_geometry(source, kommunkod, context),
+    )
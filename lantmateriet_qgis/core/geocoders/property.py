@@ -1,3 +1,6 @@
+from collections import defaultdict
+from contextlib import closing
+
 from qgis.core import (
     Qgis,
     QgsFeedback,
@@ -12,8 +15,13 @@ from qgis.PyQt.QtCore import QVariant
 from lantmateriet_qgis.core.clients import (
     FastighetsindelningDirektClient,
 )
+from lantmateriet_qgis.core.clients.base import Canceled, NetworkError
+from lantmateriet_qgis.core.clients.fastighetsindelningdirekt import Collection
 from lantmateriet_qgis.core.util.designation import parse_designation
 
+MAX_RESULTS = 30
+"""Results of a geocoding, after which the remaining searches are aborted."""
+
 
 class FastighetsindelningDirektGeocoder(QgsGeocoderInterface):
     def __init__(self, authcfg: str, base_url: str):
@@ -48,43 +56,59 @@ class FastighetsindelningDirektGeocoder(QgsGeocoderInterface):
         context: QgsGeocoderContext,
         feedback: QgsFeedback | None = None,
     ) -> list[QgsGeocoderResult]:
-        result: list[QgsGeocoderResult] = []
-
-        filter = parse_designation(string)
-        if not filter:
+        filters = parse_designation(string)
+        if not filters:
             return []
 
         client = FastighetsindelningDirektClient(
-            self._authcfg, self._base_url, feedback
+            self._base_url, self._authcfg, feedback
         )
 
-        for collection in (
-            "registerenhetsomradesytor",
-            "registerenhetsomradeslinjer",
-            "registerenhetsomradespunkter",
-        ):
-            response = client.find_registerenheter(collection, filter)
-            if response is None:
+        searches: list[tuple[Collection, dict]] = [
+            (collection, filter)
+            for collection in (
+                "registerenhetsomradesytor",
+                "registerenhetsomradeslinjer",
+                "registerenhetsomradespunkter",
+            )
+            for filter in filters
+        ]
+        # the searches run concurrently, and the ones still in flight are aborted once
+        # there are enough results
+        found: dict[str, Collection] = {}
+        try:
+            with closing(client.iter_found_registerenheter(searches)) as responses:
+                for index, response in responses:
+                    if isinstance(response, NetworkError):
+                        continue
+                    for feature in response[: MAX_RESULTS - len(found)]:
+                        found.setdefault(feature["objektidentitet"], searches[index][0])
+                    if len(found) >= MAX_RESULTS:
+                        break
+            if not found:
                 return []
 
-            if len(response) == 0:
+            ids: dict[Collection, list[str]] = defaultdict(list)
+            for id, collection in found.items():
+                ids[collection].append(id)
+            registerenheter = client.get_registerenheter_batch(ids)
+        except Canceled:
+            return []
+
+        result: list[QgsGeocoderResult] = []
+        for id in found:
+            feature = registerenheter.get(id)
+            if feature is None:
                 continue
 
-            geometries = client.get_registerenheter(
-                collection, [f["objektidentitet"] for f in response]
+            item = QgsGeocoderResult(
+                identifier=feature["objektidentitet"],
+                geometry=feature["geometry"],
+                crs=feature["geometry"].crs(),
             )
+            item.setDescription(feature["beteckning"])
+            item.setAdditionalAttributes(feature)
 
-            for feature in response:
-                feature = geometries[feature["objektidentitet"]]
-
-                item = QgsGeocoderResult(
-                    identifier=feature["objektidentitet"],
-                    geometry=feature["geometry"],
-                    crs=feature["geometry"].crs(),
-                )
-                item.setDescription(feature["beteckning"])
-                item.setAdditionalAttributes(feature)
-
-                result.append(item)
+            result.append(item)
 
         return result
@@ -6,13 +6,65 @@ from qgis.core import (
     QgsIconUtils,
     QgsLocatorContext,
     QgsLocatorResult,
+    QgsReferencedGeometry,
 )
 from qgis.gui import QgisInterface
 
 from lantmateriet_qgis.core.clients import BelagenhetsadressDirektClient
 from lantmateriet_qgis.core.clients.base import Canceled
+from lantmateriet_qgis.core.clients.belagenhetsadressdirekt import (
+    BelagenhetsadressReference,
+)
 from lantmateriet_qgis.core.locators.base import BaseLocatorFilter
 from lantmateriet_qgis.core.settings import Settings
+from lantmateriet_qgis.core.util.lru import LRUCache
+
+MAX_HITS = 20
+
+reference_cache: LRUCache = LRUCache(500)
+"""Responses to recent queries, shared by the clones of the filter, which are made
+for every search."""
+
+
+def tokens(text: str) -> list[str]:
+    return text.upper().replace(",", " ").split()
+
+
+def refine(
+    query: str, references: list[BelagenhetsadressReference]
+) -> list[BelagenhetsadressReference]:
+    """Filter the references found for a query down to those matching a longer query.
+
+    A reference matches when each word of the query starts a word of its address."""
+    words = tokens(query)
+    return [
+        reference
+        for reference in references
+        if all(
+            any(part.startswith(word) for part in tokens(reference["adress"]))
+            for word in words
+        )
+    ]
+
+
+def cached_references(
+    base_url: str, query: str
+) -> list[BelagenhetsadressReference] | None:
+    """Answer a query from the cache, by the query itself or a shorter one it extends.
+
+    A shorter query only answers a longer one if its response was not truncated, as
+    the longer query could otherwise match addresses beyond the hits of the shorter."""
+    key = " ".join(tokens(query))
+    for length in range(len(key), 2, -1):
+        cached = reference_cache.get((base_url, key[:length]))
+        if cached is None:
+            continue
+        references, truncated = cached
+        if length == len(key):
+            return references
+        if not truncated:
+            return refine(query, references)
+    return None
 
 
 class AddressLocatorFilter(BaseLocatorFilter):
@@ -48,19 +100,26 @@ class AddressLocatorFilter(BaseLocatorFilter):
         ):
             self.setEnabled(False)
             return
-        client = BelagenhetsadressDirektClient(s.ovrig_url, s.ovrig_authcfg, feedback)
+        client = s.client(BelagenhetsadressDirektClient, feedback)
 
         if string is None or len(string) < 3:
             return
 
-        try:
-            references = client.get_references_from_text(
-                string, max_hits=20, split_address=True
+        references = cached_references(s.ovrig_url, string)
+        if references is None:
+            try:
+                references = client.get_references_from_text(
+                    string, max_hits=MAX_HITS, split_address=True
+                )
+            except Canceled:
+                return None
+            except Exception as e:
+                self.log_exception(e)
+                return None
+            reference_cache.put(
+                (s.ovrig_url, " ".join(tokens(string))),
+                (references, len(references) >= MAX_HITS),
             )
-        except Canceled:
-            return None
-        except Exception as e:
-            self.log_exception(e)
 
         for adress in references:
             result = QgsLocatorResult(self, adress["objektidentitet"], adress)
@@ -70,9 +129,29 @@ class AddressLocatorFilter(BaseLocatorFilter):
             result.icon = QgsIconUtils.iconPoint()
             self.resultFetched.emit(result)
 
+        self.prefetch_geometries(references, feedback)
+
+    def fetch_geometries(
+        self, user_data: list[dict], feedback: QgsFeedback | None
+    ) -> dict[str, QgsReferencedGeometry]:
+        client = Settings.load_from_settings().client(
+            BelagenhetsadressDirektClient, feedback
+        )
+        return {
+            address["id"]: address["geometry"]
+            for address in client.get_many(
+                [data["objektidentitet"] for data in user_data], "basinformation"
+            )
+        }
+
     def triggerResult(self, result: QgsLocatorResult):
         self.clearPreviousResults()
 
+        user_data = self.get_user_data(result)
+        if (geometry := self.cached_geometry(user_data)) is not None:
+            self.highlight(geometry)
+            return
+
         s = Settings.load_from_settings()
         if (
             not s.ovrig_enabled
@@ -84,9 +163,8 @@ class AddressLocatorFilter(BaseLocatorFilter):
                 Qgis.MessageLevel.Warning,
             )
             return
-        client = BelagenhetsadressDirektClient(s.ovrig_url, s.ovrig_authcfg)
+        client = s.client(BelagenhetsadressDirektClient)
 
-        user_data = self.get_user_data(result)
         try:
             address = client.get_one(user_data["objektidentitet"], "basinformation")
         except Canceled:
@@ -5,6 +5,7 @@ import traceback
 from qgis.core import (
     Qgis,
     QgsCoordinateTransform,
+    QgsFeedback,
     QgsGeometry,
     QgsLocatorFilter,
     QgsLocatorResult,
@@ -17,6 +18,14 @@ from qgis.PyQt.QtGui import QColor
 from qgis.PyQt.QtWidgets import QWidget
 
 from lantmateriet_qgis.__about__ import __title__
+from lantmateriet_qgis.core.clients.base import Canceled
+from lantmateriet_qgis.core.util.lru import LRUCache
+
+PREFETCH_COUNT = 5
+"""Number of top results of a search whose geometries are prefetched."""
+
+geometry_cache: LRUCache = LRUCache(100)
+"""Prefetched geometries of recent results, shared by the clones of the filters."""
 
 
 class BaseLocatorFilter(QgsLocatorFilter):
@@ -80,6 +89,42 @@ class BaseLocatorFilter(QgsLocatorFilter):
             self._rubber_band.setWidth(2)
         self._rubber_band.addGeometry(geometry, None)
 
+    def fetch_geometries(
+        self, user_data: list[dict], feedback: QgsFeedback | None
+    ) -> dict[str, QgsReferencedGeometry]:
+        """Fetch the geometries of results, by their objektidentitet, to prefetch them."""
+        return {}
+
+    def prefetch_geometries(self, user_data: list[dict], feedback: QgsFeedback | None):
+        """Prefetch the geometries of the top results, so that picking one is instant.
+
+        Runs at the end of the search, and stops when the search is canceled. Results
+        that fail to prefetch are fetched when they are picked instead."""
+        missing = [
+            data
+            for data in user_data[:PREFETCH_COUNT]
+            if (self.name(), data["objektidentitet"]) not in geometry_cache
+        ]
+        if not missing or (feedback is not None and feedback.isCanceled()):
+            return
+        try:
+            geometries = self.fetch_geometries(missing, feedback)
+        except Canceled:
+            return
+        except Exception as e:
+            self.logMessage(
+                f"Could not prefetch geometries: {e!r}", Qgis.MessageLevel.Info
+            )
+            return
+        for id, geometry in geometries.items():
+            if geometry is not None:
+                geometry_cache.put((self.name(), id), geometry)
+
+    def cached_geometry(self, user_data: dict) -> QgsReferencedGeometry | None:
+        """Get a copy of the prefetched geometry of a result, if any."""
+        geometry = geometry_cache.get((self.name(), user_data["objektidentitet"]))
+        return QgsReferencedGeometry(geometry) if geometry is not None else None
+
     def log_exception(self, e: Exception):
         self.logMessage(repr(e), Qgis.MessageLevel.Critical)
         exc_type, exc_obj, exc_traceback = sys.exc_info()
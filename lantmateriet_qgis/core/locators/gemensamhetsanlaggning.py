@@ -7,6 +7,7 @@ from lantmateriet_qgis.core.clients import (
     GemensamhetsanlaggningDirektClient,
 )
 from lantmateriet_qgis.core.clients.base import Canceled
+from lantmateriet_qgis.core.clients.pool import ClientPool
 from lantmateriet_qgis.core.locators.base import BaseLocatorFilter
 
 
@@ -39,8 +40,8 @@ class GemensamhetsanlaggningLocatorFilter(BaseLocatorFilter):
         context: QgsLocatorContext,
         feedback: QgsFeedback | None,
     ):
-        client = GemensamhetsanlaggningDirektClient(
-            self._base_url, self._authcfg, feedback
+        client = ClientPool.get(
+            GemensamhetsanlaggningDirektClient, self._base_url, self._authcfg, feedback
         )
 
         if string is None or len(string) < 3:
@@ -62,7 +63,9 @@ class GemensamhetsanlaggningLocatorFilter(BaseLocatorFilter):
     def triggerResult(self, result: QgsLocatorResult):
         self.clearPreviousResults()
 
-        client = GemensamhetsanlaggningDirektClient(self._base_url, self._authcfg)
+        client = ClientPool.get(
+            GemensamhetsanlaggningDirektClient, self._base_url, self._authcfg
+        )
         user_data = self.get_user_data(result)
         try:
             ga = client.get_one(user_data["objektidentitet"], "geometri")
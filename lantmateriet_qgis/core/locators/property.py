@@ -1,3 +1,5 @@
+import re
+from contextlib import closing
 from itertools import groupby
 from typing import Self
 
@@ -7,6 +9,7 @@ from qgis.core import (
     QgsIconUtils,
     QgsLocatorContext,
     QgsLocatorResult,
+    QgsReferencedGeometry,
 )
 from qgis.gui import QgisInterface
 
@@ -16,11 +19,18 @@ from lantmateriet_qgis.core.clients import (
     GemensamhetsanlaggningDirektClient,
     RegisterbeteckningDirektClient,
 )
-from lantmateriet_qgis.core.clients.base import Canceled
+from lantmateriet_qgis.core.clients.base import Canceled, NetworkError
+from lantmateriet_qgis.core.clients.replica import COLLECTION
 from lantmateriet_qgis.core.locators.base import BaseLocatorFilter
 from lantmateriet_qgis.core.settings import Settings
 from lantmateriet_qgis.core.util.designation import parse_designation
 
+MAX_RESULTS = 30
+"""Results shown for a designation, after which the remaining searches are aborted."""
+
+GA_RE = re.compile(r"\bga(?::|\s*$)", re.IGNORECASE)
+"""Matches the designation of a gemensamhetsanläggning, e.g. "Kåbo ga:1"."""
+
 
 class PropertyLocatorFilter(BaseLocatorFilter):
     def __init__(self, iface: QgisInterface):
@@ -52,10 +62,36 @@ class PropertyLocatorFilter(BaseLocatorFilter):
         if string is None or len(string) < 3:
             return
 
+        # the user data of the results, in the order they were emitted
+        emitted: list[dict] = []
+
+        # municipalities in the designation index are answered without the API, except
+        # for gemensamhetsanläggningar and searches without hits in the index, since it
+        # only holds the surface areas of the replica as of its last sync
+        index = s.designation_index()
+        if (
+            index is not None
+            and GA_RE.search(string) is None
+            and index.municipality(string) is not None
+        ):
+            for entry in index.search(string, limit=MAX_RESULTS):
+                data = dict(
+                    objektidentitet=entry.objektidentitet,
+                    type=entry.typ,
+                    collection=COLLECTION,
+                )
+                result = QgsLocatorResult(self, entry.objektidentitet, data)
+                result.displayString = entry.beteckning
+                result.group = entry.typ.capitalize()
+                result.icon = QgsIconUtils.iconPolygon()
+                self.resultFetched.emit(result)
+                emitted.append(data)
+            if emitted:
+                self.prefetch_geometries(emitted, feedback)
+                return
+
         if s.registerbeteckning_direkt_enabled:
-            client = RegisterbeteckningDirektClient(
-                s.ovrig_url, s.ovrig_authcfg, feedback
-            )
+            client = s.client(RegisterbeteckningDirektClient, feedback)
             try:
                 results = client.get_references_from_text(
                     string, status="gällande", objektstatus="levande", max_hits=100
@@ -74,69 +110,143 @@ class PropertyLocatorFilter(BaseLocatorFilter):
             ):
                 for item in list(items)[:10]:
                     if type == "gemensamhetsanläggning":
+                        data = dict(
+                            objektidentitet=item["gemensamhetsanlaggning"],
+                            type=type,
+                        )
                         result = QgsLocatorResult(
-                            self,
-                            item["gemensamhetsanlaggning"],
-                            dict(
-                                objektidentitet=item["gemensamhetsanlaggning"],
-                                type=type,
-                            ),
+                            self, item["gemensamhetsanlaggning"], data
                         )
                         result.group = "Gemensamhetsanläggning"
                     else:
-                        result = QgsLocatorResult(
-                            self,
-                            item["registerenhet"],
-                            dict(objektidentitet=item["registerenhet"], type=type),
-                        )
+                        data = dict(objektidentitet=item["registerenhet"], type=type)
+                        result = QgsLocatorResult(self, item["registerenhet"], data)
                         result.group = item["registerenhetstyp"]
                     result.displayString = item["beteckning"]
                     self.resultFetched.emit(result)
+                    emitted.append(data)
         elif s.fastighetsindelning_direkt_enabled:
             filters = parse_designation(string)
             if not filters:
                 return
 
-            client = FastighetsindelningDirektClient(
-                s.ovrig_url, s.ovrig_authcfg, feedback
-            )
+            client = s.client(FastighetsindelningDirektClient, feedback)
+            replica = s.replica()
+
+            def emit(collection: str, features: list[dict]):
+                for feature in features[: MAX_RESULTS - len(emitted)]:
+                    data = dict(**feature)
+                    data["collection"] = collection
+                    data["type"] = (
+                        "samfällighet" if feature["block"] == "s" else "fastighet"
+                    )
+                    result = QgsLocatorResult(self, feature["objektidentitet"], data)
+                    result.displayString = feature["beteckning"]
+                    if collection == "registerenhetsomradesytor":
+                        result.icon = QgsIconUtils.iconPolygon()
+                    elif collection == "registerenhetsomradeslinjer":
+                        result.icon = QgsIconUtils.iconLine()
+                    elif collection == "registerenhetsomradespunkter":
+                        result.icon = QgsIconUtils.iconPoint()
+                    self.resultFetched.emit(result)
+                    emitted.append(data)
 
+            searches = []
             for collection in (
                 "registerenhetsomradesytor",
                 "registerenhetsomradeslinjer",
                 "registerenhetsomradespunkter",
             ):
                 for filter in filters:
+                    found = None
+                    if replica is not None and collection == COLLECTION:
+                        found = replica.find_registerenheter(filter)
+                    if found:
+                        emit(collection, found)
+                    else:
+                        # only ask the API about what the replica does not have
+                        searches.append((collection, filter))
+
+            # the searches run concurrently, and the ones still in flight are aborted
+            # once there are enough results
+            if searches and len(emitted) < MAX_RESULTS:
+                with closing(client.iter_found_registerenheter(searches)) as responses:
                     try:
-                        response = client.find_registerenheter(collection, filter)
+                        for index, response in responses:
+                            if isinstance(response, NetworkError):
+                                self.logMessage(
+                                    repr(response), Qgis.MessageLevel.Warning
+                                )
+                                continue
+                            emit(searches[index][0], response)
+                            if len(emitted) >= MAX_RESULTS:
+                                break
                     except Canceled:
-                        continue
-
-                    for feature in response:
-                        data = dict(**feature)
-                        data["collection"] = collection
-                        data["type"] = (
-                            "samfällighet" if feature["block"] == "s" else "fastighet"
-                        )
-                        result = QgsLocatorResult(
-                            self, feature["objektidentitet"], data
-                        )
-                        result.displayString = feature["beteckning"]
-                        if collection == "registerenhetsomradesytor":
-                            result.icon = QgsIconUtils.iconPolygon()
-                        elif collection == "registerenhetsomradeslinjer":
-                            result.icon = QgsIconUtils.iconLine()
-                        elif collection == "registerenhetsomradespunkter":
-                            result.icon = QgsIconUtils.iconPoint()
-                        self.resultFetched.emit(result)
+                        return
         else:
             self.setEnabled(False)
+            return
+
+        self.prefetch_geometries(emitted, feedback)
+
+    def fetch_geometries(
+        self, user_data: list[dict], feedback: QgsFeedback | None
+    ) -> dict[str, QgsReferencedGeometry]:
+        s = Settings.load_from_settings()
+        geometries: dict[str, QgsReferencedGeometry] = {}
+
+        gemensamhetsanlaggningar = [
+            data["objektidentitet"]
+            for data in user_data
+            if data["type"] == "gemensamhetsanläggning"
+        ]
+        if gemensamhetsanlaggningar and s.gemensamhetsanlaggning_direkt_enabled:
+            client = s.client(GemensamhetsanlaggningDirektClient, feedback)
+            for item in client.get_many(gemensamhetsanlaggningar, "geometri"):
+                geometries[item["id"]] = item["geometry"]
+
+        # properties in the replica are already instant to look up
+        replica = s.replica()
+        registerenheter = [
+            data
+            for data in user_data
+            if data["type"] != "gemensamhetsanläggning"
+            and (
+                replica is None
+                or replica.registerenhet(data["objektidentitet"]) is None
+            )
+        ]
+        if not registerenheter:
+            return geometries
+        if s.fastighet_direkt_enabled:
+            client = s.client(FastighetOchSamfallighetDirektClient, feedback)
+            for item in client.get_many(
+                [data["objektidentitet"] for data in registerenheter], "omrade"
+            ):
+                geometries[item["id"]] = item["geometry"]
+        elif s.fastighetsindelning_direkt_enabled:
+            client = s.client(FastighetsindelningDirektClient, feedback)
+            for collection, items in groupby(
+                sorted(
+                    registerenheter, key=lambda data: data.get("collection", COLLECTION)
+                ),
+                lambda data: data.get("collection", COLLECTION),
+            ):
+                found = client.get_registerenheter(
+                    collection, [data["objektidentitet"] for data in items]
+                )
+                for id, registerenhet in found.items():
+                    geometries[id] = registerenhet["geometry"]
+        return geometries
 
     def triggerResult(self, result: QgsLocatorResult):
         self.clearPreviousResults()
 
         user_data = self.get_user_data(result)
         identifier = user_data["objektidentitet"]
+        if (geometry := self.cached_geometry(user_data)) is not None:
+            self.highlight(geometry)
+            return
 
         s = Settings.load_from_settings()
         if not s.ovrig_enabled or not s.ovrig_authcfg:
@@ -149,7 +259,7 @@ class PropertyLocatorFilter(BaseLocatorFilter):
                     Qgis.MessageLevel.Warning,
                 )
                 return
-            client = GemensamhetsanlaggningDirektClient(s.ovrig_url, s.ovrig_authcfg)
+            client = s.client(GemensamhetsanlaggningDirektClient)
             try:
                 result = client.get_one(identifier, "geometri")
             except Canceled:
@@ -158,11 +268,11 @@ class PropertyLocatorFilter(BaseLocatorFilter):
                 self.log_exception(e)
                 return
             geometry = result["geometry"]
+        elif (local := self.replica_geometry(s, identifier)) is not None:
+            geometry = local
         else:
             if s.fastighet_direkt_enabled:
-                client = FastighetOchSamfallighetDirektClient(
-                    s.ovrig_url, s.ovrig_authcfg
-                )
+                client = s.client(FastighetOchSamfallighetDirektClient)
                 try:
                     result = client.get_one(identifier, "omrade")
                 except Canceled:
@@ -172,7 +282,7 @@ class PropertyLocatorFilter(BaseLocatorFilter):
                     return
                 geometry = result["geometry"]
             elif s.fastighetsindelning_direkt_enabled:
-                client = FastighetsindelningDirektClient(s.ovrig_url, s.ovrig_authcfg)
+                client = s.client(FastighetsindelningDirektClient)
 
                 try:
                     geometries = client.get_registerenheter(
@@ -190,3 +300,11 @@ class PropertyLocatorFilter(BaseLocatorFilter):
                 return
 
         self.highlight(geometry)
+
+    @staticmethod
+    def replica_geometry(s: Settings, identifier: str) -> QgsReferencedGeometry | None:
+        replica = s.replica()
+        if replica is None:
+            return None
+        registerenhet = replica.registerenhet(identifier)
+        return registerenhet["geometry"] if registerenhet is not None else None
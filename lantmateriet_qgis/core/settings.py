@@ -1,10 +1,29 @@
 from dataclasses import dataclass
-from typing import Literal, Self
+from functools import partial
+from pathlib import Path
+from typing import Literal, Self, TypeVar
 
-from qgis.core import QgsApplication, QgsAuthManager, QgsSettings, QgsStringUtils
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsAuthManager,
+    QgsFeedback,
+    QgsMessageLog,
+    QgsSettings,
+    QgsStringUtils,
+)
 
 from lantmateriet_qgis.config import URLConfig
+from lantmateriet_qgis.core.clients.base import BaseClient
+from lantmateriet_qgis.core.clients.pool import ClientPool
+from lantmateriet_qgis.core.clients.replica import FastighetsindelningReplica
+from lantmateriet_qgis.core.util import throttle
+from lantmateriet_qgis.core.util.designation_index import DesignationIndex
 from lantmateriet_qgis.core.util.oauth_config import GrantFlow, load_oauth_config
+from lantmateriet_qgis.core.util.response_cache import ResponseCache
+from lantmateriet_qgis.core.util.telemetry import telemetry
+
+C = TypeVar("C", bound=BaseClient)
 
 
 @dataclass
@@ -25,6 +44,16 @@ class Settings:
     ortofoto_nedladdning_enabled: bool = False
     hojdgrid_nedladdning_enabled: bool = False
 
+    cache_enabled: bool = False
+    cache_ttl_hours: int = 24
+    cache_max_size_mb: int = 200
+
+    rate_limit: int = throttle.DEFAULT_RATE
+    max_retries: int = throttle.DEFAULT_MAX_RETRIES
+
+    telemetry_enabled: bool = False
+    telemetry_log: str = ""
+
     @property
     def ngp_url(self) -> str:
         if self.ngp == "production":
@@ -43,6 +72,77 @@ class Settings:
         else:
             return self.ovrig
 
+    @staticmethod
+    def cache_path() -> Path:
+        return (
+            Path(QgsApplication.qgisSettingsDirPath()) / "lantmateriet" / "cache.sqlite"
+        )
+
+    def response_cache(self) -> ResponseCache | None:
+        """Get the response cache for the Direkt clients, if it is enabled."""
+        if not self.cache_enabled:
+            return None
+        return ResponseCache.shared(
+            self.cache_path(),
+            self.cache_ttl_hours * 3600,
+            self.cache_max_size_mb * 1024 * 1024,
+        )
+
+    def client(self, client_class: type[C], feedback: QgsFeedback | None = None) -> C:
+        """Get a client for one of the Direkt APIs from the process-wide pool."""
+        return ClientPool.get(
+            client_class,
+            self.ovrig_url,
+            self.ovrig_authcfg,
+            feedback,
+            self.response_cache(),
+        )
+
+    def apply_to_clients(self):
+        """Apply the rate limit, retries and request logging to all clients."""
+        throttle.configure(self.rate_limit, self.max_retries)
+        telemetry.configure(
+            partial(
+                QgsMessageLog.logMessage,
+                tag="Lantmäteriet",
+                level=Qgis.MessageLevel.Info,
+                notifyUser=False,
+            )
+            if self.telemetry_enabled
+            else None,
+            Path(self.telemetry_log)
+            if self.telemetry_enabled and self.telemetry_log
+            else None,
+        )
+
+    @staticmethod
+    def replica_path() -> Path:
+        return (
+            Path(QgsApplication.qgisSettingsDirPath())
+            / "lantmateriet"
+            / "fastighetsindelning.gpkg"
+        )
+
+    def replica(self) -> FastighetsindelningReplica | None:
+        """Get the local replica of Fastighetsindelning, if one has been synced."""
+        if not self.replica_path().exists():
+            return None
+        return FastighetsindelningReplica.shared(self.replica_path())
+
+    @staticmethod
+    def designation_index_path() -> Path:
+        return (
+            Path(QgsApplication.qgisSettingsDirPath())
+            / "lantmateriet"
+            / "beteckningar.idx"
+        )
+
+    def designation_index(self) -> DesignationIndex | None:
+        """Get the index of the designations in the local replica, if one has been built."""
+        if not self.designation_index_path().exists():
+            return None
+        return DesignationIndex.shared(self.designation_index_path())
+
     @classmethod
     def load_from_settings(cls) -> Self:
         settings = QgsSettings()
@@ -75,6 +175,15 @@ class Settings:
             hojdgrid_nedladdning_enabled=bool(
                 settings.value("hojdgrid_nedladdning_enabled", False)
             ),
+            cache_enabled=bool(settings.value("cache_enabled", False)),
+            cache_ttl_hours=int(settings.value("cache_ttl_hours", 24)),
+            cache_max_size_mb=int(settings.value("cache_max_size_mb", 200)),
+            rate_limit=int(settings.value("rate_limit", throttle.DEFAULT_RATE)),
+            max_retries=int(
+                settings.value("max_retries", throttle.DEFAULT_MAX_RETRIES)
+            ),
+            telemetry_enabled=bool(settings.value("telemetry_enabled", False)),
+            telemetry_log=settings.value("telemetry_log", ""),
         )
 
     def store_to_settings(self):
@@ -107,6 +216,13 @@ class Settings:
         settings.setValue(
             "hojdgrid_nedladdning_enabled", self.hojdgrid_nedladdning_enabled
         )
+        settings.setValue("cache_enabled", self.cache_enabled)
+        settings.setValue("cache_ttl_hours", self.cache_ttl_hours)
+        settings.setValue("cache_max_size_mb", self.cache_max_size_mb)
+        settings.setValue("rate_limit", self.rate_limit)
+        settings.setValue("max_retries", self.max_retries)
+        settings.setValue("telemetry_enabled", self.telemetry_enabled)
+        settings.setValue("telemetry_log", self.telemetry_log)
 
     def validate(self) -> list[str]:
         errors = []
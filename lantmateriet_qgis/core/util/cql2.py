@@ -17,6 +17,14 @@ def equals(a: str | dict, b: str | int | dict) -> dict:
     return dict(op="=", args=[a, b])
 
 
+def greater_than(a: str | dict, b: str | int | dict) -> dict:
+    return dict(op=">", args=[a, b])
+
+
+def timestamp(value: str) -> dict:
+    return dict(timestamp=value)
+
+
 def between(value: int | dict, lower: int | dict, upper: int | dict) -> dict:
     return dict(op="between", args=[value, lower, upper])
 
@@ -45,3 +53,42 @@ def or_(items: list[dict]) -> dict:
     if len(items) == 1:
         return items[0]
     return dict(op="or", args=items)
+
+
+SQL_OPERATORS = {"=": "=", ">": ">", "like": "LIKE"}
+
+
+def to_sql(filter: dict) -> tuple[str, list]:
+    """Translate a filter built with these helpers to an SQLite expression.
+
+    Properties are used as column names, and all other values are passed as
+    parameters, which are returned along with the expression."""
+    parameters: list = []
+
+    def value(arg) -> str:
+        if isinstance(arg, dict) and "property" in arg:
+            if not arg["property"].isidentifier():
+                raise ValueError(f"Unsupported property: {arg['property']}")
+            return f'"{arg["property"]}"'
+        if isinstance(arg, dict) and "timestamp" in arg:
+            arg = arg["timestamp"]
+        elif isinstance(arg, dict):
+            return expression(arg)
+        parameters.append(arg)
+        return "?"
+
+    def expression(filter: dict) -> str:
+        op, args = filter["op"], filter["args"]
+        if op in ("and", "or"):
+            return "(" + f" {op.upper()} ".join(expression(a) for a in args) + ")"
+        if op in SQL_OPERATORS:
+            return f"{value(args[0])} {SQL_OPERATORS[op]} {value(args[1])}"
+        if op == "isNull":
+            return f"{value(args[0])} IS NULL"
+        if op == "in":
+            return f"{value(args[0])} IN ({', '.join(value(a) for a in args[1])})"
+        if op == "between":
+            return f"{value(args[0])} BETWEEN {value(args[1])} AND {value(args[2])}"
+        raise ValueError(f"Unsupported operator: {op}")
+
+    return expression(filter), parameters
@@ -4,24 +4,56 @@ from lantmateriet_qgis.core.util import cql2, municipalities
 
 designation_re = re.compile(r"([^0-9]+) ?(?:([0-9]+|s|ga)(?::([0-9]+)?)?)?")
 
+FOLD = str.maketrans("ÅÄÖ", "AAO")
+
+
+def fold(text: str) -> str:
+    """Uppercase a text and fold å, ä and ö, to match names typed without them."""
+    return text.upper().translate(FOLD)
+
+
+class MunicipalityMatcher:
+    """Finds the municipality whose name a text starts with.
+
+    The names are looked up in dicts by the prefixes of the text with the lengths of
+    the names, longest first, so that e.g. Markaryd is preferred over Mark. A name
+    spelled as it is written is preferred over one which only matches when folded,
+    which tells Håbo from Habo."""
+
+    def __init__(self, names: dict[str, str]):
+        self._exact = {name.upper(): code for code, name in names.items()}
+        self._folded: dict[str, str] = {}
+        for code, name in names.items():
+            self._folded.setdefault(fold(name), code)
+        self._lengths = sorted({len(name) for name in names.values()}, reverse=True)
+
+    def match(self, text: str) -> tuple[str, int] | None:
+        """Get the code of the municipality and the length of its name in the text."""
+        exact = text.upper()
+        folded = exact.translate(FOLD)
+        for length in self._lengths:
+            if length > len(text):
+                continue
+            code = self._exact.get(exact[:length]) or self._folded.get(folded[:length])
+            if code is not None:
+                return code, length
+        return None
+
+
+municipality_matcher = MunicipalityMatcher(municipalities)
+
 
 def parse_designation(designation: str) -> list[dict] | None:
     designation = designation_re.fullmatch(designation)
     if designation is None:
         return None
     designation_name = designation.group(1).strip()
-    municipality = next(
-        (
-            k
-            for k, v in municipalities.items()
-            if designation_name.upper().startswith(v.upper())
-        ),
-        None,
-    )
+    match = municipality_matcher.match(designation_name)
     filter_terms: list[dict] = []
-    if municipality is not None:
+    if match is not None:
+        municipality, length = match
         filter_terms.append(cql2.equals(cql2.property("kommunkod"), municipality))
-        designation_name = designation_name[len(municipalities[municipality]) :].strip()
+        designation_name = designation_name[length:].strip()
     filter_terms.append(
         cql2.startswith(cql2.property("trakt"), designation_name.upper())
     )
@@ -59,18 +91,12 @@ def parse_designation_exact(designation: str) -> dict | None:
     if designation is None:
         return None
     designation_name = designation.group(1).strip()
-    municipality = next(
-        (
-            k
-            for k, v in municipalities.items()
-            if designation_name.upper().startswith(v.upper())
-        ),
-        None,
-    )
+    match = municipality_matcher.match(designation_name)
     filter_terms: list[dict] = []
-    if municipality is not None:
+    if match is not None:
+        municipality, length = match
         filter_terms.append(cql2.equals(cql2.property("kommunkod"), municipality))
-        designation_name = designation_name[len(municipalities[municipality]) :].strip()
+        designation_name = designation_name[length:].strip()
     filter_terms.append(cql2.equals(cql2.property("trakt"), designation_name.upper()))
     if designation.group(2) is None:
         return None
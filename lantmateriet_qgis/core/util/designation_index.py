@@ -0,0 +1,154 @@
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from lantmateriet_qgis.core.util.municipalities import municipalities
+
+MAGIC = b"LMBI"
+VERSION = 1
+HEADER = struct.Struct("<4sHII")
+"""Magic, version, number of entries and length of the municipality codes."""
+
+OFFSET = struct.Struct("<I")
+SEPARATOR = b"\x1f"
+
+
+def normalize(text: str) -> str:
+    """Normalize a designation for prefix matching, ignoring case and whitespace."""
+    return " ".join(text.upper().split())
+
+
+class IndexEntry(NamedTuple):
+    beteckning: str
+    objektidentitet: str
+    typ: str
+    kommunkod: str
+
+
+class DesignationIndex:
+    """A sorted index of property designations, memory-mapped from a file.
+
+    The file holds a header, the codes of the indexed municipalities, an array of
+    offsets and the entries, sorted by their normalized designation. Prefix queries
+    are answered by a binary search over the offsets, without reading the file into
+    memory."""
+
+    _instances: dict[Path, "DesignationIndex"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._closed = False
+        self._file = path.open("rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count, kommunkoder_size = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a designation index")
+        kommunkoder = self._mmap[HEADER.size : HEADER.size + kommunkoder_size]
+        self.kommunkoder = set(kommunkoder.decode("ascii").split(",")) - {""}
+        self._offsets = HEADER.size + kommunkoder_size
+        self._data = self._offsets + (self._count + 1) * OFFSET.size
+        self.mtime = path.stat().st_mtime
+
+    @classmethod
+    def shared(cls, path: Path) -> "DesignationIndex":
+        """Get the index at a given path, reopening it if the file has been rebuilt."""
+        with cls._instances_lock:
+            index = cls._instances.get(path)
+            if index is None or index.mtime != path.stat().st_mtime:
+                if index is not None:
+                    index.close()
+                index = cls._instances[path] = cls(path)
+            return index
+
+    @classmethod
+    def release(cls, path: Path):
+        """Close the shared index at a given path, so that the file can be replaced."""
+        with cls._instances_lock:
+            index = cls._instances.pop(path, None)
+            if index is not None:
+                index.close()
+
+    @classmethod
+    def build(
+        cls, path: Path, kommunkoder: Iterable[str], entries: Iterable[IndexEntry]
+    ):
+        """Write an index of the given entries of the given municipalities to a file."""
+        records = sorted(
+            (
+                normalize(entry.beteckning).encode("utf-8"),
+                SEPARATOR.join(value.encode("utf-8") for value in entry),
+            )
+            for entry in entries
+        )
+        kommunkoder_data = ",".join(sorted(kommunkoder)).encode("ascii")
+        temporary = path.with_suffix(".tmp")
+        with temporary.open("wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(records), len(kommunkoder_data)))
+            f.write(kommunkoder_data)
+            offset = 0
+            for key, value in records:
+                f.write(OFFSET.pack(offset))
+                offset += len(key) + len(SEPARATOR) + len(value)
+            f.write(OFFSET.pack(offset))
+            for key, value in records:
+                f.write(key + SEPARATOR + value)
+        cls.release(path)
+        os.replace(temporary, path)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._mmap.close()
+            self._file.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _span(self, i: int) -> tuple[int, int]:
+        start, end = struct.unpack_from(
+            "<II", self._mmap, self._offsets + i * OFFSET.size
+        )
+        return self._data + start, self._data + end
+
+    def _key(self, i: int) -> bytes:
+        start, end = self._span(i)
+        return self._mmap[start : self._mmap.find(SEPARATOR, start, end)]
+
+    def municipality(self, text: str) -> str | None:
+        """Find the municipality a query starts with, if it is indexed."""
+        query = normalize(text)
+        for kommunkod in self.kommunkoder:
+            name = normalize(municipalities.get(kommunkod, ""))
+            if name and (query == name or query.startswith(name + " ")):
+                return kommunkod
+        return None
+
+    def search(self, prefix: str, limit: int = 10) -> list[IndexEntry]:
+        """Find the entries whose designation starts with a prefix, in sorted order."""
+        key = normalize(prefix).encode("utf-8")
+        with self._lock:
+            if self._closed:
+                return []
+            lo, hi = 0, self._count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._key(mid) < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            entries = []
+            for i in range(lo, min(lo + limit, self._count)):
+                start, end = self._span(i)
+                record = self._mmap[start:end].split(SEPARATOR)
+                if not record[0].startswith(key):
+                    break
+                entries.append(
+                    IndexEntry(*(value.decode("utf-8") for value in record[1:]))
+                )
+            return entries
@@ -0,0 +1,149 @@
+"""Incremental decoding of GeoJSON feature collections."""
+
+import codecs
+import json
+from typing import Any
+
+WHITESPACE = " \t\n\r"
+
+
+class FeatureCollectionParser:
+    """Parser for a GeoJSON feature collection, fed chunk by chunk as it arrives.
+
+    Every member of the `features` array is decoded and returned as soon as it is
+    complete, so that only a single feature and the undecoded remainder of the latest
+    chunk are held in memory at a time, rather than the whole response. All other
+    top-level members (e.g. `links` or `numberMatched`) are collected in `members`.
+    """
+
+    def __init__(self):
+        self.members: dict[str, Any] = {}
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._state = "start"
+        self._key: str | None = None
+        self._retry_length = 0
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, data: bytes) -> list[dict]:
+        """Feed the next chunk of the response, returning the features completed by it."""
+        self._buffer += self._text_decoder.decode(data)
+        features = []
+        self._parse(features, final=False)
+        return features
+
+    def close(self) -> list[dict]:
+        """Mark the end of the response, returning any remaining features.
+
+        Raises a `ValueError` if the response is not a complete feature collection."""
+        self._buffer += self._text_decoder.decode(b"", final=True)
+        features = []
+        self._parse(features, final=True)
+        if self._state != "done":
+            raise ValueError("Incomplete or invalid GeoJSON feature collection")
+        if self._buffer.strip(WHITESPACE):
+            raise ValueError("Unexpected data after GeoJSON feature collection")
+        return features
+
+    def _skip_whitespace(self, pos: int) -> int:
+        while pos < len(self._buffer) and self._buffer[pos] in WHITESPACE:
+            pos += 1
+        return pos
+
+    def _decode_value(self, pos: int, final: bool) -> tuple[Any, int] | None:
+        """Decode the JSON value at a position, if it is complete."""
+        if not final and len(self._buffer) - pos < self._retry_length:
+            return None
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise ValueError("Invalid GeoJSON feature collection")
+            # wait for the incomplete value to double in size before trying again, so
+            # that a value spanning many chunks is not decoded over and over
+            self._retry_length = 2 * (len(self._buffer) - pos)
+            return None
+        if (
+            end == len(self._buffer)
+            and not final
+            and not isinstance(value, (dict, list, str))
+        ):
+            # a number at the end of the buffer might continue in the next chunk
+            return None
+        self._retry_length = 0
+        return value, end
+
+    def _parse(self, features: list[dict], final: bool):
+        pos = 0
+        try:
+            while True:
+                pos = self._skip_whitespace(pos)
+                if self._state == "done" or pos == len(self._buffer):
+                    return
+                char = self._buffer[pos]
+                if self._state == "start":
+                    if char != "{":
+                        raise ValueError("Expected a GeoJSON object")
+                    self._state = "key_or_end"
+                    pos += 1
+                elif self._state in ("key_or_end", "key"):
+                    if char == "}" and self._state == "key_or_end":
+                        self._state = "done"
+                        pos += 1
+                        continue
+                    if char != '"':
+                        raise ValueError("Expected a member name")
+                    decoded = self._decode_value(pos, final)
+                    if decoded is None:
+                        return
+                    self._key, pos = decoded
+                    self._state = "colon"
+                elif self._state == "colon":
+                    if char != ":":
+                        raise ValueError("Expected ':'")
+                    self._state = "features" if self._key == "features" else "value"
+                    pos += 1
+                elif self._state == "value":
+                    decoded = self._decode_value(pos, final)
+                    if decoded is None:
+                        return
+                    self.members[self._key], pos = decoded
+                    self._state = "comma_or_end"
+                elif self._state == "comma_or_end":
+                    if char == ",":
+                        self._state = "key"
+                    elif char == "}":
+                        self._state = "done"
+                    else:
+                        raise ValueError("Expected ',' or '}'")
+                    pos += 1
+                elif self._state == "features":
+                    if char != "[":
+                        raise ValueError("Expected the features to be an array")
+                    self._state = "feature_or_end"
+                    pos += 1
+                elif self._state in ("feature_or_end", "feature"):
+                    if char == "]" and self._state == "feature_or_end":
+                        self._state = "comma_or_end"
+                        pos += 1
+                        continue
+                    decoded = self._decode_value(pos, final)
+                    if decoded is None:
+                        return
+                    feature, pos = decoded
+                    features.append(feature)
+                    self._state = "feature_separator"
+                elif self._state == "feature_separator":
+                    if char == ",":
+                        self._state = "feature"
+                    elif char == "]":
+                        self._state = "comma_or_end"
+                    else:
+                        raise ValueError("Expected ',' or ']'")
+                    pos += 1
+        finally:
+            self._buffer = self._buffer[pos:]
@@ -0,0 +1,197 @@
+"""Checkpoint journal for resumable downloads."""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+from qgis.core import (
+    QgsApplication,
+    QgsFeature,
+    QgsFields,
+    QgsGeometry,
+    QgsProcessingFeedback,
+)
+from qgis.PyQt.QtCore import QDateTime, Qt, QVariant
+
+T = TypeVar("T")
+
+MAX_AGE = 24 * 60 * 60
+"""Seconds after which a journal is too old to resume from, since the data has moved on."""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS written (
+    objektidentitet TEXT PRIMARY KEY,
+    sink TEXT,
+    geometry BLOB,
+    attributes TEXT
+);
+"""
+
+
+def journal_dir() -> Path:
+    return Path(QgsApplication.qgisSettingsDirPath()) / "lantmateriet" / "journals"
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, QDateTime):
+        return {"$datetime": value.toString(Qt.DateFormat.ISODateWithMs)}
+    if isinstance(value, QgsGeometry):
+        return {"$wkt": value.asWkt()}
+    if isinstance(value, QVariant) and value.isNull():
+        return None
+    raise TypeError(f"Cannot store a value of type {type(value)} in the journal")
+
+
+def _decode(value: dict) -> Any:
+    if value.keys() == {"$datetime"}:
+        return QDateTime.fromString(value["$datetime"], Qt.DateFormat.ISODateWithMs)
+    if value.keys() == {"$wkt"}:
+        return QgsGeometry.fromWkt(value["$wkt"])
+    return value
+
+
+class DownloadJournal:
+    """A record of the work done by a download, to resume it after a failure.
+
+    A journal is an SQLite database named after the algorithm and its parameters, so
+    that a rerun with the same parameters finds the journal of the failed run. It
+    holds named state, such as the references found in the first step of a download,
+    and every feature written to the sinks. When resuming, the features are written
+    to the new sinks from the journal and only the remaining objects are downloaded.
+    A journal older than `MAX_AGE` is discarded rather than resumed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(SCHEMA)
+        self._connection.execute(
+            "INSERT OR IGNORE INTO state (name, value) VALUES ('created', ?)",
+            (json.dumps(time.time()),),
+        )
+        self._connection.commit()
+
+    @classmethod
+    def for_run(cls, algorithm: str, parts: Iterable[str | bytes]) -> "DownloadJournal":
+        """Open the journal for a run of an algorithm with the given parameters.
+
+        Journals past `MAX_AGE`, of this run or of runs that were never resumed, are
+        removed first."""
+        key = hashlib.sha256(algorithm.encode())
+        for part in parts:
+            key.update(part if isinstance(part, bytes) else part.encode())
+            key.update(b"\0")
+        path = journal_dir() / f"{key.hexdigest()[:32]}.sqlite"
+        cls.remove_expired()
+        journal = cls(path)
+        if journal.age() > MAX_AGE:
+            journal.remove()
+            journal = cls(path)
+        return journal
+
+    @staticmethod
+    def remove_expired():
+        """Remove the journals which have not been written to within `MAX_AGE`."""
+        cutoff = time.time() - MAX_AGE
+        for path in journal_dir().glob("*.sqlite"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass  # in use, or already removed by another run
+
+    def age(self) -> float:
+        """Get the number of seconds since the journal was created."""
+        return time.time() - self.get("created")
+
+    def get(self, name: str) -> Any | None:
+        row = self._connection.execute(
+            "SELECT value FROM state WHERE name = ?", (name,)
+        ).fetchone()
+        return json.loads(row[0], object_hook=_decode) if row is not None else None
+
+    def set(self, name: str, value: Any):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO state (name, value) VALUES (?, ?)",
+            (name, json.dumps(value, default=_encode)),
+        )
+        self._connection.commit()
+
+    def written(self) -> set[str]:
+        """Get the objektidentitet of all objects handled so far."""
+        return {
+            row[0]
+            for row in self._connection.execute("SELECT objektidentitet FROM written")
+        }
+
+    def record(
+        self,
+        objektidentitet: str,
+        sink: str | None = None,
+        feature: QgsFeature | None = None,
+    ):
+        """Record an object as handled, with the feature written for it to a sink, if any.
+
+        Records are only persisted by the next `commit`."""
+        self._connection.execute(
+            "INSERT OR REPLACE INTO written VALUES (?, ?, ?, ?)",
+            (
+                objektidentitet,
+                sink if feature is not None else None,
+                bytes(feature.geometry().asWkb()) if feature is not None else None,
+                json.dumps(feature.attributes(), default=_encode)
+                if feature is not None
+                else None,
+            ),
+        )
+
+    def commit(self):
+        self._connection.commit()
+
+    def replay(self, sink: str, fields: QgsFields) -> Iterator[QgsFeature]:
+        """Recreate the features written to a sink so far."""
+        for wkb, attributes in self._connection.execute(
+            "SELECT geometry, attributes FROM written WHERE sink = ?", (sink,)
+        ):
+            feature = QgsFeature(fields)
+            geometry = QgsGeometry()
+            geometry.fromWkb(wkb)
+            feature.setGeometry(geometry)
+            feature.setAttributes(json.loads(attributes, object_hook=_decode))
+            yield feature
+
+    def close(self):
+        """Close the journal, keeping it to resume from."""
+        self._connection.close()
+
+    def remove(self):
+        """Remove the journal, once the download has completed."""
+        self._connection.close()
+        self.path.unlink(missing_ok=True)
+
+
+def journaled(
+    journal: DownloadJournal | None,
+    name: str,
+    compute: Callable[[], T],
+    feedback: QgsProcessingFeedback | None = None,
+) -> T:
+    """Get a named value from a journal, if any, computing and storing it if needed."""
+    if journal is not None:
+        value = journal.get(name)
+        if value is not None:
+            if feedback is not None:
+                feedback.pushInfo("Resuming an interrupted download...")
+            return value
+    value = compute()
+    if journal is not None:
+        journal.set(name, value)
+    return value
@@ -0,0 +1,39 @@
+"""Planning of the requests for many small geometries."""
+
+import math
+from typing import Iterable
+
+from qgis.core import QgsGeometry
+
+CELL_SIZE = 2000.0
+MAX_VERTICES = 5000
+
+
+def cluster_geometries(
+    geometries: Iterable[QgsGeometry],
+    cell_size: float = CELL_SIZE,
+    max_vertices: int = MAX_VERTICES,
+) -> list[QgsGeometry]:
+    """Combine nearby geometries into fewer geometries of at most `max_vertices` vertices.
+
+    Geometries are grouped by the grid cell of size `cell_size` that the center of their
+    bounding box falls in, so that a combined geometry only covers a small area, and
+    the geometries of a cell are merged until the vertex budget is reached. A geometry
+    with more vertices than the budget is kept on its own."""
+    clusters: list[list[QgsGeometry]] = []
+    open_clusters: dict[tuple[int, int], tuple[list[QgsGeometry], int]] = {}
+    for geometry in geometries:
+        center = geometry.boundingBox().center()
+        cell = (math.floor(center.x() / cell_size), math.floor(center.y() / cell_size))
+        vertices = geometry.constGet().nCoordinates()
+        members, count = open_clusters.get(cell, ([], 0))
+        if members and count + vertices > max_vertices:
+            clusters.append(members)
+            members, count = [], 0
+        members.append(geometry)
+        open_clusters[cell] = (members, count + vertices)
+    clusters += [members for members, _ in open_clusters.values()]
+    return [
+        members[0] if len(members) == 1 else QgsGeometry.unaryUnion(members)
+        for members in clusters
+    ]
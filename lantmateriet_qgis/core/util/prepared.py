@@ -0,0 +1,92 @@
+"""Prepared and spatially indexed geometries."""
+
+from typing import Iterable
+
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsCoordinateTransformContext,
+    QgsFeatureRequest,
+    QgsFeatureSource,
+    QgsFeedback,
+    QgsGeometry,
+    QgsGeometryEngine,
+    QgsSpatialIndex,
+)
+
+
+class PreparedGeometries:
+    """A set of geometries prepared for repeated intersection tests.
+
+    Candidates are found with a spatial index on the bounding boxes, and tested with a
+    prepared geometry engine per geometry, so that testing many geometries against the
+    set neither needs to union it into one large geometry nor to test every member."""
+
+    def __init__(self, geometries: Iterable[QgsGeometry] = ()):
+        self._index = QgsSpatialIndex()
+        self._geometries: list[QgsGeometry] = []
+        self._engines: list[QgsGeometryEngine] = []
+        for geometry in geometries:
+            self.add(geometry)
+
+    @classmethod
+    def from_source(
+        cls,
+        source: QgsFeatureSource,
+        crs: QgsCoordinateReferenceSystem,
+        transform_context: QgsCoordinateTransformContext,
+        feedback: QgsFeedback | None = None,
+    ) -> "PreparedGeometries":
+        """Read the geometries of a source once, transformed to a given CRS."""
+        transform = QgsCoordinateTransform(source.sourceCrs(), crs, transform_context)
+        request = QgsFeatureRequest()
+        request.setNoAttributes()
+        if feedback is not None:
+            request.setFeedback(feedback)
+        geometries = cls()
+        for feature in source.getFeatures(request):
+            if feedback is not None and feedback.isCanceled():
+                break
+            geometry = feature.geometry()
+            if geometry.isNull():
+                continue
+            geometry.transform(transform)
+            geometries.add(geometry)
+        return geometries
+
+    def __len__(self) -> int:
+        return len(self._geometries)
+
+    def __iter__(self):
+        return iter(self._geometries)
+
+    def add(self, geometry: QgsGeometry) -> int:
+        """Add a geometry to the set, returning its index."""
+        if geometry.isNull():
+            raise ValueError("Cannot prepare a null geometry")
+        index = len(self._geometries)
+        engine = QgsGeometry.createGeometryEngine(geometry.constGet())
+        engine.prepareGeometry()
+        self._geometries.append(geometry)
+        self._engines.append(engine)
+        self._index.addFeature(index, geometry.boundingBox())
+        return index
+
+    def intersecting(self, geometry: QgsGeometry) -> list[int]:
+        """Get the indexes of the geometries in the set which intersect a geometry."""
+        if geometry.isNull():
+            return []
+        return [
+            index
+            for index in self._index.intersects(geometry.boundingBox())
+            if self._engines[index].intersects(geometry.constGet())
+        ]
+
+    def intersects(self, geometry: QgsGeometry) -> bool:
+        """Check whether any of the geometries in the set intersects a geometry."""
+        if geometry.isNull():
+            return False
+        return any(
+            self._engines[index].intersects(geometry.constGet())
+            for index in self._index.intersects(geometry.boundingBox())
+        )
@@ -0,0 +1,198 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS features (
+    namespace TEXT NOT NULL,
+    objektidentitet TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    objektversion INTEGER,
+    version_giltig_fran TEXT,
+    stored REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (namespace, objektidentitet, variant)
+);
+CREATE INDEX IF NOT EXISTS features_accessed ON features (accessed);
+CREATE INDEX IF NOT EXISTS features_stored ON features (stored);
+"""
+
+EVICT_INTERVAL = 1000
+"""Features stored between the removals of expired entries."""
+
+
+def feature_version(feature: dict) -> tuple[int | None, str | None]:
+    """Find the objektversion and versionGiltigFran of a feature, if it has any.
+
+    They are either found among the properties, or in one of the attribute objects
+    (e.g. `fastighetsattribut` or `adressplatsattribut`)."""
+    properties = feature.get("properties") or {}
+    for candidate in (
+        properties,
+        *(value for value in properties.values() if isinstance(value, dict)),
+    ):
+        if "objektversion" in candidate or "versionGiltigFran" in candidate:
+            return candidate.get("objektversion"), candidate.get("versionGiltigFran")
+    return None, None
+
+
+class ResponseCache:
+    """Persistent cache of features from the Direkt APIs, stored in an SQLite database.
+
+    Features are stored per objektidentitet and variant (the included data and the
+    CRS requested). Entries expire after `ttl` seconds, the least recently used
+    entries are evicted when the cache grows beyond `max_size` bytes, and storing a
+    newer version of an object invalidates all older versions of it.
+
+    The size of the cache is kept as a running total, so that entries are only evicted
+    when it grows too big or every `EVICT_INTERVAL` stored features, rather than on
+    every write."""
+
+    _instances: dict[Path, "ResponseCache"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: Path, ttl: float, max_size: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # an upper bound of the size of the cache, counted since the last eviction
+        self._size: int | None = None
+        self._writes = 0
+
+    @classmethod
+    def shared(cls, path: Path, ttl: float, max_size: int) -> "ResponseCache":
+        """Get the cache for a given path, shared by all clients in the process."""
+        with cls._instances_lock:
+            cache = cls._instances.get(path)
+            if cache is None:
+                cache = cls._instances[path] = cls(path, ttl, max_size)
+            cache.ttl = ttl
+            cache.max_size = max_size
+            return cache
+
+    def _connection(self) -> sqlite3.Connection:
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def get_many(
+        self, namespace: str, ids: Iterable[str], variant: str
+    ) -> dict[str, dict]:
+        """Get the cached, unexpired features for the given ids."""
+        ids = list(ids)
+        if not ids:
+            return {}
+        now = time.time()
+        connection = self._connection()
+        found: dict[str, dict] = {}
+        with connection:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i : i + 500]
+                rows = connection.execute(
+                    f"SELECT objektidentitet, payload FROM features WHERE namespace = ? AND variant = ? AND stored > ? AND objektidentitet IN ({','.join('?' * len(chunk))})",
+                    (namespace, variant, now - self.ttl, *chunk),
+                ).fetchall()
+                found.update((id, json.loads(payload)) for id, payload in rows)
+            if found:
+                connection.executemany(
+                    "UPDATE features SET accessed = ? WHERE namespace = ? AND variant = ? AND objektidentitet = ?",
+                    ((now, namespace, variant, id) for id in found),
+                )
+        return found
+
+    def put_many(self, namespace: str, variant: str, features: Iterable[dict]):
+        """Store features, invalidating any cached older versions of the same objects."""
+        now = time.time()
+        connection = self._connection()
+        written = 0
+        added = 0
+        with connection:
+            for feature in features:
+                id = feature.get("id") or feature["properties"]["objektidentitet"]
+                objektversion, version_giltig_fran = feature_version(feature)
+                if objektversion is not None:
+                    connection.execute(
+                        "DELETE FROM features WHERE namespace = ? AND objektidentitet = ? AND objektversion < ?",
+                        (namespace, id, objektversion),
+                    )
+                if version_giltig_fran is not None:
+                    connection.execute(
+                        "DELETE FROM features WHERE namespace = ? AND objektidentitet = ? AND version_giltig_fran < ?",
+                        (namespace, id, version_giltig_fran),
+                    )
+                payload = json.dumps(feature)
+                connection.execute(
+                    "INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        namespace,
+                        id,
+                        variant,
+                        objektversion,
+                        version_giltig_fran,
+                        now,
+                        now,
+                        len(payload),
+                        payload,
+                    ),
+                )
+                written += 1
+                added += len(payload)
+        with self._lock:
+            self._writes += written
+            if self._size is not None:
+                self._size += added
+            due = (
+                self._size is None
+                or self._size > self.max_size
+                or self._writes >= EVICT_INTERVAL
+            )
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Remove expired entries, and the least recently used ones if the cache is too big."""
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "DELETE FROM features WHERE stored <= ?", (time.time() - self.ttl,)
+            )
+            (size,) = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM features"
+            ).fetchone()
+            if size > self.max_size:
+                excess = size - int(self.max_size * 0.9)
+                rows = connection.execute(
+                    "SELECT rowid, size FROM features ORDER BY accessed"
+                )
+                evicted = []
+                for rowid, row_size in rows:
+                    if excess <= 0:
+                        break
+                    evicted.append((rowid,))
+                    excess -= row_size
+                    size -= row_size
+                connection.executemany("DELETE FROM features WHERE rowid = ?", evicted)
+        with self._lock:
+            self._size = size
+            self._writes = 0
+
+    def clear(self):
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM features")
+        connection.execute("VACUUM")
+        with self._lock:
+            self._size = 0
+            self._writes = 0
@@ -0,0 +1,185 @@
+import bisect
+import copy
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, TextIO
+
+from lantmateriet_qgis.core.util import UUID_RE
+
+LATENCY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+"""Upper bounds of the latency histogram buckets, in milliseconds."""
+
+
+def endpoint_name(method: str, path: str) -> str:
+    """Name the endpoint of a request, with the ids in its path replaced."""
+    return f"{method} {UUID_RE.sub('{id}', path)}"
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    errors: int = 0
+    bytes: int = 0
+    latency_ms: float = 0.0
+    parse_ms: float = 0.0
+    histogram: list[int] = field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1)
+    )
+
+    def add(self, latency_ms: float, size: int, parse_ms: float, error: bool):
+        self.requests += 1
+        self.errors += int(error)
+        self.bytes += size
+        self.latency_ms += latency_ms
+        self.parse_ms += parse_ms
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS, latency_ms)] += 1
+
+    def since(self, earlier: "EndpointStats | None") -> "EndpointStats":
+        """Get the stats of the requests made after an earlier snapshot of them."""
+        if earlier is None:
+            return copy.deepcopy(self)
+        return EndpointStats(
+            self.requests - earlier.requests,
+            self.errors - earlier.errors,
+            self.bytes - earlier.bytes,
+            self.latency_ms - earlier.latency_ms,
+            self.parse_ms - earlier.parse_ms,
+            [a - b for a, b in zip(self.histogram, earlier.histogram)],
+        )
+
+    def percentile(self, q: float) -> float:
+        """Estimate a latency percentile, as the upper bound of its histogram bucket."""
+        rank = q * self.requests
+        seen = 0
+        for bound, count in zip((*LATENCY_BUCKETS, float("inf")), self.histogram):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def summary(self, endpoint: str) -> str:
+        mean = self.latency_ms / self.requests if self.requests else 0.0
+        p95 = self.percentile(0.95)
+        p95_text = f"> {LATENCY_BUCKETS[-1]}" if p95 == float("inf") else f"<= {p95}"
+        return (
+            f"{endpoint}: {self.requests} requests, {self.errors} errors, "
+            f"{self.bytes / 1024:.0f} kB, mean {mean:.0f} ms, p95 {p95_text} ms, "
+            f"parsing {self.parse_ms:.0f} ms"
+        )
+
+
+class Telemetry:
+    """Thread-safe per-endpoint timing of the requests of all clients.
+
+    Every request is counted. When configured, each request is also passed to a log
+    function and appended to a JSON-lines file. The file is written outside the lock
+    of the counts, and is turned off if it cannot be written."""
+
+    def __init__(self):
+        self._endpoints: dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+        self._log: Callable[[str], None] | None = None
+        self._log_file: Path | None = None
+        self._file_lock = threading.Lock()
+        self._file: TextIO | None = None
+
+    def configure(
+        self,
+        log: Callable[[str], None] | None = None,
+        log_file: Path | None = None,
+    ):
+        with self._lock:
+            self._log = log
+            self._log_file = log_file
+        with self._file_lock:
+            self._close()
+
+    def record(
+        self,
+        endpoint: str,
+        latency_ms: float,
+        size: int,
+        parse_ms: float = 0.0,
+        status: int | None = None,
+        error: bool = False,
+    ):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.add(latency_ms, size, parse_ms, error)
+            log, log_file = self._log, self._log_file
+        if log_file is not None:
+            self._write(
+                log_file,
+                json.dumps(
+                    dict(
+                        time=time.time(),
+                        endpoint=endpoint,
+                        latency_ms=round(latency_ms, 1),
+                        bytes=size,
+                        parse_ms=round(parse_ms, 1),
+                        status=status,
+                        error=error,
+                    )
+                )
+                + "\n",
+                log,
+            )
+        if log is not None:
+            log(
+                f"{endpoint} {status if status is not None else '-'} "
+                f"{latency_ms:.0f} ms, {size} bytes, parsed in {parse_ms:.0f} ms"
+            )
+
+    def _write(self, log_file: Path, line: str, log: Callable[[str], None] | None):
+        """Append a line to the log file, turning the file off if it cannot be written."""
+        with self._file_lock:
+            if log_file != self._log_file:
+                return
+            try:
+                if self._file is None:
+                    self._file = log_file.open("a", encoding="utf-8", buffering=1)
+                self._file.write(line)
+                return
+            except OSError as e:
+                self._close()
+                self._log_file = None
+                message = (
+                    f"Could not write the request log {log_file}, it is turned off: {e}"
+                )
+        if log is not None:
+            log(message)
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def snapshot(self) -> dict[str, EndpointStats]:
+        with self._lock:
+            return copy.deepcopy(self._endpoints)
+
+    def summary(self, since: dict[str, EndpointStats] | None = None) -> list[str]:
+        """Summarize the requests of each endpoint, optionally since a snapshot."""
+        since = since or {}
+        lines = []
+        for endpoint, stats in sorted(self.snapshot().items()):
+            stats = stats.since(since.get(endpoint))
+            if stats.requests:
+                lines.append(stats.summary(endpoint))
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+telemetry = Telemetry()
+"""The telemetry shared by all clients."""
@@ -0,0 +1,131 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable
+
+DEFAULT_RATE = 10
+"""Requests per second allowed by default, for all clients together."""
+
+DEFAULT_MAX_RETRIES = 5
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """A thread-safe token bucket, spacing out requests to a rate with bursts up to a size.
+
+    A rate of zero or less disables the limit."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.configure(rate, burst)
+
+    def configure(self, rate: float, burst: int | None = None):
+        with self._lock:
+            self.rate = rate
+            self.burst = max(1, burst if burst is not None else round(rate))
+            self._tokens = float(self.burst)
+            self._updated = self._clock()
+
+    def reserve(self) -> float:
+        """Take a token, returning how many seconds to wait before using it."""
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            now = self._clock()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            # tokens may go negative, queueing the callers in the order they came
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter, for responses telling us to come back later."""
+
+    max_retries: int = DEFAULT_MAX_RETRIES
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+
+    def should_retry(self, status: int | None, attempt: int) -> bool:
+        return status in RETRYABLE_STATUSES and attempt < self.max_retries
+
+    def delay(
+        self,
+        attempt: int,
+        retry_after: float | None = None,
+        jitter: Callable[[], float] = random.random,
+    ) -> float | None:
+        """Get the seconds to wait before a retry, honouring a Retry-After of the server.
+
+        Gives up with None when the server asks for a wait longer than `max_delay`,
+        rather than blocking the caller, which may be the main thread, for that long."""
+        if retry_after is not None:
+            return max(0.0, retry_after) if retry_after <= self.max_delay else None
+        return jitter() * min(self.max_delay, self.base_delay * 2**attempt)
+
+
+def parse_retry_after(value: str | None, now: datetime | None = None) -> float | None:
+    """Parse a Retry-After header, given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (date - now).total_seconds())
+
+
+class ThrottleStats:
+    """Counters for the retries and the time spent waiting on the rate limit and backoff."""
+
+    def __init__(self):
+        self.retries = 0
+        self.throttled_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def add_throttled(self, seconds: float):
+        with self._lock:
+            self.throttled_seconds += seconds
+
+    def clear(self):
+        with self._lock:
+            self.retries = 0
+            self.throttled_seconds = 0.0
+
+
+rate_limiter = TokenBucket(DEFAULT_RATE)
+"""The rate limit shared by all clients."""
+
+retry_policy = RetryPolicy()
+"""The retry policy shared by all clients."""
+
+stats = ThrottleStats()
+
+
+def configure(rate: float, max_retries: int):
+    """Apply the rate limit and number of retries from the settings."""
+    rate_limiter.configure(rate)
+    retry_policy.max_retries = max_retries
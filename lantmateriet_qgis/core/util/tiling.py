@@ -0,0 +1,34 @@
+"""Helpers to split an extent into tiles."""
+
+import math
+
+from qgis.core import QgsRectangle
+
+
+def grid(extent: QgsRectangle, size: float) -> list[QgsRectangle]:
+    """Split an extent into a grid of equally sized tiles no larger than `size`."""
+    columns = max(1, math.ceil(extent.width() / size))
+    rows = max(1, math.ceil(extent.height() / size))
+    width = extent.width() / columns
+    height = extent.height() / rows
+    return [
+        QgsRectangle(
+            extent.xMinimum() + column * width,
+            extent.yMinimum() + row * height,
+            extent.xMinimum() + (column + 1) * width,
+            extent.yMinimum() + (row + 1) * height,
+        )
+        for row in range(rows)
+        for column in range(columns)
+    ]
+
+
+def quadrants(tile: QgsRectangle) -> list[QgsRectangle]:
+    """Split a tile into its four quadrants."""
+    center = tile.center()
+    return [
+        QgsRectangle(tile.xMinimum(), tile.yMinimum(), center.x(), center.y()),
+        QgsRectangle(center.x(), tile.yMinimum(), tile.xMaximum(), center.y()),
+        QgsRectangle(tile.xMinimum(), center.y(), center.x(), tile.yMaximum()),
+        QgsRectangle(center.x(), center.y(), tile.xMaximum(), tile.yMaximum()),
+    ]
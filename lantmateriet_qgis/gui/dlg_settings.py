@@ -25,7 +25,9 @@ from lantmateriet_qgis.__about__ import (
     __uri_homepage__,
 )
 from lantmateriet_qgis.config import URLConfig
+from lantmateriet_qgis.core.functions.cache import function_cache
 from lantmateriet_qgis.core.settings import Settings
+from lantmateriet_qgis.core.util import throttle
 from lantmateriet_qgis.core.util.oauth_config import (
     load_oauth_config,
     store_oauth_config,
@@ -75,6 +77,8 @@ class ConfigOptionsPage(FORM_CLASS, QgsOptionsPageWidget):
 
         self.button_add_connections.clicked.connect(self.add_to_connections)
         self.button_validate.clicked.connect(self.validate)
+        self.button_clear_cache.clicked.connect(self.clear_cache)
+        self.button_clear_function_cache.clicked.connect(self.clear_function_cache)
 
         self.load_settings()
 
@@ -141,6 +145,16 @@ class ConfigOptionsPage(FORM_CLASS, QgsOptionsPageWidget):
         s.ortofoto_nedladdning_enabled = self.button_ortofoto_nedladdning.isChecked()
         s.hojdgrid_nedladdning_enabled = self.button_hojdgrid_nedladdning.isChecked()
 
+        s.cache_enabled = self.group_box_cache.isChecked()
+        s.cache_ttl_hours = self.spin_box_cache_ttl.value()
+        s.cache_max_size_mb = self.spin_box_cache_max_size.value()
+
+        s.rate_limit = self.spin_box_rate_limit.value()
+        s.max_retries = self.spin_box_max_retries.value()
+
+        s.telemetry_enabled = self.group_box_telemetry.isChecked()
+        s.telemetry_log = self.file_widget_telemetry_log.filePath()
+
         return s
 
     def apply(self):
@@ -151,6 +165,9 @@ class ConfigOptionsPage(FORM_CLASS, QgsOptionsPageWidget):
         s = self._to_settings()
         QgsMessageLog.logMessage(f"Storing settings: {repr(s)}")
         s.store_to_settings()
+        s.apply_to_clients()
+        # cached results of the expression functions depend on the settings
+        function_cache.clear()
 
         if (
             s.ovrig_enabled
@@ -201,6 +218,34 @@ class ConfigOptionsPage(FORM_CLASS, QgsOptionsPageWidget):
                 self.tr("Konfigurationen är korrekt."),
             )
 
+    def clear_cache(self):
+        s = self._to_settings()
+        s.cache_enabled = True
+        s.response_cache().clear()
+        QMessageBox.information(
+            self,
+            self.tr("Töm cache"),
+            self.tr("Den lokala cachen har tömts."),
+        )
+
+    def clear_function_cache(self):
+        function_cache.clear()
+        self.update_function_cache_stats()
+
+    def update_function_cache_stats(self):
+        self.label_function_cache_stats.setText(
+            self.tr("{0} poster, {1} träffar, {2} missar").format(
+                len(function_cache), function_cache.hits, function_cache.misses
+            )
+        )
+
+    def update_throttle_stats(self):
+        self.label_throttle_stats.setText(
+            self.tr("{0} nya försök, {1:.1f} sekunders väntan").format(
+                throttle.stats.retries, throttle.stats.throttled_seconds
+            )
+        )
+
     def get_existing_stac_connection_keys(self):
         # Get STAC connections node
         stac_settings_node = QgsSettingsTree.node("connections").childNode("stac")
@@ -475,6 +520,19 @@ class ConfigOptionsPage(FORM_CLASS, QgsOptionsPageWidget):
         self.button_ortofoto_nedladdning.setChecked(s.ortofoto_nedladdning_enabled)
         self.button_hojdgrid_nedladdning.setChecked(s.hojdgrid_nedladdning_enabled)
 
+        self.group_box_cache.setChecked(s.cache_enabled)
+        self.spin_box_cache_ttl.setValue(s.cache_ttl_hours)
+        self.spin_box_cache_max_size.setValue(s.cache_max_size_mb)
+
+        self.spin_box_rate_limit.setValue(s.rate_limit)
+        self.spin_box_max_retries.setValue(s.max_retries)
+
+        self.group_box_telemetry.setChecked(s.telemetry_enabled)
+        self.file_widget_telemetry_log.setFilePath(s.telemetry_log)
+
+        self.update_function_cache_stats()
+        self.update_throttle_stats()
+
 
 class PluginOptionsWidgetFactory(QgsOptionsWidgetFactory):
     """Factory for options widget."""
@@ -11,6 +11,7 @@ from lantmateriet_qgis.__about__ import (
 )
 from lantmateriet_qgis.core.locators.address import AddressLocatorFilter
 from lantmateriet_qgis.core.locators.property import PropertyLocatorFilter
+from lantmateriet_qgis.core.settings import Settings
 from lantmateriet_qgis.gui.dlg_settings import PluginOptionsWidgetFactory
 from lantmateriet_qgis.processing import LantmaterietProvider
 
@@ -44,6 +45,8 @@ class LantmaterietPlugin:
     def initGui(self):
         """Set up plugin UI elements."""
 
+        Settings.load_from_settings().apply_to_clients()
+
         self.options_factory = PluginOptionsWidgetFactory()
         self.iface.registerOptionsWidgetFactory(self.options_factory)
 
@@ -11,6 +11,13 @@ from lantmateriet_qgis.processing.download_properties import (
     DownloadPropertiesBoundingAlgorithm,
     DownloadPropertiesPolygonAlgorithm,
 )
+from lantmateriet_qgis.processing.geocode_addresses import GeocodeAddressesAlgorithm
+from lantmateriet_qgis.processing.prefetch_expression import (
+    PrefetchExpressionAlgorithm,
+)
+from lantmateriet_qgis.processing.reverse_geocode import ReverseGeocodeAlgorithm
+from lantmateriet_qgis.processing.sync_properties import SyncPropertiesAlgorithm
+from lantmateriet_qgis.processing.sync_replica import SyncReplicaAlgorithm
 
 
 class LantmaterietProvider(QgsProcessingProvider):
@@ -24,6 +31,11 @@ class LantmaterietProvider(QgsProcessingProvider):
         self.addAlgorithm(DownloadAddressesPolygonAlgorithm())
         self.addAlgorithm(DownloadPropertiesBoundingAlgorithm())
         self.addAlgorithm(DownloadPropertiesPolygonAlgorithm())
+        self.addAlgorithm(GeocodeAddressesAlgorithm())
+        self.addAlgorithm(ReverseGeocodeAlgorithm())
+        self.addAlgorithm(PrefetchExpressionAlgorithm())
+        self.addAlgorithm(SyncPropertiesAlgorithm())
+        self.addAlgorithm(SyncReplicaAlgorithm())
 
     def id(self) -> str:
         """Unique provider id, used for identifying it. This string should be unique, \
@@ -1,25 +1,26 @@
 import json
-from typing import Any, Optional
+from functools import partial
+from typing import Any, Iterable, Optional
 
 from qgis.core import (
     QgsCoordinateReferenceSystem,
     QgsFeature,
-    QgsFeatureRequest,
     QgsFeatureSink,
     QgsField,
     QgsFields,
-    QgsGeometry,
     QgsProcessing,
     QgsProcessingAlgorithm,
     QgsProcessingContext,
     QgsProcessingException,
     QgsProcessingFeatureSource,
     QgsProcessingFeedback,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterDefinition,
     QgsProcessingParameterExtent,
     QgsProcessingParameterFeatureSink,
     QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterNumber,
     QgsRectangle,
-    QgsReferencedGeometry,
     QgsWkbTypes,
 )
 from qgis.PyQt.QtCore import QMetaType
@@ -32,6 +33,11 @@ from lantmateriet_qgis.core.clients.belagenhetsadressdirekt import (
     BelagenhetsadressTotal,
 )
 from lantmateriet_qgis.core.settings import Settings
+from lantmateriet_qgis.core.util import planning
+from lantmateriet_qgis.core.util.journal import DownloadJournal, journaled
+from lantmateriet_qgis.core.util.planning import cluster_geometries
+from lantmateriet_qgis.core.util.prepared import PreparedGeometries
+from lantmateriet_qgis.core.util.telemetry import telemetry
 
 fields = QgsFields()
 fields.append(QgsField("objektidentitet", QMetaType.Type.QString))
@@ -79,6 +85,7 @@ def to_feature(address: BelagenhetsadressTotal) -> QgsFeature:
 
 class AbstractDownloadPropertiesAlgorithm(QgsProcessingAlgorithm):
     OUTPUT = "OUTPUT"
+    RESUME = "RESUME"
 
     def group(self) -> str:
         return "Nedladdning"
@@ -89,12 +96,48 @@ class AbstractDownloadPropertiesAlgorithm(QgsProcessingAlgorithm):
     def helpUrl(self) -> str:
         return f"https://qgissverige.github.io/lantmateriet-qgis-plugin/usage/algoritmer/{self.name().replace('_', '-')}/"
 
+    def prepareAlgorithm(
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> bool:
+        self._requests = telemetry.snapshot()
+        return True
+
+    def postProcessAlgorithm(
+        self, context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> dict[str, Any]:
+        summary = telemetry.summary(self._requests)
+        if feedback is not None and summary:
+            feedback.pushInfo("Requests to Lantmäteriet:")
+            for line in summary:
+                feedback.pushInfo(line)
+        return {}
+
     def initAlgorithm(self, config: Optional[dict[str, Any]] = None):
         self.addParameter(
             QgsProcessingParameterFeatureSink(
                 self.OUTPUT, "Output layer", QgsProcessing.SourceType.TypeVectorPoint
             )
         )
+        resume = QgsProcessingParameterBoolean(
+            self.RESUME, "Resume an interrupted download", defaultValue=True
+        )
+        resume.setFlags(
+            resume.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced
+        )
+        self.addParameter(resume)
+
+    def open_journal(
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        parts: Iterable[str | bytes],
+    ) -> DownloadJournal | None:
+        if not self.parameterAsBoolean(parameters, self.RESUME, context):
+            return None
+        return DownloadJournal.for_run(self.name(), parts)
 
     def load_sink(
         self,
@@ -114,6 +157,12 @@ class AbstractDownloadPropertiesAlgorithm(QgsProcessingAlgorithm):
 
         return sink, dest_id
 
+    @staticmethod
+    def warn_truncated(feedback: QgsProcessingFeedback, tile: QgsRectangle):
+        feedback.pushWarning(
+            f"Svaret från Lantmäteriet för området {tile.toString()} var ofullständigt, alla adresser inom det kanske inte kommer med i nedladdningen."
+        )
+
     @classmethod
     def add_address_objects(
         cls,
@@ -122,8 +171,19 @@ class AbstractDownloadPropertiesAlgorithm(QgsProcessingAlgorithm):
         feedback: QgsProcessingFeedback,
         client: BelagenhetsadressDirektClient,
         from_: float,
+        extent: PreparedGeometries | None = None,
+        journal: DownloadJournal | None = None,
     ):
         feedback.pushInfo("Fetching address geometries...")
+        if journal is not None:
+            sink.addFeatures(
+                list(journal.replay(cls.OUTPUT, fields)),
+                QgsFeatureSink.Flag.FastInsert,
+            )
+            written = journal.written()
+            references = [
+                ref for ref in references if ref["objektidentitet"] not in written
+            ]
         references_chunks = [
             references[i : i + BelagenhetsadressDirektClient.MAX_GET_MANY]
             for i in range(
@@ -138,14 +198,24 @@ class AbstractDownloadPropertiesAlgorithm(QgsProcessingAlgorithm):
             objects = client.get_many(
                 [ref["objektidentitet"] for ref in chunk], "total"
             )
-            features = [to_feature(obj) for obj in objects]
+            features = []
+            for obj in objects:
+                feature = None
+                if extent is None or extent.intersects(obj["geometry"]):
+                    feature = to_feature(obj)
+                    features.append(feature)
+                if journal is not None:
+                    journal.record(obj["objektidentitet"], cls.OUTPUT, feature)
             sink.addFeatures(features, QgsFeatureSink.Flag.FastInsert)
+            if journal is not None:
+                journal.commit()
 
             feedback.setProgress(from_ + int(current * total))
 
 
 class DownloadAddressesPolygonAlgorithm(AbstractDownloadPropertiesAlgorithm):
     INPUT = "INPUT"
+    MAX_VERTICES = "MAX_VERTICES"
 
     def name(self) -> str:
         return "download_addresses_polygons"
@@ -167,6 +237,18 @@ class DownloadAddressesPolygonAlgorithm(AbstractDownloadPropertiesAlgorithm):
 
         super().initAlgorithm(config)
 
+        max_vertices = QgsProcessingParameterNumber(
+            self.MAX_VERTICES,
+            "Maximum vertices per query area",
+            QgsProcessingParameterNumber.Type.Integer,
+            defaultValue=planning.MAX_VERTICES,
+            minValue=1,
+        )
+        max_vertices.setFlags(
+            max_vertices.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced
+        )
+        self.addParameter(max_vertices)
+
     def processAlgorithm(
         self,
         parameters: dict[str, Any],
@@ -192,33 +274,49 @@ class DownloadAddressesPolygonAlgorithm(AbstractDownloadPropertiesAlgorithm):
             raise QgsProcessingException(
                 "Belägenhetsadress Direkt is not enabled in the settings"
             )
-        client = BelagenhetsadressDirektClient(s.ovrig_url, s.ovrig_authcfg, feedback)
+        client = BelagenhetsadressDirektClient(
+            s.ovrig_url, s.ovrig_authcfg, feedback, cache=s.response_cache()
+        )
 
-        feedback.pushInfo("Fetching address references within polygons...")
-        references: dict[str, BelagenhetsadressReference] = {}
+        geometries = PreparedGeometries.from_source(
+            source,
+            QgsCoordinateReferenceSystem.fromEpsgId(3006),
+            context.transformContext(),
+            feedback,
+        )
+        clusters = cluster_geometries(
+            geometries,
+            max_vertices=self.parameterAsInt(parameters, self.MAX_VERTICES, context),
+        )
+        feedback.pushInfo(
+            f"Fetching address references within {len(geometries)} polygons in {len(clusters)} requests..."
+        )
+
+        def fetch_references() -> list[BelagenhetsadressReference]:
+            references: dict[str, BelagenhetsadressReference] = {}
+            for refs in client.get_references_from_geometry_batch(clusters):
+                references.update({ref["objektidentitet"]: ref for ref in refs})
+            return list(references.values())
 
-        total = 50.0 / source.featureCount() if source.featureCount() else 0
-        req = QgsFeatureRequest()
-        req.setFeedback(feedback)
-        req.setNoAttributes()
-        for current, feature in enumerate(source.getFeatures(req)):
+        journal = self.open_journal(
+            parameters,
+            context,
+            (bytes(geometry.asWkb()) for geometry in geometries),
+        )
+        try:
+            references = journaled(journal, "references", fetch_references, feedback)
             if feedback.isCanceled():
                 return dict()
+            feedback.setProgress(50.0)
 
-            geom = feature.geometry()
-            if geom is None:
-                continue
-
-            refs = client.get_references_from_geometry(
-                QgsReferencedGeometry(geom, source.sourceCrs())
+            self.add_address_objects(
+                sink, references, feedback, client, 50.0, geometries, journal
             )
-            references.update({ref["objektidentitet"]: ref for ref in refs})
-
-            feedback.setProgress(int(current * total))
-
-        self.add_address_objects(
-            sink, list(references.values()), feedback, client, 50.0
-        )
+            if journal is not None and not feedback.isCanceled():
+                journal.remove()
+        finally:
+            if journal is not None:
+                journal.close()
 
         return {self.OUTPUT: dest_id}
 
@@ -274,13 +372,31 @@ class DownloadAddressesBoundingAlgorithm(AbstractDownloadPropertiesAlgorithm):
             raise QgsProcessingException(
                 "Belägenhetsadress Direkt is not enabled in the settings"
             )
-        client = BelagenhetsadressDirektClient(s.ovrig_url, s.ovrig_authcfg, feedback)
+        client = BelagenhetsadressDirektClient(
+            s.ovrig_url, s.ovrig_authcfg, feedback, cache=s.response_cache()
+        )
 
         feedback.pushInfo("Fetching address references within extent...")
-        references = client.get_references_from_geometry(QgsGeometry.fromRect(extent))
-        feedback.setProgress(20.0)
+        journal = self.open_journal(parameters, context, (extent.toString(),))
+        try:
+            references = journaled(
+                journal,
+                "references",
+                lambda: client.get_references_from_extent(
+                    extent, on_truncated=partial(self.warn_truncated, feedback)
+                ),
+                feedback,
+            )
+            feedback.setProgress(20.0)
 
-        self.add_address_objects(sink, references, feedback, client, 20.0)
+            self.add_address_objects(
+                sink, references, feedback, client, 20.0, journal=journal
+            )
+            if journal is not None and not feedback.isCanceled():
+                journal.remove()
+        finally:
+            if journal is not None:
+                journal.close()
 
         return {self.OUTPUT: dest_id}
 
@@ -1,11 +1,11 @@
-from typing import Any, Literal, Optional
+import itertools
+from functools import partial
+from typing import Any, Iterable, Literal, Optional
 
 from qgis.core import (
     QgsCoordinateReferenceSystem,
     QgsFeature,
-    QgsFeatureRequest,
     QgsFeatureSink,
-    QgsFeedback,
     QgsField,
     QgsFields,
     QgsGeometry,
@@ -15,11 +15,13 @@ from qgis.core import (
     QgsProcessingException,
     QgsProcessingFeatureSource,
     QgsProcessingFeedback,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterDefinition,
     QgsProcessingParameterExtent,
     QgsProcessingParameterFeatureSink,
     QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterNumber,
     QgsRectangle,
-    QgsReferencedGeometry,
     QgsWkbTypes,
 )
 from qgis.PyQt.QtCore import QDateTime, QMetaType, Qt
@@ -28,14 +30,19 @@ from lantmateriet_qgis.core.clients import (
     FastighetOchSamfallighetDirektClient,
     FastighetsindelningDirektClient,
 )
+from lantmateriet_qgis.core.clients.base import NetworkError
 from lantmateriet_qgis.core.clients.fastighetochsamfallighetdirekt import IncludableData
 from lantmateriet_qgis.core.clients.fastighetsindelningdirekt import (
     Collection,
     Registerenhet,
 )
 from lantmateriet_qgis.core.settings import Settings
-from lantmateriet_qgis.core.util import omit
+from lantmateriet_qgis.core.util import omit, planning
+from lantmateriet_qgis.core.util.journal import DownloadJournal, journaled
 from lantmateriet_qgis.core.util.municipalities import municipalities
+from lantmateriet_qgis.core.util.planning import cluster_geometries
+from lantmateriet_qgis.core.util.prepared import PreparedGeometries
+from lantmateriet_qgis.core.util.telemetry import telemetry
 
 
 def make_fields(source: Literal["fastighetsindelningdirekt"] | IncludableData):
@@ -58,25 +65,67 @@ def make_fields(source: Literal["fastighetsindelningdirekt"] | IncludableData):
     return fields
 
 
-def geometry_iterator(source: QgsProcessingFeatureSource, feedback: QgsFeedback):
-    req = QgsFeatureRequest()
-    req.setFeedback(feedback)
-    req.setNoAttributes()
-    for current, feature in enumerate(source.getFeatures(req)):
-        if feedback.isCanceled():
-            return
-
-        geom = feature.geometry()
-        if geom is None:
-            continue
-
-        yield geom
+def fastighetsindelning_feature(object: Registerenhet, fields: QgsFields) -> QgsFeature:
+    feature = QgsFeature(fields)
+    feature.setGeometry(object["geometry"])
+    feature.setAttributes(
+        [
+            object["objektidentitet"],
+            object["objekttyp"],
+            object["senastandrad"],
+            object["lanskod"],
+            object["kommunkod"],
+            object["kommunnamn"],
+            object["trakt"],
+            object["block"],
+            object["enhet"],
+            object["etikett"],
+            f"{object['kommunnamn']} {object['trakt']} {object['etikett']}",
+        ]
+    )
+    return feature
+
+
+def fastighetdirekt_feature(object: dict[str, Any], fields: QgsFields) -> QgsFeature:
+    feature = QgsFeature(fields)
+    feature.setGeometry(object["geometry"])
+    attributes: dict | None = object.get(
+        "fastighetsattribut", object.get("samfallighetsattribut", None)
+    )
+    etikett = (
+        f"{attributes['block']}:{attributes['enhet']}"
+        if attributes.get("enhet", None) is not None
+        else attributes["block"]
+    )
+    municipality_name = municipalities[
+        attributes["lanskod"] + attributes["kommunkod"]
+    ].upper()
+    feature.setAttributes(
+        [
+            object["objektidentitet"],
+            object["typ"],
+            QDateTime.fromString(
+                attributes["versionGiltigFran"], Qt.DateFormat.ISODate
+            ),
+            attributes["lanskod"],
+            attributes["lanskod"] + attributes["kommunkod"],
+            municipality_name,
+            attributes["trakt"],
+            attributes["block"],
+            attributes.get("enhet", None),
+            etikett,
+            f"{municipality_name} {attributes['trakt']} {etikett}",
+            omit(object, ("objectidentitet", "typ")),
+        ]
+    )
+    return feature
 
 
 class AbstractDownloadPropertiesAlgorithm(QgsProcessingAlgorithm):
     OUTPUT_POLYGONS = "OUTPUT_POLYGONS"
     OUTPUT_LINES = "OUTPUT_LINES"
     OUTPUT_POINTS = "OUTPUT_POINTS"
+    RESUME = "RESUME"
 
     def group(self) -> str:
         return "Nedladdning"
@@ -87,6 +136,25 @@ class AbstractDownloadPropertiesAlgorithm(QgsProcessingAlgorithm):
     def helpUrl(self) -> str:
         return f"https://qgissverige.github.io/lantmateriet-qgis-plugin/usage/algoritmer/{self.name().replace('_', '-')}/"
 
+    def prepareAlgorithm(
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> bool:
+        self._requests = telemetry.snapshot()
+        return True
+
+    def postProcessAlgorithm(
+        self, context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> dict[str, Any]:
+        summary = telemetry.summary(self._requests)
+        if feedback is not None and summary:
+            feedback.pushInfo("Requests to Lantmäteriet:")
+            for line in summary:
+                feedback.pushInfo(line)
+        return {}
+
     def initAlgorithm(self, config: Optional[dict[str, Any]] = None):
         self.addParameter(
             QgsProcessingParameterFeatureSink(
@@ -113,6 +181,27 @@ class AbstractDownloadPropertiesAlgorithm(QgsProcessingAlgorithm):
                 createByDefault=False,
             )
         )
+        resume = QgsProcessingParameterBoolean(
+            self.RESUME, "Resume an interrupted download", defaultValue=True
+        )
+        resume.setFlags(
+            resume.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced
+        )
+        self.addParameter(resume)
+
+    def open_journal(
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        outputs: dict[str, Any],
+        parts: Iterable[str | bytes],
+    ) -> DownloadJournal | None:
+        if not self.parameterAsBoolean(parameters, self.RESUME, context):
+            return None
+        # features are only journaled for the outputs of the run
+        return DownloadJournal.for_run(
+            self.name(), itertools.chain((",".join(sorted(outputs)),), parts)
+        )
 
     def load_sinks(
         self,
@@ -176,32 +265,15 @@ class AbstractDownloadPropertiesAlgorithm(QgsProcessingAlgorithm):
     def add_fastighetsindelning_objects(
         self,
         sink: QgsFeatureSink,
-        extent: QgsGeometry,
-        objects: dict[str, Registerenhet],
+        extent: PreparedGeometries,
+        objects: Iterable[Registerenhet],
         fields: QgsFields,
     ):
-        for object in objects.values():
-            if not object["geometry"].intersects(extent):
+        for object in objects:
+            if not extent.intersects(object["geometry"]):
                 continue
 
-            feature = QgsFeature(fields)
-            feature.setGeometry(object["geometry"])
-            feature.setAttributes(
-                [
-                    object["objektidentitet"],
-                    object["objekttyp"],
-                    object["senastandrad"],
-                    object["lanskod"],
-                    object["kommunkod"],
-                    object["kommunnamn"],
-                    object["trakt"],
-                    object["block"],
-                    object["enhet"],
-                    object["etikett"],
-                    f"{object['kommunnamn']} {object['trakt']} {object['etikett']}",
-                ]
-            )
-
+            feature = fastighetsindelning_feature(object, fields)
             sink.addFeature(feature, QgsFeatureSink.Flag.FastInsert)
 
     @classmethod
@@ -212,21 +284,81 @@ class AbstractDownloadPropertiesAlgorithm(QgsProcessingAlgorithm):
         crs: QgsCoordinateReferenceSystem,
         client: FastighetsindelningDirektClient,
         feedback: QgsProcessingFeedback,
+        tiled: bool = False,
     ) -> set[str]:
-        omraden = client.get_omraden_at_rect(
-            collection, extent, crs, with_geometry=False
-        )
+        if tiled:
+            omraden = client.iter_omraden_tiled(collection, extent.boundingBox())
+        else:
+            omraden = client.iter_omraden_at_rect(
+                collection, extent, crs, with_geometry=False
+            )
+        references: set[str] = set()
         for omrade in omraden:
             if "outrettomradesinformation" in omrade:
                 feedback.pushWarning(
                     f"Hittade ett outrett område i svaret från Lantmäteriet. Detta kommer inte inkluderas i nedladdningen. Objektidentitet: {omrade['objektidentitet']}"
                 )
-        return set(
-            omr["registerenhetsreferens"]
-            for omr in omraden
-            if "outrettomradesinformation" not in omr
+            else:
+                references.add(omrade["registerenhetsreferens"])
+        return references
+
+    @staticmethod
+    def warn_truncated(feedback: QgsProcessingFeedback, tile: QgsRectangle):
+        feedback.pushWarning(
+            f"Svaret från Lantmäteriet för området {tile.toString()} var ofullständigt, alla objekt inom det kanske inte kommer med i nedladdningen."
         )
 
+    @classmethod
+    def add_fastighetdirekt_objects(
+        cls,
+        client: FastighetOchSamfallighetDirektClient,
+        references: set[str],
+        sink_polygons: QgsFeatureSink,
+        sink_lines: QgsFeatureSink,
+        sink_points: QgsFeatureSink,
+        feedback: QgsProcessingFeedback,
+        fields: QgsFields,
+        from_: float,
+        extent: PreparedGeometries | None = None,
+        journal: DownloadJournal | None = None,
+    ):
+        def on_error(reference: str, error: NetworkError):
+            feedback.pushWarning(
+                f"Kunde inte hämta objekt från Lantmäteriet, det kommer inte inkluderas i nedladdningen. Objektidentitet: {reference}\n{error}"
+            )
+
+        if journal is not None:
+            for output, sink in (
+                (cls.OUTPUT_POLYGONS, sink_polygons),
+                (cls.OUTPUT_LINES, sink_lines),
+                (cls.OUTPUT_POINTS, sink_points),
+            ):
+                if sink is not None:
+                    sink.addFeatures(
+                        list(journal.replay(output, fields)),
+                        QgsFeatureSink.Flag.FastInsert,
+                    )
+            references = set(references) - journal.written()
+
+        total = (100.0 - from_) / len(references) if references else 0
+        for current, object in enumerate(
+            client.get_many_chunked(
+                references, ("basinformation", "omrade"), on_error=on_error
+            )
+        ):
+            output, feature = None, None
+            if extent is None or extent.intersects(object["geometry"]):
+                output, feature = cls.add_fastighetdirekt_object(
+                    object, sink_polygons, sink_lines, sink_points, feedback, fields
+                )
+            if journal is not None:
+                journal.record(object["objektidentitet"], output, feature)
+                if current % client.MAX_GET_MANY == 0:
+                    journal.commit()
+            feedback.setProgress(from_ + int(current * total))
+        if journal is not None:
+            journal.commit()
+
     @classmethod
     def add_fastighetdirekt_object(
         cls,
@@ -236,56 +368,32 @@ class AbstractDownloadPropertiesAlgorithm(QgsProcessingAlgorithm):
         sink_points: QgsFeatureSink,
         feedback: QgsProcessingFeedback,
         fields: QgsFields,
-    ):
-        feature = QgsFeature(fields)
-        feature.setGeometry(object["geometry"])
-        attributes: dict | None = object.get(
-            "fastighetsattribut", object.get("samfallighetsattribut", None)
-        )
-        etikett = (
-            f"{attributes['block']}:{attributes['enhet']}"
-            if attributes.get("enhet", None) is not None
-            else attributes["block"]
-        )
-        municipality_name = municipalities[
-            attributes["lanskod"] + attributes["kommunkod"]
-        ].upper()
-        feature.setAttributes(
-            [
-                object["objektidentitet"],
-                object["typ"],
-                QDateTime.fromString(
-                    attributes["versionGiltigFran"], Qt.DateFormat.ISODate
-                ),
-                attributes["lanskod"],
-                attributes["lanskod"] + attributes["kommunkod"],
-                municipality_name,
-                attributes["trakt"],
-                attributes["block"],
-                attributes.get("enhet", None),
-                etikett,
-                f"{municipality_name} {attributes['trakt']} {etikett}",
-                omit(object, ("objectidentitet", "typ")),
-            ]
-        )
+    ) -> tuple[str | None, QgsFeature | None]:
+        """Write an object to the sink for its geometry type, returning the output used."""
+        feature = fastighetdirekt_feature(object, fields)
 
         geom_type = QgsWkbTypes.singleType(feature.geometry().wkbType())
         if geom_type == QgsWkbTypes.Type.Polygon:
             sink_polygons.addFeature(feature, QgsFeatureSink.Flag.FastInsert)
+            return cls.OUTPUT_POLYGONS, feature
         elif geom_type == QgsWkbTypes.Type.LineString:
             if sink_lines is not None:
                 sink_lines.addFeature(feature, QgsFeatureSink.Flag.FastInsert)
+                return cls.OUTPUT_LINES, feature
         elif geom_type == QgsWkbTypes.Type.Point:
             if sink_points is not None:
                 sink_points.addFeature(feature, QgsFeatureSink.Flag.FastInsert)
+                return cls.OUTPUT_POINTS, feature
         else:
             feedback.pushWarning(
                 f"Unknown geometry type {feature.geometry().wkbType()} for feature {object['objektidentitet']}. Skipping."
             )
+        return None, None
 
 
 class DownloadPropertiesPolygonAlgorithm(AbstractDownloadPropertiesAlgorithm):
     INPUT = "INPUT"
+    MAX_VERTICES = "MAX_VERTICES"
 
     def name(self) -> str:
         return "download_properties_polygons"
@@ -309,6 +417,18 @@ class DownloadPropertiesPolygonAlgorithm(AbstractDownloadPropertiesAlgorithm):
 
         super().initAlgorithm(config)
 
+        max_vertices = QgsProcessingParameterNumber(
+            self.MAX_VERTICES,
+            "Maximum vertices per query area",
+            QgsProcessingParameterNumber.Type.Integer,
+            defaultValue=planning.MAX_VERTICES,
+            minValue=1,
+        )
+        max_vertices.setFlags(
+            max_vertices.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced
+        )
+        self.addParameter(max_vertices)
+
     def processAlgorithm(
         self,
         parameters: dict[str, Any],
@@ -336,31 +456,64 @@ class DownloadPropertiesPolygonAlgorithm(AbstractDownloadPropertiesAlgorithm):
             parameters, context, fields
         )
 
+        feedback.pushInfo("Reading input geometries...")
+        geometries = PreparedGeometries.from_source(
+            source,
+            QgsCoordinateReferenceSystem.fromEpsgId(3006),
+            context.transformContext(),
+            feedback,
+        )
+        clusters = cluster_geometries(
+            geometries,
+            max_vertices=self.parameterAsInt(parameters, self.MAX_VERTICES, context),
+        )
+        feedback.pushInfo(
+            f"Combined {len(geometries)} polygons into {len(clusters)} query areas"
+        )
+
         if s.fastighet_direkt_enabled:
             feedback.pushInfo("Using service: Fastighet Direkt")
-            client = FastighetOchSamfallighetDirektClient(s.ovrig_url, s.ovrig_authcfg)
-            references: set[str] = set()
+            client = FastighetOchSamfallighetDirektClient(
+                s.ovrig_url, s.ovrig_authcfg, feedback, cache=s.response_cache()
+            )
 
-            total = 50.0 / source.featureCount() if source.featureCount() else 0
-            for current, geometry in enumerate(geometry_iterator(source, feedback)):
-                refs = client.get_references_from_geometry(
-                    QgsReferencedGeometry(geometry, source.sourceCrs())
+            def fetch_references() -> list[str]:
+                references: set[str] = set()
+                for refs in client.get_references_from_geometry_batch(clusters):
+                    references.update({ref["objektidentitet"] for ref in refs})
+                return list(references)
+
+            journal = self.open_journal(
+                parameters,
+                context,
+                dest_ids,
+                (bytes(geometry.asWkb()) for geometry in geometries),
+            )
+            try:
+                references = journaled(
+                    journal, "references", fetch_references, feedback
                 )
-                references.update({ref["objektidentitet"] for ref in refs})
-
-                feedback.setProgress(int(current * total))
-
-            # = client.get_references_from_geometry(extent_geom)
-            # TODO: we get error messages when attempting to load more than one item
-            # references_chunks = [references[i:i + FastighetOchSamfallighetDirektClient.MAX_GET_MANY] for i in range(0, len(references), FastighetOchSamfallighetDirektClient.MAX_GET_MANY)]
-            # for chunk in references_chunks:
-            #    objects = client.get_many([ref["objektidentitet"] for ref in chunk], "total")
-            #    for object in objects:
-            for reference in references:
-                object = client.get_one(reference, ("basinformation", "omrade"))
-                self.add_fastighetdirekt_object(
-                    object, sink_polygons, sink_lines, sink_points, feedback, fields
+                if feedback.isCanceled():
+                    return dict()
+                feedback.setProgress(50.0)
+
+                self.add_fastighetdirekt_objects(
+                    client,
+                    set(references),
+                    sink_polygons,
+                    sink_lines,
+                    sink_points,
+                    feedback,
+                    fields,
+                    50.0,
+                    geometries,
+                    journal,
                 )
+                if journal is not None and not feedback.isCanceled():
+                    journal.remove()
+            finally:
+                if journal is not None:
+                    journal.close()
         elif s.fastighetsindelning_direkt_enabled:
             feedback.pushInfo("Using service: Fastighetsindelning Direkt")
             client = FastighetsindelningDirektClient(
@@ -379,21 +532,23 @@ class DownloadPropertiesPolygonAlgorithm(AbstractDownloadPropertiesAlgorithm):
 
                 references: set[str] = set()
 
-                total = 50.0 / source.featureCount() if source.featureCount() else 0
-                for current, geometry in enumerate(geometry_iterator(source, feedback)):
+                total = 50.0 / len(clusters) if clusters else 0
+                for current, cluster in enumerate(clusters):
+                    if feedback.isCanceled():
+                        return dict()
                     references.update(
                         self.fetch_fastighetsindelning_references(
-                            collection, geometry, source.sourceCrs(), client, feedback
+                            collection,
+                            cluster,
+                            QgsCoordinateReferenceSystem.fromEpsgId(3006),
+                            client,
+                            feedback,
                         )
                     )
                     feedback.setProgress(int(current * total))
 
-                extents = QgsGeometry.unaryUnion(
-                    list(geometry_iterator(source, feedback))
-                )
-
-                objects = client.get_registerenheter(collection, references)
-                self.add_fastighetsindelning_objects(sink, extents, objects, fields)
+                objects = client.iter_registerenheter(collection, references)
+                self.add_fastighetsindelning_objects(sink, geometries, objects, fields)
                 feedback.setProgress(idx * 33.3)
         else:
             raise QgsProcessingException(
@@ -462,21 +617,41 @@ class DownloadPropertiesBoundingAlgorithm(AbstractDownloadPropertiesAlgorithm):
         if s.fastighet_direkt_enabled:
             feedback.pushInfo("Using service: Fastighet Direkt")
             client = FastighetOchSamfallighetDirektClient(
-                s.ovrig_url, s.ovrig_authcfg, feedback
+                s.ovrig_url, s.ovrig_authcfg, feedback, cache=s.response_cache()
             )
-            references = client.get_references_from_geometry(extent_geom)
-            # TODO: we get error messages when attempting to load more than one item
-            # references_chunks = [references[i:i + FastighetOchSamfallighetDirektClient.MAX_GET_MANY] for i in range(0, len(references), FastighetOchSamfallighetDirektClient.MAX_GET_MANY)]
-            # for chunk in references_chunks:
-            #    objects = client.get_many([ref["objektidentitet"] for ref in chunk], "total")
-            #    for object in objects:
-            for reference in references:
-                obj = client.get_one(
-                    reference["objektidentitet"], ("basinformation", "omrade")
+            journal = self.open_journal(
+                parameters, context, dest_ids, (extent.toString(),)
+            )
+            try:
+                references = journaled(
+                    journal,
+                    "references",
+                    lambda: [
+                        reference["objektidentitet"]
+                        for reference in client.get_references_from_extent(
+                            extent, on_truncated=partial(self.warn_truncated, feedback)
+                        )
+                    ],
+                    feedback,
                 )
-                self.add_fastighetdirekt_object(
-                    obj, sink_polygons, sink_lines, sink_points, feedback, fields
+                feedback.setProgress(20.0)
+
+                self.add_fastighetdirekt_objects(
+                    client,
+                    set(references),
+                    sink_polygons,
+                    sink_lines,
+                    sink_points,
+                    feedback,
+                    fields,
+                    20.0,
+                    journal=journal,
                 )
+                if journal is not None and not feedback.isCanceled():
+                    journal.remove()
+            finally:
+                if journal is not None:
+                    journal.close()
         elif s.fastighetsindelning_direkt_enabled:
             feedback.pushInfo("Using service: Fastighetsindelning Direkt")
             client = FastighetsindelningDirektClient(
@@ -498,11 +673,12 @@ class DownloadPropertiesBoundingAlgorithm(AbstractDownloadPropertiesAlgorithm):
                     QgsCoordinateReferenceSystem.fromEpsgId(3006),
                     client,
                     feedback,
+                    tiled=True,
                 )
                 if references:
-                    objects = client.get_registerenheter(collection, references)
+                    objects = client.iter_registerenheter(collection, references)
                     self.add_fastighetsindelning_objects(
-                        sink, extent_geom, objects, fields
+                        sink, PreparedGeometries([extent_geom]), objects, fields
                     )
                 feedback.setProgress(idx * 33.3)
         else:
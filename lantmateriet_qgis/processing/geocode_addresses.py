@@ -0,0 +1,273 @@
+from collections import defaultdict
+from typing import Any, Optional
+
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingFeatureSource,
+    QgsProcessingFeedback,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterField,
+    QgsProcessingUtils,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QMetaType
+
+from lantmateriet_qgis.core.clients import BelagenhetsadressDirektClient
+from lantmateriet_qgis.core.clients.base import NetworkError
+from lantmateriet_qgis.core.clients.belagenhetsadressdirekt import (
+    BelagenhetsadressReference,
+)
+from lantmateriet_qgis.core.settings import Settings
+
+MAX_HITS = 5
+"""Hits requested per address, enough to tell an ambiguous match."""
+
+BATCH_SIZE = 500
+"""Addresses looked up between progress updates."""
+
+match_fields = QgsFields()
+match_fields.append(QgsField("lm_objektidentitet", QMetaType.Type.QString))
+match_fields.append(QgsField("lm_adress", QMetaType.Type.QString))
+match_fields.append(QgsField("lm_matchning", QMetaType.Type.QString))
+match_fields.append(QgsField("lm_antal_traffar", QMetaType.Type.Int))
+
+
+def normalize_address(text: str) -> str:
+    """Normalize an address for comparisons, ignoring case and whitespace."""
+    return ", ".join(" ".join(part.split()) for part in text.upper().split(","))
+
+
+def normalize_kommunkod(value: Any) -> str | None:
+    """Read a municipality code from a field, which may have lost its leading zero."""
+    if value is None or str(value).strip() in ("", "NULL"):
+        return None
+    return str(value).strip().zfill(4)
+
+
+def match_quality(text: str, references: list[BelagenhetsadressReference]) -> str:
+    """Describe how well the first of the references found for an address matches it."""
+    if not references:
+        return "saknas"
+    query = normalize_address(text)
+    adress = normalize_address(references[0]["adress"])
+    if query in (adress, adress.split(",")[0]):
+        return "exakt"
+    if len(references) > 1:
+        return "flertydig"
+    return "ungefärlig"
+
+
+class GeocodeAddressesAlgorithm(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    FIELD = "FIELD"
+    MUNICIPALITY_FIELD = "MUNICIPALITY_FIELD"
+    OUTPUT = "OUTPUT"
+
+    def name(self) -> str:
+        return "geocode_addresses"
+
+    def displayName(self) -> str:
+        return "Geokoda adresser"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Söker upp adresserna i ett fält hos Belägenhetsadress Direkt och skapar "
+            "ett punktlager med adressplatserna, tillsammans med hur väl de matchade"
+        )
+
+    def group(self) -> str:
+        return "Nedladdning"
+
+    def groupId(self) -> str:
+        return "downloading"
+
+    def helpUrl(self) -> str:
+        return f"https://qgissverige.github.io/lantmateriet-qgis-plugin/usage/algoritmer/{self.name().replace('_', '-')}/"
+
+    def initAlgorithm(self, config: Optional[dict[str, Any]] = None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT, "Input layer", [QgsProcessing.SourceType.TypeVector]
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.FIELD,
+                "Address field",
+                parentLayerParameterName=self.INPUT,
+                type=QgsProcessingParameterField.DataType.String,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.MUNICIPALITY_FIELD,
+                "Municipality code field",
+                parentLayerParameterName=self.INPUT,
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                "Geocoded addresses",
+                QgsProcessing.SourceType.TypeVectorPoint,
+            )
+        )
+
+    def processAlgorithm(
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> dict[str, Any]:
+        source: QgsProcessingFeatureSource | None = self.parameterAsSource(
+            parameters, self.INPUT, context
+        )
+        if source is None:
+            raise QgsProcessingException(
+                self.invalidSourceError(parameters, self.INPUT)
+            )
+        address_index = source.fields().lookupField(
+            self.parameterAsString(parameters, self.FIELD, context)
+        )
+        municipality_field = self.parameterAsString(
+            parameters, self.MUNICIPALITY_FIELD, context
+        )
+        municipality_index = (
+            source.fields().lookupField(municipality_field)
+            if municipality_field
+            else -1
+        )
+
+        s = Settings.load_from_settings()
+        if (
+            not s.ovrig_enabled
+            or not s.ovrig_authcfg
+            or not s.belagenhetsadress_direkt_enabled
+        ):
+            raise QgsProcessingException(
+                "Belägenhetsadress Direkt is not enabled in the settings"
+            )
+        client = BelagenhetsadressDirektClient(
+            s.ovrig_url, s.ovrig_authcfg, feedback, cache=s.response_cache()
+        )
+
+        output_fields = QgsProcessingUtils.combineFields(source.fields(), match_fields)
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            output_fields,
+            QgsWkbTypes.Type.Point,
+            QgsCoordinateReferenceSystem.fromEpsgId(3006),
+        )
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+
+        # the same address is only looked up once, however it is written
+        feedback.pushInfo("Reading addresses...")
+        texts: dict[tuple[str, str | None], str] = {}
+        request = QgsFeatureRequest()
+        request.setFlags(QgsFeatureRequest.Flag.NoGeometry)
+        request.setSubsetOfAttributes(
+            [i for i in (address_index, municipality_index) if i != -1]
+        )
+        for feature in source.getFeatures(request):
+            key = self.key(feature, address_index, municipality_index)
+            if key is not None and key not in texts:
+                texts[key] = " ".join(str(feature[address_index]).split())
+        feedback.pushInfo(f"Found {len(texts)} distinct addresses")
+        feedback.setProgress(10)
+
+        feedback.pushInfo("Looking up addresses...")
+        by_municipality: dict[str | None, list[tuple[str, str | None]]] = defaultdict(
+            list
+        )
+        for key in texts:
+            by_municipality[key[1]].append(key)
+        references: dict[tuple[str, str | None], list[BelagenhetsadressReference]] = {}
+        for kommunkod, keys in by_municipality.items():
+            for i in range(0, len(keys), BATCH_SIZE):
+                if feedback.isCanceled():
+                    return dict()
+                batch = keys[i : i + BATCH_SIZE]
+
+                def on_lookup_error(index: int, error: NetworkError):
+                    feedback.pushWarning(
+                        f"Kunde inte söka efter adress hos Lantmäteriet, den kommer saknas i resultatet. Adress: {texts[batch[index]]}\n{error}"
+                    )
+
+                for key, refs in zip(
+                    batch,
+                    client.get_references_from_text_batch(
+                        [texts[key] for key in batch],
+                        municipality=kommunkod,
+                        max_hits=MAX_HITS,
+                        on_error=on_lookup_error,
+                    ),
+                ):
+                    references[key] = refs or []
+                feedback.setProgress(10 + 50 * len(references) / len(texts))
+
+        def on_error(reference: str, error: NetworkError):
+            feedback.pushWarning(
+                f"Kunde inte hämta adress från Lantmäteriet, den kommer saknas i resultatet. Objektidentitet: {reference}\n{error}"
+            )
+
+        feedback.pushInfo("Fetching address points...")
+        winners = {refs[0]["objektidentitet"] for refs in references.values() if refs}
+        geometries: dict[str, QgsGeometry] = {}
+        for address in client.get_many_chunked(
+            winners, "basinformation", on_error=on_error
+        ):
+            if feedback.isCanceled():
+                return dict()
+            geometries[address["id"]] = QgsGeometry(address["geometry"])
+        feedback.setProgress(90)
+
+        feedback.pushInfo("Writing geocoded addresses...")
+        for feature in source.getFeatures():
+            if feedback.isCanceled():
+                return dict()
+            key = self.key(feature, address_index, municipality_index)
+            refs = references.get(key, []) if key is not None else []
+            output = QgsFeature(output_fields)
+            output.setAttributes(
+                [
+                    *feature.attributes(),
+                    refs[0]["objektidentitet"] if refs else None,
+                    refs[0]["adress"] if refs else None,
+                    match_quality(texts[key], refs) if key is not None else "saknas",
+                    len(refs),
+                ]
+            )
+            if refs and refs[0]["objektidentitet"] in geometries:
+                output.setGeometry(geometries[refs[0]["objektidentitet"]])
+            sink.addFeature(output, QgsFeatureSink.Flag.FastInsert)
+
+        return {self.OUTPUT: dest_id}
+
+    @staticmethod
+    def key(
+        feature: QgsFeature, address_index: int, municipality_index: int
+    ) -> tuple[str, str | None] | None:
+        value = feature[address_index]
+        if value is None or not str(value).strip() or str(value) == "NULL":
+            return None
+        return (
+            normalize_address(str(value)),
+            normalize_kommunkod(feature[municipality_index])
+            if municipality_index != -1
+            else None,
+        )
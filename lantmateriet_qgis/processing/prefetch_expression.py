@@ -0,0 +1,89 @@
+from typing import Any, Optional
+
+from qgis.core import (
+    QgsExpression,
+    QgsProcessingAlgorithm,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingFeatureSource,
+    QgsProcessingFeedback,
+    QgsProcessingOutputNumber,
+    QgsProcessingParameterExpression,
+    QgsProcessingParameterFeatureSource,
+)
+
+from lantmateriet_qgis.core.clients.base import Canceled
+from lantmateriet_qgis.core.functions.prefetch import prefetch
+
+
+class PrefetchExpressionAlgorithm(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    EXPRESSION = "EXPRESSION"
+    PREFETCHED = "PREFETCHED"
+
+    def name(self) -> str:
+        return "prefetch_expression"
+
+    def displayName(self) -> str:
+        return "Förhämta data för uttryck"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Hämtar i förväg all data som pluginets funktioner i ett uttryck behöver för "
+            "alla objekt i ett lager, så att uttrycket därefter kan beräknas utan "
+            "ytterligare anrop till Lantmäteriet"
+        )
+
+    def group(self) -> str:
+        return "Uttryck"
+
+    def groupId(self) -> str:
+        return "expressions"
+
+    def helpUrl(self) -> str:
+        return f"https://qgissverige.github.io/lantmateriet-qgis-plugin/usage/algoritmer/{self.name().replace('_', '-')}/"
+
+    def initAlgorithm(self, config: Optional[dict[str, Any]] = None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(self.INPUT, "Input layer")
+        )
+        self.addParameter(
+            QgsProcessingParameterExpression(
+                self.EXPRESSION, "Expression", parentLayerParameterName=self.INPUT
+            )
+        )
+        self.addOutput(
+            QgsProcessingOutputNumber(self.PREFETCHED, "Number of prefetched values")
+        )
+
+    def processAlgorithm(
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> dict[str, Any]:
+        source: QgsProcessingFeatureSource | None = self.parameterAsSource(
+            parameters, self.INPUT, context
+        )
+        if source is None:
+            raise QgsProcessingException(
+                self.invalidSourceError(parameters, self.INPUT)
+            )
+
+        expression = QgsExpression(
+            self.parameterAsExpression(parameters, self.EXPRESSION, context)
+        )
+        if expression.hasParserError():
+            raise QgsProcessingException(expression.parserErrorString())
+
+        expression_context = self.createExpressionContext(parameters, context, source)
+        try:
+            prefetched = prefetch(expression, source, expression_context, feedback)
+        except Canceled:
+            return dict()
+        feedback.pushInfo(f"Prefetched {prefetched} values")
+
+        return {self.PREFETCHED: prefetched}
+
+    def createInstance(self):
+        return self.__class__()
@@ -0,0 +1,296 @@
+from typing import Any, Optional
+
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsPointXY,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingFeatureSource,
+    QgsProcessingFeedback,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterNumber,
+    QgsProcessingUtils,
+    QgsReferencedGeometry,
+)
+from qgis.PyQt.QtCore import QMetaType
+
+from lantmateriet_qgis.core.clients import (
+    BelagenhetsadressDirektClient,
+    RegisterbeteckningDirektClient,
+)
+from lantmateriet_qgis.core.clients.base import NetworkError
+from lantmateriet_qgis.core.clients.belagenhetsadressdirekt import format_address
+from lantmateriet_qgis.core.clients.registerbeteckningdirekt import (
+    Beteckning,
+    format_registerbeteckning,
+)
+from lantmateriet_qgis.core.settings import Settings
+
+BATCH_SIZE = 500
+"""Points looked up between progress updates."""
+
+address_fields = QgsFields()
+address_fields.append(QgsField("lm_adress_objektidentitet", QMetaType.Type.QString))
+address_fields.append(QgsField("lm_adress", QMetaType.Type.QString))
+address_fields.append(QgsField("lm_postnummer", QMetaType.Type.QString))
+address_fields.append(QgsField("lm_postort", QMetaType.Type.QString))
+address_fields.append(QgsField("lm_adress_avstand", QMetaType.Type.Double))
+
+property_fields = QgsFields()
+property_fields.append(QgsField("lm_fastighet_objektidentitet", QMetaType.Type.QString))
+property_fields.append(QgsField("lm_fastighet_beteckning", QMetaType.Type.QString))
+property_fields.append(QgsField("lm_fastighet_typ", QMetaType.Type.QString))
+
+
+def first_registerenhet(beteckningar: list[Beteckning]) -> Beteckning | None:
+    return next(
+        (b for b in beteckningar if b.get("registerenhetsreferens") is not None), None
+    )
+
+
+class ReverseGeocodeAlgorithm(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    ADDRESSES = "ADDRESSES"
+    PROPERTIES = "PROPERTIES"
+    SNAP = "SNAP"
+    OUTPUT = "OUTPUT"
+
+    def name(self) -> str:
+        return "reverse_geocode"
+
+    def displayName(self) -> str:
+        return "Hämta adress och fastighet för punkter"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Lägger till den närmaste adressen och den fastighet eller samfällighet "
+            "som varje punkt i ett lager ligger inom"
+        )
+
+    def group(self) -> str:
+        return "Nedladdning"
+
+    def groupId(self) -> str:
+        return "downloading"
+
+    def helpUrl(self) -> str:
+        return f"https://qgissverige.github.io/lantmateriet-qgis-plugin/usage/algoritmer/{self.name().replace('_', '-')}/"
+
+    def initAlgorithm(self, config: Optional[dict[str, Any]] = None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT, "Input layer", [QgsProcessing.SourceType.TypeVectorPoint]
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.ADDRESSES, "Add the closest address", defaultValue=True
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.PROPERTIES, "Add the property", defaultValue=True
+            )
+        )
+        snap = QgsProcessingParameterNumber(
+            self.SNAP,
+            "Size of the grid cells whose points share a lookup (meters)",
+            QgsProcessingParameterNumber.Type.Double,
+            defaultValue=1.0,
+            minValue=0.0,
+        )
+        snap.setFlags(snap.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced)
+        self.addParameter(snap)
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT, "Output layer", QgsProcessing.SourceType.TypeVectorPoint
+            )
+        )
+
+    def processAlgorithm(
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> dict[str, Any]:
+        source: QgsProcessingFeatureSource | None = self.parameterAsSource(
+            parameters, self.INPUT, context
+        )
+        if source is None:
+            raise QgsProcessingException(
+                self.invalidSourceError(parameters, self.INPUT)
+            )
+        with_addresses = self.parameterAsBoolean(parameters, self.ADDRESSES, context)
+        with_properties = self.parameterAsBoolean(parameters, self.PROPERTIES, context)
+        snap = self.parameterAsDouble(parameters, self.SNAP, context)
+
+        s = Settings.load_from_settings()
+        if not s.ovrig_enabled or not s.ovrig_authcfg:
+            raise QgsProcessingException(
+                "Övriga tjänster are not enabled in the settings"
+            )
+        if with_addresses and not s.belagenhetsadress_direkt_enabled:
+            raise QgsProcessingException(
+                "Belägenhetsadress Direkt is not enabled in the settings"
+            )
+        if with_properties and not s.registerbeteckning_direkt_enabled:
+            raise QgsProcessingException(
+                "Registerbeteckning Direkt is not enabled in the settings"
+            )
+
+        output_fields = QgsFields(source.fields())
+        if with_addresses:
+            output_fields = QgsProcessingUtils.combineFields(
+                output_fields, address_fields
+            )
+        if with_properties:
+            output_fields = QgsProcessingUtils.combineFields(
+                output_fields, property_fields
+            )
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            output_fields,
+            source.wkbType(),
+            source.sourceCrs(),
+        )
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+
+        # points are looked up in EPSG:3006, snapped to a grid of the given cell size
+        # so that the points in the same cell share their lookup, which is made at the
+        # first of those points rather than at the centre of the cell; points in
+        # neighbouring cells are looked up separately however close they are, and
+        # points up to a cell diagonal apart may share a lookup
+        crs = QgsCoordinateReferenceSystem.fromEpsgId(3006)
+        transform = QgsCoordinateTransform(
+            source.sourceCrs(), crs, context.transformContext()
+        )
+
+        def to_point(feature: QgsFeature) -> QgsPointXY | None:
+            geometry = feature.geometry()
+            if geometry.isNull() or geometry.isEmpty():
+                return None
+            return transform.transform(geometry.centroid().asPoint())
+
+        def key(point: QgsPointXY) -> tuple[float, float]:
+            if snap <= 0:
+                return point.x(), point.y()
+            return round(point.x() / snap), round(point.y() / snap)
+
+        feedback.pushInfo("Reading points...")
+        lookups: dict[tuple[float, float], QgsPointXY] = {}
+        for feature in source.getFeatures(QgsFeatureRequest().setNoAttributes()):
+            point = to_point(feature)
+            if point is not None:
+                lookups.setdefault(key(point), point)
+        keys = list(lookups)
+        feedback.pushInfo(f"Found {len(keys)} distinct points")
+        feedback.setProgress(5)
+
+        addresses: dict[tuple, dict | None] = {}
+        properties: dict[tuple, Beteckning | None] = {}
+        address_client = BelagenhetsadressDirektClient(
+            s.ovrig_url, s.ovrig_authcfg, feedback, cache=s.response_cache()
+        )
+        regbet_client = RegisterbeteckningDirektClient(
+            s.ovrig_url, s.ovrig_authcfg, feedback, cache=s.response_cache()
+        )
+        for i in range(0, len(keys), BATCH_SIZE):
+            if feedback.isCanceled():
+                return dict()
+            batch = keys[i : i + BATCH_SIZE]
+
+            def on_error(index: int, error: NetworkError):
+                feedback.pushWarning(
+                    f"Kunde inte slå upp punkten {lookups[batch[index]].toString()} hos Lantmäteriet.\n{error}"
+                )
+
+            points = [
+                QgsReferencedGeometry(QgsGeometry.fromPointXY(lookups[k]), crs)
+                for k in batch
+            ]
+            if with_addresses:
+                addresses.update(
+                    zip(
+                        batch,
+                        address_client.get_by_point_batch(
+                            points, "basinformation", on_error=on_error
+                        ),
+                    )
+                )
+            if with_properties:
+                properties.update(
+                    zip(
+                        batch,
+                        map(
+                            first_registerenhet,
+                            regbet_client.get_by_point_batch(points, on_error=on_error),
+                        ),
+                    )
+                )
+            feedback.setProgress(5 + 90 * (i + len(batch)) / len(keys))
+
+        feedback.pushInfo("Writing results...")
+        for feature in source.getFeatures():
+            if feedback.isCanceled():
+                return dict()
+            point = to_point(feature)
+            k = key(point) if point is not None else None
+            attributes = feature.attributes()
+            if with_addresses:
+                address = addresses.get(k)
+                attributes += (
+                    [
+                        address["objektidentitet"],
+                        format_address(address),
+                        address["adressplatsattribut"].get("postnummer"),
+                        address["adressplatsattribut"].get("postort"),
+                        address["geometry"].distance(QgsGeometry.fromPointXY(point)),
+                    ]
+                    if address is not None
+                    else [None] * address_fields.count()
+                )
+            if with_properties:
+                beteckning = properties.get(k)
+                attributes += (
+                    [
+                        beteckning["registerenhetsreferens"]["objektidentitet"],
+                        self.beteckning(beteckning),
+                        beteckning["registerenhetsreferens"].get("typ"),
+                    ]
+                    if beteckning is not None
+                    else [None] * property_fields.count()
+                )
+            output = QgsFeature(output_fields)
+            output.setGeometry(feature.geometry())
+            output.setAttributes(attributes)
+            sink.addFeature(output, QgsFeatureSink.Flag.FastInsert)
+
+        return {self.OUTPUT: dest_id}
+
+    @staticmethod
+    def beteckning(beteckning: Beteckning) -> str | None:
+        registerbeteckningar = beteckning.get("registerbeteckning") or []
+        current = next(
+            (
+                r
+                for r in registerbeteckningar
+                if r.get("beteckningsstatus") == "gällande"
+            ),
+            registerbeteckningar[0] if registerbeteckningar else None,
+        )
+        return format_registerbeteckning(current) if current is not None else None
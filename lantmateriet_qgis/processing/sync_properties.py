@@ -0,0 +1,297 @@
+import itertools
+from collections import defaultdict
+from typing import Any, Optional
+
+from qgis.core import (
+    Qgis,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsFields,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingFeedback,
+    QgsProcessingOutputNumber,
+    QgsProcessingParameterVectorLayer,
+    QgsRectangle,
+    QgsVectorDataProvider,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QDateTime, Qt
+
+from lantmateriet_qgis.core.clients import (
+    FastighetOchSamfallighetDirektClient,
+    FastighetsindelningDirektClient,
+)
+from lantmateriet_qgis.core.clients.base import NetworkError
+from lantmateriet_qgis.core.settings import Settings
+from lantmateriet_qgis.core.util.prepared import PreparedGeometries
+from lantmateriet_qgis.processing.download_properties import (
+    fastighetdirekt_feature,
+    fastighetsindelning_feature,
+    make_fields,
+)
+
+COLLECTIONS = {
+    Qgis.GeometryType.Polygon: "registerenhetsomradesytor",
+    Qgis.GeometryType.Line: "registerenhetsomradeslinjer",
+    Qgis.GeometryType.Point: "registerenhetsomradespunkter",
+}
+
+
+def to_layer_feature(feature: QgsFeature, layer: QgsVectorLayer) -> QgsFeature:
+    """Convert a feature to the fields and geometry type of a layer, matching fields by name."""
+    converted = QgsFeature(layer.fields())
+    geometry = feature.geometry()
+    if QgsWkbTypes.isMultiType(layer.wkbType()):
+        geometry.convertToMultiType()
+    converted.setGeometry(geometry)
+    for index, field in enumerate(feature.fields()):
+        layer_index = layer.fields().lookupField(field.name())
+        if layer_index != -1:
+            converted.setAttribute(layer_index, feature.attribute(index))
+    return converted
+
+
+class SyncPropertiesAlgorithm(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    ADDED = "ADDED"
+    UPDATED = "UPDATED"
+    DELETED = "DELETED"
+
+    def name(self) -> str:
+        return "sync_properties"
+
+    def displayName(self) -> str:
+        return "Uppdatera nedladdade fastigheter och samfälligheter"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Uppdaterar ett lager som skapats med någon av algoritmerna för att hämta "
+            "fastigheter och samfälligheter, med de ändringar som gjorts sedan den "
+            "senaste ändringen i lagret"
+        )
+
+    def group(self) -> str:
+        return "Nedladdning"
+
+    def groupId(self) -> str:
+        return "downloading"
+
+    def helpUrl(self) -> str:
+        return f"https://qgissverige.github.io/lantmateriet-qgis-plugin/usage/algoritmer/{self.name().replace('_', '-')}/"
+
+    def initAlgorithm(self, config: Optional[dict[str, Any]] = None):
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                self.INPUT,
+                "Layer to update",
+                [QgsProcessing.SourceType.TypeVectorAnyGeometry],
+            )
+        )
+        self.addOutput(QgsProcessingOutputNumber(self.ADDED, "Added features"))
+        self.addOutput(QgsProcessingOutputNumber(self.UPDATED, "Updated features"))
+        self.addOutput(QgsProcessingOutputNumber(self.DELETED, "Deleted features"))
+
+    def processAlgorithm(
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> dict[str, Any]:
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        if layer is None:
+            raise QgsProcessingException(
+                self.invalidSourceError(parameters, self.INPUT)
+            )
+
+        provider = layer.dataProvider()
+        capabilities = provider.capabilities()
+        if not (
+            capabilities & QgsVectorDataProvider.Capability.AddFeatures
+            and capabilities & QgsVectorDataProvider.Capability.DeleteFeatures
+        ):
+            raise QgsProcessingException("The layer cannot be edited in place")
+
+        id_index = layer.fields().lookupField("objektidentitet")
+        timestamp_index = layer.fields().lookupField("senastandrad")
+        collection = COLLECTIONS.get(layer.geometryType())
+        if id_index == -1 or timestamp_index == -1 or collection is None:
+            raise QgsProcessingException(
+                "The layer was not created by one of the algorithms for downloading properties"
+            )
+        since = layer.maximumValue(timestamp_index)
+        if not isinstance(since, QDateTime) or not since.isValid():
+            raise QgsProcessingException("The layer has no senastandrad to update from")
+        with_data = layer.fields().lookupField("data") != -1
+
+        s = Settings.load_from_settings()
+        if (
+            not s.ovrig_enabled
+            or not s.ovrig_authcfg
+            or not s.fastighetsindelning_direkt_enabled
+        ):
+            raise QgsProcessingException(
+                "Fastighetsindelning Direkt is needed to find changes, but is not enabled in the settings"
+            )
+        if with_data and not s.fastighet_direkt_enabled:
+            raise QgsProcessingException(
+                "The layer was downloaded from Fastighet Direkt, which is not enabled in the settings"
+            )
+
+        crs = QgsCoordinateReferenceSystem.fromEpsgId(3006)
+        to_layer = QgsCoordinateTransform(crs, layer.crs(), context.transformContext())
+        extent = to_layer.transformBoundingBox(
+            layer.extent(), Qgis.TransformDirection.Reverse
+        )
+
+        client = FastighetsindelningDirektClient(s.ovrig_url, s.ovrig_authcfg, feedback)
+        feedback.pushInfo(
+            f"Finding changes since {since.toString(Qt.DateFormat.ISODate)}..."
+        )
+        changed = client.get_changed_references(collection, since, extent, crs)
+        feedback.pushInfo(f"Found {len(changed)} changed objects")
+        if not changed:
+            return {self.ADDED: 0, self.UPDATED: 0, self.DELETED: 0}
+        feedback.setProgress(20)
+
+        existing: dict[str, list[int]] = defaultdict(list)
+        request = QgsFeatureRequest()
+        request.setFlags(QgsFeatureRequest.Flag.NoGeometry)
+        request.setSubsetOfAttributes([id_index])
+        for feature in layer.getFeatures(request):
+            existing[feature[id_index]].append(feature.id())
+
+        feedback.pushInfo("Downloading changed objects...")
+        features = []
+        for feature in self.download(
+            client, s, collection, changed, with_data, layer, feedback
+        ):
+            if feedback.isCanceled():
+                return dict()
+            geometry = feature.geometry()
+            geometry.transform(to_layer)
+            feature.setGeometry(geometry)
+            features.append(to_layer_feature(feature, layer))
+
+        # changes are searched for in the bounding box of the layer, which may reach
+        # far outside the area that was downloaded, so new objects are only kept if
+        # they lie within the current coverage of the layer, e.g. split off from a
+        # replaced property
+        new_extent = QgsRectangle()
+        new_extent.setNull()
+        for feature in features:
+            if feature[id_index] not in existing:
+                new_extent.combineExtentWith(feature.geometry().boundingBox())
+        if not new_extent.isNull():
+            request = QgsFeatureRequest().setFilterRect(new_extent)
+            request.setNoAttributes()
+            coverage = PreparedGeometries(
+                feature.geometry()
+                for feature in layer.getFeatures(request)
+                if not feature.geometry().isNull()
+            )
+            outside = {
+                feature[id_index]
+                for feature in features
+                if feature[id_index] not in existing
+                and not coverage.intersects(feature.geometry().pointOnSurface())
+            }
+            if outside:
+                feedback.pushInfo(
+                    f"Skipping {len(outside)} new objects outside the area of the layer"
+                )
+                features = [f for f in features if f[id_index] not in outside]
+
+        # the areas of the changed objects, both before and after the change
+        changed_areas = PreparedGeometries()
+        changed_extent = QgsRectangle()
+        changed_extent.setNull()
+        downloaded = {feature[id_index] for feature in features}
+        replaced = [fid for id in downloaded for fid in existing.get(id, [])]
+        for feature in itertools.chain(
+            features, layer.getFeatures(QgsFeatureRequest().setFilterFids(replaced))
+        ):
+            if not feature.geometry().isNull():
+                changed_areas.add(feature.geometry())
+                changed_extent.combineExtentWith(feature.geometry().boundingBox())
+        updated = sum(1 for id in downloaded if id in existing)
+        feedback.setProgress(70)
+
+        # objects that vanish, e.g. when properties are merged, leave their area to
+        # changed neighbours, so only the neighbours of changes need to be checked
+        candidates: dict[str, list[int]] = defaultdict(list)
+        request = QgsFeatureRequest().setFilterRect(changed_extent)
+        request.setSubsetOfAttributes([id_index])
+        for feature in layer.getFeatures(request):
+            if feature[id_index] not in changed and changed_areas.intersects(
+                feature.geometry()
+            ):
+                candidates[feature[id_index]].append(feature.id())
+        remaining = client.get_existing_references(collection, candidates.keys())
+        vanished = [
+            fid
+            for id, fids in candidates.items()
+            if id not in remaining
+            for fid in fids
+        ]
+        feedback.setProgress(90)
+
+        # replace the features in a single edit session, so that a failure leaves the
+        # layer as it was
+        if layer.isEditable():
+            raise QgsProcessingException(
+                "The layer has unsaved edits, save or discard them before updating it"
+            )
+        layer.startEditing()
+        if not layer.deleteFeatures(replaced + vanished):
+            layer.rollBack()
+            raise QgsProcessingException("Could not delete the outdated features")
+        if not layer.addFeatures(features):
+            layer.rollBack()
+            raise QgsProcessingException("Could not add the changed features")
+        if not layer.commitChanges():
+            errors = "\n".join(layer.commitErrors())
+            layer.rollBack()
+            raise QgsProcessingException(f"Could not save the changes:\n{errors}")
+
+        return {
+            self.ADDED: len(downloaded) - updated,
+            self.UPDATED: updated,
+            self.DELETED: len(vanished),
+        }
+
+    @staticmethod
+    def download(
+        client: FastighetsindelningDirektClient,
+        s: Settings,
+        collection: str,
+        references: set[str],
+        with_data: bool,
+        layer: QgsVectorLayer,
+        feedback: QgsProcessingFeedback,
+    ):
+        if not with_data:
+            fields = make_fields("fastighetsindelningdirekt")
+            for object in client.iter_registerenheter(collection, references):
+                yield fastighetsindelning_feature(object, fields)
+            return
+
+        def on_error(reference: str, error: NetworkError):
+            feedback.pushWarning(
+                f"Kunde inte hämta objekt från Lantmäteriet, det kommer inte uppdateras. Objektidentitet: {reference}\n{error}"
+            )
+
+        fields: QgsFields = make_fields("basinformation")
+        fsd_client = FastighetOchSamfallighetDirektClient(
+            s.ovrig_url, s.ovrig_authcfg, feedback, cache=s.response_cache()
+        )
+        for object in fsd_client.get_many_chunked(
+            references, ("basinformation", "omrade"), on_error=on_error
+        ):
+            if object["geometry"].type() == layer.geometryType():
+                yield fastighetdirekt_feature(object, fields)
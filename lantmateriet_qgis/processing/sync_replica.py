@@ -0,0 +1,165 @@
+from typing import Any, Optional
+
+from qgis.core import (
+    QgsFeature,
+    QgsProcessingAlgorithm,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingFeedback,
+    QgsProcessingOutputNumber,
+    QgsProcessingParameterEnum,
+    QgsVectorDataProvider,
+)
+from qgis.PyQt.QtCore import QDateTime
+
+from lantmateriet_qgis.core.clients import FastighetsindelningDirektClient
+from lantmateriet_qgis.core.clients.replica import (
+    COLLECTION,
+    FastighetsindelningReplica,
+    omrade_version,
+)
+from lantmateriet_qgis.core.settings import Settings
+from lantmateriet_qgis.core.util import municipalities
+from lantmateriet_qgis.core.util.designation_index import DesignationIndex
+
+
+class SyncReplicaAlgorithm(QgsProcessingAlgorithm):
+    MUNICIPALITIES = "MUNICIPALITIES"
+    ADDED = "ADDED"
+    UPDATED = "UPDATED"
+    DELETED = "DELETED"
+
+    def name(self) -> str:
+        return "sync_replica"
+
+    def displayName(self) -> str:
+        return "Synkronisera lokal kopia av fastighetsindelningen"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Hämtar fastighetsindelningen för de valda kommunerna till en lokal kopia, "
+            "eller uppdaterar kopian med de ändringar som gjorts sedan den förra "
+            "synkroniseringen. Uttrycksfunktionerna och sökningen efter fastigheter "
+            "använder sedan kopian innan de frågar Lantmäteriet"
+        )
+
+    def group(self) -> str:
+        return "Nedladdning"
+
+    def groupId(self) -> str:
+        return "downloading"
+
+    def helpUrl(self) -> str:
+        return f"https://qgissverige.github.io/lantmateriet-qgis-plugin/usage/algoritmer/{self.name().replace('_', '-')}/"
+
+    def initAlgorithm(self, config: Optional[dict[str, Any]] = None):
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.MUNICIPALITIES,
+                "Municipalities (all municipalities already in the replica if none are chosen)",
+                [f"{code} {name}" for code, name in municipalities.items()],
+                allowMultiple=True,
+                optional=True,
+            )
+        )
+        self.addOutput(QgsProcessingOutputNumber(self.ADDED, "Added areas"))
+        self.addOutput(QgsProcessingOutputNumber(self.UPDATED, "Updated areas"))
+        self.addOutput(QgsProcessingOutputNumber(self.DELETED, "Deleted areas"))
+
+    def processAlgorithm(
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> dict[str, Any]:
+        s = Settings.load_from_settings()
+        if (
+            not s.ovrig_enabled
+            or not s.ovrig_authcfg
+            or not s.fastighetsindelning_direkt_enabled
+        ):
+            raise QgsProcessingException(
+                "Fastighetsindelning Direkt is not enabled in the settings"
+            )
+
+        codes = list(municipalities)
+        kommunkoder = [
+            codes[index]
+            for index in self.parameterAsEnums(parameters, self.MUNICIPALITIES, context)
+        ]
+        replica = FastighetsindelningReplica.create(
+            s.replica_path(), context.transformContext()
+        )
+        if not kommunkoder:
+            kommunkoder = sorted(replica.synced())
+        if not kommunkoder:
+            raise QgsProcessingException("No municipalities to synchronize")
+
+        provider: QgsVectorDataProvider = replica.layer().dataProvider()
+        client = FastighetsindelningDirektClient(s.ovrig_url, s.ovrig_authcfg, feedback)
+
+        def add(features: list[QgsFeature]):
+            if not provider.addFeatures(features):
+                raise QgsProcessingException("Could not write to the replica")
+
+        added, updated, deleted = 0, 0, 0
+        for index, kommunkod in enumerate(kommunkoder):
+            if feedback.isCanceled():
+                return dict()
+            feedback.setProgress(index * 100 / len(kommunkoder))
+            started = QDateTime.currentDateTimeUtc()
+            local = replica.versions(kommunkod)
+
+            if not local:
+                feedback.pushInfo(f"Downloading {municipalities[kommunkod]}...")
+                features: list[QgsFeature] = []
+                for omrade in client.iter_omraden_in_kommun(
+                    COLLECTION, kommunkod, True
+                ):
+                    if feedback.isCanceled():
+                        return dict()
+                    features.append(replica.to_feature(omrade))
+                    if len(features) == client.PAGE_SIZE:
+                        add(features)
+                        added += len(features)
+                        features = []
+                add(features)
+                added += len(features)
+            else:
+                feedback.pushInfo(f"Finding changes in {municipalities[kommunkod]}...")
+                remote = {
+                    omrade["objektidentitet"]: omrade_version(omrade)
+                    for omrade in client.iter_omraden_in_kommun(COLLECTION, kommunkod)
+                }
+                changed = [
+                    id
+                    for id, version in remote.items()
+                    if id not in local or local[id][1] != version
+                ]
+                removed = [id for id in local if id not in remote]
+                feedback.pushInfo(
+                    f"Found {len(changed)} changed and {len(removed)} removed areas"
+                )
+                features = [
+                    replica.to_feature(omrade)
+                    for omrade in client.iter_omraden_by_id(COLLECTION, changed, True)
+                ]
+                if feedback.isCanceled():
+                    return dict()
+                if not provider.deleteFeatures(
+                    [local[id][0] for id in (*changed, *removed) if id in local]
+                ):
+                    raise QgsProcessingException("Could not write to the replica")
+                add(features)
+                updated += sum(1 for id in changed if id in local)
+                added += sum(1 for id in changed if id not in local)
+                deleted += len(removed)
+
+            replica.set_synced(kommunkod, started)
+
+        feedback.pushInfo("Building the designation index...")
+        DesignationIndex.build(
+            s.designation_index_path(), replica.synced(), replica.designations()
+        )
+
+        return {self.ADDED: added, self.UPDATED: updated, self.DELETED: deleted}
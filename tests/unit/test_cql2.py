@@ -0,0 +1,58 @@
+#! python3  # noqa E265
+
+"""
+Usage from the repo root folder:
+
+.. code-block:: bash
+    python -m unittest tests.unit.test_cql2
+"""
+
+import sqlite3
+import unittest
+
+from lantmateriet_qgis.core.util import cql2
+
+
+class TestToSql(unittest.TestCase):
+    def setUp(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.execute("CREATE TABLE t (kommunkod TEXT, trakt TEXT, block TEXT)")
+        self.db.executemany(
+            "INSERT INTO t VALUES (?, ?, ?)",
+            [
+                ("0180", "TRÄNGKÅREN", "6"),
+                ("2084", "TORP", "1"),
+                ("2084", "TORP", None),
+            ],
+        )
+
+    def select(self, filter: dict) -> list[tuple]:
+        sql, parameters = cql2.to_sql(filter)
+        return self.db.execute(f"SELECT * FROM t WHERE {sql}", parameters).fetchall()
+
+    def test_designation(self):
+        filter = cql2.and_(
+            [
+                cql2.equals(cql2.property("kommunkod"), "2084"),
+                cql2.startswith(cql2.property("trakt"), "TO"),
+                cql2.equals(cql2.property("block"), 1),
+            ]
+        )
+        self.assertEqual(self.select(filter), [("2084", "TORP", "1")])
+
+    def test_null_and_in(self):
+        filter = cql2.or_(
+            [
+                cql2.is_null(cql2.property("block")),
+                cql2.in_(cql2.property("trakt"), ["TRÄNGKÅREN", "X"]),
+            ]
+        )
+        self.assertEqual(len(self.select(filter)), 2)
+
+    def test_rejects_injection(self):
+        with self.assertRaises(ValueError):
+            cql2.to_sql(cql2.equals(cql2.property('a" OR 1 --'), 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
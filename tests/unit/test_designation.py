@@ -0,0 +1,91 @@
+import sys
+import timeit
+import unittest
+
+from lantmateriet_qgis.core.util import cql2, municipalities
+from lantmateriet_qgis.core.util.designation import (
+    municipality_matcher,
+    parse_designation,
+    parse_designation_exact,
+)
+
+
+class TestMunicipalityMatcher(unittest.TestCase):
+    def test_match(self):
+        self.assertEqual(municipality_matcher.match("Uppsala Kåbo 1:1"), ("0380", 7))
+        self.assertEqual(municipality_matcher.match("upplands väsby"), ("0114", 14))
+        self.assertIsNone(municipality_matcher.match("Kåbo 1:1"))
+
+    def test_longest_match(self):
+        self.assertEqual(municipality_matcher.match("Markaryd Ås 1:1"), ("0767", 8))
+        self.assertEqual(municipality_matcher.match("Mark Kinna 1:1"), ("1463", 4))
+
+    def test_folding(self):
+        self.assertEqual(municipality_matcher.match("Vasteras Nod 1:1")[0], "1980")
+        self.assertEqual(municipality_matcher.match("Håbo"), ("0305", 4))
+        self.assertEqual(municipality_matcher.match("Habo"), ("0643", 4))
+
+    def test_all_municipalities(self):
+        for code, name in municipalities.items():
+            self.assertEqual(municipality_matcher.match(f"{name} Trakt 1:1")[0], code)
+
+
+class TestParseDesignation(unittest.TestCase):
+    def test_parse_designation(self):
+        self.assertEqual(
+            parse_designation("Uppsala Kåbo 1:1"),
+            [
+                cql2.and_(
+                    [
+                        cql2.equals(cql2.property("kommunkod"), "0380"),
+                        cql2.startswith(cql2.property("trakt"), "KÅBO"),
+                        cql2.equals(cql2.property("block"), 1),
+                        cql2.equals(cql2.property("enhet"), 1),
+                    ]
+                )
+            ],
+        )
+
+    def test_parse_designation_exact(self):
+        self.assertEqual(
+            parse_designation_exact("vasteras Nod 1:3"),
+            cql2.and_(
+                [
+                    cql2.equals(cql2.property("kommunkod"), "1980"),
+                    cql2.equals(cql2.property("trakt"), "NOD"),
+                    cql2.equals(cql2.property("block"), "1"),
+                    cql2.equals(cql2.property("enhet"), 3),
+                ]
+            ),
+        )
+
+
+def benchmark(count: int = 100_000):
+    """Time parsing designations of every municipality, against the linear scan."""
+    names = list(municipalities.values())
+    designations = [f"{names[i % len(names)]} Trakt {i}:1" for i in range(count)]
+
+    def linear_scan(text: str) -> str | None:
+        return next(
+            (
+                k
+                for k, v in municipalities.items()
+                if text.upper().startswith(v.upper())
+            ),
+            None,
+        )
+
+    for label, function in (
+        ("linear scan", linear_scan),
+        ("matcher", municipality_matcher.match),
+        ("parse_designation", parse_designation),
+    ):
+        seconds = timeit.timeit(lambda: [function(d) for d in designations], number=1)
+        print(f"{label}: {seconds * 1e6 / count:.2f} µs per designation")
+
+
+if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        benchmark()
+    else:
+        unittest.main()
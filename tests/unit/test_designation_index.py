@@ -0,0 +1,45 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from lantmateriet_qgis.core.util.designation_index import DesignationIndex, IndexEntry
+
+ENTRIES = [
+    IndexEntry("Uppsala Kåbo 1:10", "c", "fastighet", "0380"),
+    IndexEntry("Uppsala Kåbo 1:1", "a", "fastighet", "0380"),
+    IndexEntry("Uppsala Kåbo 1:2", "b", "fastighet", "0380"),
+    IndexEntry("Uppsala Kungsängen s:3", "d", "samfällighet", "0380"),
+    IndexEntry("Upplands Väsby Bollstanäs 1:1", "e", "fastighet", "0114"),
+]
+
+
+class TestDesignationIndex(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "beteckningar.idx"
+        DesignationIndex.build(self.path, ["0380", "0114"], ENTRIES)
+        self.index = DesignationIndex(self.path)
+        self.addCleanup(self.index.close)
+
+    def test_search_prefix(self):
+        self.assertEqual(
+            [e.objektidentitet for e in self.index.search("uppsala  kåbo 1:1")],
+            ["a", "c"],
+        )
+        self.assertEqual(
+            [e.beteckning for e in self.index.search("Uppsala K", limit=2)],
+            ["Uppsala Kungsängen s:3", "Uppsala Kåbo 1:1"],
+        )
+        self.assertEqual(self.index.search("Uppsala Luthagen"), [])
+
+    def test_municipality(self):
+        self.assertEqual(self.index.kommunkoder, {"0380", "0114"})
+        self.assertEqual(self.index.municipality("Upplands Väsby Boll"), "0114")
+        self.assertEqual(self.index.municipality("UPPSALA"), "0380")
+        self.assertIsNone(self.index.municipality("Uppsal"))
+        self.assertIsNone(self.index.municipality("Stockholm Norrmalm 1:1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+#! python3  # noqa E265
+
+"""
+Usage from the repo root folder:
+
+.. code-block:: bash
+    python -m unittest tests.unit.test_geojson_stream
+"""
+
+import json
+import unittest
+
+from lantmateriet_qgis.core.util.geojson_stream import FeatureCollectionParser
+
+COLLECTION = {
+    "type": "FeatureCollection",
+    "numberMatched": 12345,
+    "features": [
+        {
+            "type": "Feature",
+            "id": str(i),
+            "geometry": {"type": "Point", "coordinates": [i * 1.5, -i]},
+            "properties": {
+                "namn": f'Ö{i} "å" \\ ]}}',
+                "nested": {"a": [1, {"b": None}]},
+            },
+        }
+        for i in range(50)
+    ],
+    "links": [{"rel": "next", "href": "https://example.com/?offset=50"}],
+}
+
+
+def parse(data: bytes, chunk_size: int) -> tuple[list[dict], dict]:
+    parser = FeatureCollectionParser()
+    features = []
+    for i in range(0, len(data), chunk_size):
+        features += parser.feed(data[i : i + chunk_size])
+    features += parser.close()
+    return features, parser.members
+
+
+class TestFeatureCollectionParser(unittest.TestCase):
+    def test_chunk_sizes(self):
+        """Any split of the response, even within UTF-8 sequences, gives the same result."""
+        data = json.dumps(COLLECTION, ensure_ascii=False, indent=1).encode("utf-8")
+        for chunk_size in (1, 2, 7, 64, 1000, len(data)):
+            features, members = parse(data, chunk_size)
+            self.assertEqual(features, COLLECTION["features"])
+            self.assertEqual(
+                members, {k: v for k, v in COLLECTION.items() if k != "features"}
+            )
+
+    def test_features_are_returned_early(self):
+        data = json.dumps(COLLECTION).encode("utf-8")
+        parser = FeatureCollectionParser()
+        self.assertGreater(len(parser.feed(data[: len(data) // 2])), 0)
+
+    def test_number_at_chunk_boundary(self):
+        data = b'{"numberMatched": 12345, "features": []}'
+        _, members = parse(data, data.index(b"3"))
+        self.assertEqual(members["numberMatched"], 12345)
+
+    def test_empty_collection(self):
+        features, members = parse(b'{"type":"FeatureCollection","features":[]}', 5)
+        self.assertEqual(features, [])
+        self.assertEqual(members, {"type": "FeatureCollection"})
+
+    def test_incomplete(self):
+        parser = FeatureCollectionParser()
+        parser.feed(b'{"features": [{"type": "Feature"}')
+        with self.assertRaises(ValueError):
+            parser.close()
+
+    def test_invalid(self):
+        parser = FeatureCollectionParser()
+        with self.assertRaises(ValueError):
+            parser.feed(b'["not", "a", "collection"]')
@@ -0,0 +1,101 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from lantmateriet_qgis.core.util.response_cache import ResponseCache, feature_version
+
+
+def feature(id: str, objektversion: int | None = None, **properties) -> dict:
+    if objektversion is not None:
+        properties["objektversion"] = objektversion
+    return {"id": id, "properties": properties}
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = ResponseCache(Path(directory.name) / "cache.sqlite", 100, 10_000)
+        self.addCleanup(lambda: self.cache._connection().close())
+        patcher = mock.patch("lantmateriet_qgis.core.util.response_cache.time")
+        self.time = patcher.start().time
+        self.addCleanup(patcher.stop)
+        self.time.return_value = 0.0
+
+    def ids(self, variant: str = "basinformation") -> set[str]:
+        return set(self.cache.get_many("fastighet", "abcd", variant))
+
+    def count(self) -> int:
+        connection = self.cache._connection()
+        return connection.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+
+    def test_expiry(self):
+        self.cache.put_many("fastighet", "basinformation", [feature("a")])
+        self.time.return_value = 50.0
+        self.assertEqual(self.ids(), {"a"})
+        self.time.return_value = 150.0
+        self.assertEqual(self.ids(), set())
+        self.cache.evict()
+        rows = self.cache._connection().execute("SELECT * FROM features").fetchall()
+        self.assertEqual(rows, [])
+
+    def test_removes_expired_every_interval(self):
+        self.cache.put_many("fastighet", "basinformation", [feature("a")])
+        self.time.return_value = 150.0
+        with mock.patch(
+            "lantmateriet_qgis.core.util.response_cache.EVICT_INTERVAL", 2
+        ):
+            self.cache.put_many("fastighet", "basinformation", [feature("b")])
+            self.assertEqual(self.count(), 2)
+            self.cache.put_many("fastighet", "basinformation", [feature("c")])
+            self.assertEqual(self.count(), 2)
+
+    def test_evicts_least_recently_used(self):
+        size = len('{"id": "a", "properties": {}}')
+        self.cache.max_size = int(3.5 * size)
+        for now, id in enumerate("abc", start=1):
+            self.time.return_value = float(now)
+            self.cache.put_many("fastighet", "basinformation", [feature(id)])
+        self.time.return_value = 4.0
+        # reading a makes b the least recently used
+        self.assertIn("a", self.cache.get_many("fastighet", "a", "basinformation"))
+        self.time.return_value = 5.0
+        self.cache.put_many("fastighet", "basinformation", [feature("d")])
+        self.assertEqual(self.ids(), {"a", "c", "d"})
+
+    def test_newer_version_removes_older_variants(self):
+        self.cache.put_many("fastighet", "basinformation", [feature("a", 1)])
+        self.cache.put_many("fastighet", "omrade", [feature("a", 1)])
+        self.cache.put_many("fastighet", "omrade", [feature("b", 1)])
+        self.cache.put_many("fastighet", "basinformation", [feature("a", 2)])
+        self.assertEqual(self.ids("omrade"), {"b"})
+        self.assertEqual(
+            self.cache.get_many("fastighet", "a", "basinformation")["a"],
+            feature("a", 2),
+        )
+
+    def test_same_version_keeps_other_variants(self):
+        self.cache.put_many("fastighet", "basinformation", [feature("a", 1)])
+        self.cache.put_many("fastighet", "omrade", [feature("a", 1)])
+        self.assertEqual(self.ids("basinformation"), {"a"})
+        self.assertEqual(self.ids("omrade"), {"a"})
+
+    def test_feature_version(self):
+        self.assertEqual(
+            feature_version(
+                feature(
+                    "a",
+                    adressplatsattribut={
+                        "objektversion": 3,
+                        "versionGiltigFran": "2024-01-01",
+                    },
+                )
+            ),
+            (3, "2024-01-01"),
+        )
+        self.assertEqual(feature_version(feature("a")), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
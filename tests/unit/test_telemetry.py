@@ -0,0 +1,59 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from lantmateriet_qgis.core.util.telemetry import Telemetry, endpoint_name
+
+
+class TestTelemetry(unittest.TestCase):
+    def test_endpoint_name(self):
+        self.assertEqual(
+            endpoint_name("GET", "/v5/909a6a63-3a05-90ec-e040-ed8f66444c3f"),
+            "GET /v5/{id}",
+        )
+
+    def test_summary_since_snapshot(self):
+        telemetry = Telemetry()
+        telemetry.record("GET /a", 30.0, 1024)
+        snapshot = telemetry.snapshot()
+        telemetry.record("GET /a", 40.0, 2048, parse_ms=5.0)
+        telemetry.record("POST /b", 20_000.0, 0, status=503, error=True)
+        self.assertEqual(
+            telemetry.summary(snapshot),
+            [
+                "GET /a: 1 requests, 0 errors, 2 kB, mean 40 ms, p95 <= 50 ms, "
+                "parsing 5 ms",
+                "POST /b: 1 requests, 1 errors, 0 kB, mean 20000 ms, p95 > 10000 ms, "
+                "parsing 0 ms",
+            ],
+        )
+
+    def test_log_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "requests.jsonl"
+            logged = []
+            telemetry = Telemetry()
+            telemetry.configure(logged.append, path)
+            telemetry.record("GET /a", 12.0, 100, status=200)
+            (line,) = path.read_text().splitlines()
+            self.assertEqual(json.loads(line)["endpoint"], "GET /a")
+            self.assertEqual(len(logged), 1)
+
+    def test_unwritable_log_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "missing" / "requests.jsonl"
+            logged = []
+            telemetry = Telemetry()
+            telemetry.configure(logged.append, path)
+            telemetry.record("GET /a", 12.0, 100, status=200)
+            telemetry.record("GET /a", 14.0, 100, status=200)
+            self.assertEqual(
+                sum(message.startswith("Could not write") for message in logged), 1
+            )
+            self.assertEqual(telemetry.snapshot()["GET /a"].requests, 2)
+            self.assertFalse(path.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
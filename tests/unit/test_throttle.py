@@ -0,0 +1,56 @@
+import unittest
+from datetime import datetime, timezone
+
+from lantmateriet_qgis.core.util.throttle import (
+    RetryPolicy,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_rate(self):
+        now = [0.0]
+        bucket = TokenBucket(2, burst=2, clock=lambda: now[0])
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+        # callers beyond the burst are queued at the rate
+        self.assertAlmostEqual(bucket.reserve(), 0.5)
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+        now[0] = 10.0
+        self.assertEqual(bucket.reserve(), 0.0)
+
+    def test_disabled(self):
+        bucket = TokenBucket(0)
+        for _ in range(100):
+            self.assertEqual(bucket.reserve(), 0.0)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_retryable(self):
+        policy = RetryPolicy(max_retries=2)
+        self.assertTrue(policy.should_retry(429, 0))
+        self.assertTrue(policy.should_retry(503, 1))
+        self.assertFalse(policy.should_retry(503, 2))
+        self.assertFalse(policy.should_retry(404, 0))
+        self.assertFalse(policy.should_retry(None, 0))
+
+    def test_delay(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+        self.assertEqual(policy.delay(2, jitter=lambda: 1.0), 4.0)
+        self.assertEqual(policy.delay(10, jitter=lambda: 1.0), 5.0)
+        self.assertEqual(policy.delay(10, retry_after=3.0), 3.0)
+        self.assertIsNone(policy.delay(10, retry_after=12.0))
+
+    def test_parse_retry_after(self):
+        now = datetime(2015, 10, 21, 7, 28, tzinfo=timezone.utc)
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertEqual(
+            parse_retry_after("Wed, 21 Oct 2015 07:28:30 GMT", now=now), 30.0
+        )
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+
+if __name__ == "__main__":
+    unittest.main()